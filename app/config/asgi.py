@@ -9,8 +9,12 @@ https://docs.djangoproject.com/en/3.1/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+
+from config.handlers import StreamingASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
-application = get_asgi_application()
+# What `get_asgi_application()` does, with the handler reading the streamed exports in a thread
+django.setup(set_prefix=False)
+application = StreamingASGIHandler()
@@ -0,0 +1,40 @@
+from django.db.backends.postgresql import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    PostgreSQL backend checking persistent connections before they are reused, like `CONN_HEALTH_CHECKS`
+    of newer Django versions. With `CONN_MAX_AGE` a connection outlives the request, so one closed in the
+    meantime (database restart, pooler or firewall timeout) would fail the next request. With
+    `CONN_HEALTH_CHECKS` the connection is checked once per request, before its first query, and replaced
+    when it's broken.
+    """
+
+    health_check_done = False
+
+    @property
+    def health_check_enabled(self):
+        return self.settings_dict.get("CONN_HEALTH_CHECKS", False) and self.settings_dict["CONN_MAX_AGE"] != 0
+
+    def connect(self):
+        # A new connection doesn't need to be checked
+        self.health_check_done = True
+        super().connect()
+
+    def _cursor(self, name=None):
+        # Only before queries, like upstream: `ensure_connection()` also runs while switching the autocommit
+        self.close_if_health_check_failed()
+        return super()._cursor(name)
+
+    def close_if_health_check_failed(self):
+        # Inside a transaction the connection was just used, closing it would lose the transaction
+        if self.connection is None or not self.health_check_enabled or self.health_check_done or self.in_atomic_block:
+            return
+        if not self.is_usable():
+            self.close()
+        self.health_check_done = True
+
+    def close_if_unusable_or_obsolete(self):
+        # Called at the start and the end of every request, the next request checks the connection again
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
@@ -0,0 +1,118 @@
+import asyncio
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.decorators import sync_and_async_middleware
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class RequestDatabases:
+    """Database the reads of a request go to, switched to the primary once the request writes"""
+
+    def __init__(self, read):
+        self.read = read
+        self.wrote = False
+
+    def write(self):
+        self.read = DEFAULT_DB_ALIAS
+        self.wrote = True
+
+
+# A mutable state, so the writes done in the threads of async views are seen by the middleware too
+current_databases = ContextVar("current_databases", default=None)
+
+
+class ReplicaRouter:
+    """
+    Send the reads to the replica picked for the request by `replica_middleware`, everything else to the primary.
+
+    A request reads from the primary as soon as it writes, so it reads its own writes. Reads in a transaction
+    stay on the primary as well, they have to see the transaction. Outside of the requests (commands, the
+    worker) all the queries go to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        databases = current_databases.get()
+        if databases is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return databases.read
+
+    def db_for_write(self, model, **hints):
+        databases = current_databases.get()
+        if databases is not None:
+            databases.write()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replicas have the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replicas get the schema from the primary
+        return db == DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def use_primary():
+    """Read from the primary in the block, e.g. right after a write done through another connection"""
+    token = current_databases.set(None)
+    try:
+        yield
+    finally:
+        current_databases.reset(token)
+
+
+@sync_and_async_middleware
+def replica_middleware(get_response):
+    """
+    Read from a random replica in the safe (GET, HEAD, OPTIONS) requests. After a write the client gets
+    a cookie which keeps its requests on the primary for `DATABASE_REPLICA_STICKY_SECONDS`, so it reads
+    its own writes in spite of the replication lag.
+    """
+    if asyncio.iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            databases = RequestDatabases(pick_database(request))
+            token = current_databases.set(databases)
+            try:
+                return stick(request, await get_response(request), databases)
+            finally:
+                current_databases.reset(token)
+
+    else:
+
+        def middleware(request):
+            databases = RequestDatabases(pick_database(request))
+            token = current_databases.set(databases)
+            try:
+                return stick(request, get_response(request), databases)
+            finally:
+                current_databases.reset(token)
+
+    return middleware
+
+
+def pick_database(request):
+    if (
+        not settings.DATABASE_REPLICAS
+        or request.method not in SAFE_METHODS
+        or settings.DATABASE_REPLICA_STICKY_COOKIE in request.COOKIES
+    ):
+        return DEFAULT_DB_ALIAS
+    return random.choice(settings.DATABASE_REPLICAS)
+
+
+def stick(request, response, databases):
+    if settings.DATABASE_REPLICAS and (databases.wrote or request.method not in SAFE_METHODS):
+        response.set_cookie(
+            settings.DATABASE_REPLICA_STICKY_COOKIE,
+            "1",
+            max_age=settings.DATABASE_REPLICA_STICKY_SECONDS,
+            httponly=True,
+            samesite="Lax",
+        )
+    return response
@@ -0,0 +1,55 @@
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.core.handlers.asgi import ASGIHandler
+from django.db import connections
+
+
+class StreamingASGIHandler(ASGIHandler):
+    """
+    ASGI handler which reads the streaming responses in a thread, one part at a time.
+
+    Django's handler iterates them in the event loop, where the exports reading a server-side cursor raise
+    SynchronousOnlyOperation, and where any blocking iteration stalls the other requests. Here every streaming
+    response gets a thread of its own, so the cursor and its database connection stay in one thread. The
+    connection stays checked out by the response until the download ends, then it's closed with the thread.
+    """
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+
+        await send({"type": "http.response.start", "status": response.status_code, "headers": self.headers(response)})
+        async with ThreadSensitiveContext():
+            # Calls of the same context run in the same thread
+            parts = iter(response)
+            try:
+                while True:
+                    part = await sync_to_async(next, thread_sensitive=True)(parts, None)
+                    if part is None:
+                        break
+                    for chunk, _ in self.chunk_bytes(part):
+                        await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            finally:
+                await sync_to_async(self.close_response, thread_sensitive=True)(response)
+        await send({"type": "http.response.body"})
+
+    @staticmethod
+    def close_response(response):
+        """Close the response and the database connections of the thread, which ends with the response"""
+        try:
+            response.close()
+        finally:
+            connections.close_all()
+
+    @staticmethod
+    def headers(response):
+        """The headers of the response with its cookies, as `http.response.start` expects them"""
+        headers = []
+        for header, value in response.items():
+            if isinstance(header, str):
+                header = header.encode("ascii")
+            if isinstance(value, str):
+                value = value.encode("latin1")
+            headers.append((bytes(header), bytes(value)))
+        for cookie in response.cookies.values():
+            headers.append((b"Set-Cookie", cookie.output(header="").encode("ascii").strip()))
+        return headers
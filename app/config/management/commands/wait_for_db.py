@@ -1,21 +1,45 @@
 import time
 
-from django.db import connections
+from django.db import DEFAULT_DB_ALIAS, connections
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
 
 class Command(BaseCommand):
-    """Django command to pause execution until database is available"""
+    """
+    Django command to pause execution until database is available. The database has to answer a `SELECT 1`,
+    it's retried with an exponential backoff until the timeout.
+    """
+
+    help = "Wait until the database answers queries, fail after the timeout"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS, help="Alias of the database to wait for")
+        parser.add_argument("--timeout", type=float, default=60, help="Seconds to wait before failing")
+        parser.add_argument("--interval", type=float, default=0.5, help="Seconds to wait after the first failure")
+        parser.add_argument("--max-interval", type=float, default=5, help="Maximum seconds between the attempts")
 
     def handle(self, *args, **options):
         self.stdout.write("Waiting for database...")
-        db_conn = None
-        while not db_conn:
+        connection = connections[options["database"]]
+        deadline = time.monotonic() + options["timeout"]
+        interval = options["interval"]
+
+        while True:
             try:
-                db_conn = connections["default"]
-            except OperationalError:
-                self.stdout.write("Database unavailable, waiting 1 second...")
-                time.sleep(1)
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                    cursor.fetchone()
+                break
+            except OperationalError as e:
+                # A connection broken after connecting isn't reused by the next attempt
+                connection.close()
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise CommandError(f"Database unavailable after {options['timeout']:g} seconds: {e}")
+                wait = min(interval, remaining)
+                self.stdout.write(f"Database unavailable, waiting {wait:g} seconds...")
+                time.sleep(wait)
+                interval = min(interval * 2, options["max_interval"])
 
         self.stdout.write(self.style.SUCCESS("Database available!"))
@@ -37,12 +37,16 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",
     "config",
-    "movies",
+    "movies.apps.MoviesConfig",
 ]
 
 MIDDLEWARE = [
+    "movies.middleware.metrics_middleware",
+    "movies.middleware.CompressionMiddleware",
+    "config.db.replicas.replica_middleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -78,14 +82,77 @@ WSGI_APPLICATION = "config.wsgi.application"
 
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
+        # PostgreSQL with health checks of the persistent connections, see `config.db.base`
+        "ENGINE": "config.db",
         "HOST": os.environ.get("DB_HOST"),
+        "PORT": os.environ.get("DB_PORT", ""),
         "NAME": os.environ.get("DB_NAME"),
         "USER": os.environ.get("DB_USER"),
         "PASSWORD": os.environ.get("DB_PASS"),
+        # Seconds a connection is reused for by the requests of a worker, 0 closes it after every request
+        "CONN_MAX_AGE": int(os.environ.get("DB_CONN_MAX_AGE", 60)),
+        "CONN_HEALTH_CHECKS": os.environ.get("DB_CONN_HEALTH_CHECKS", "true").lower() in ("1", "true", "yes"),
+        # Behind a pooler in transaction mode (e.g. PgBouncer) a transaction can get a different server
+        # connection, which would lose the server-side cursors of the streamed exports
+        "DISABLE_SERVER_SIDE_CURSORS": os.environ.get("DB_POOLER", "").lower() in ("1", "true", "yes"),
+        "OPTIONS": {
+            "connect_timeout": int(os.environ.get("DB_CONNECT_TIMEOUT", 5)),
+            # Minimal similarity of the titles matched by the fuzzy search, see `MovieManager.similar_titles()`
+            "options": f"-c pg_trgm.similarity_threshold={float(os.environ.get('TRIGRAM_SIMILARITY_THRESHOLD', 0.3))}",
+        },
     }
 }
 
+# Read replicas, comma separated `host[:port][/name]`, e.g. "replica1,replica2:5433" or "localhost/app_replica"
+# for a second local database. The safe requests read from them, see `config.db.replicas`
+DATABASE_REPLICAS = []
+for number, replica in enumerate(filter(None, os.environ.get("DB_REPLICAS", "").split(",")), start=1):
+    address, _, name = replica.strip().partition("/")
+    host, _, port = address.partition(":")
+    alias = f"replica{number}"
+    DATABASES[alias] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "PORT": port,
+        "NAME": name or DATABASES["default"]["NAME"],
+        # The tests read the replicas from the test database of the primary
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ["config.db.replicas.ReplicaRouter"]
+# After a write the client reads from the primary for this amount of seconds, longer than the replication lag
+DATABASE_REPLICA_STICKY_SECONDS = int(os.environ.get("DB_REPLICA_STICKY_SECONDS", 5))
+DATABASE_REPLICA_STICKY_COOKIE = "use_primary"
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # Serialized movies rankings, use a shared backend (e.g. memcached) when running multiple processes
+    "ranking": {
+        "BACKEND": os.environ.get("RANKING_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.environ.get("RANKING_CACHE_LOCATION", "ranking"),
+    },
+    # Generation counters of the cached rankings, an evicted counter would bring back stale rankings, so
+    # a shared backend has to keep all its keys (e.g. Redis with `maxmemory-policy noeviction`)
+    "ranking_generations": {
+        "BACKEND": os.environ.get(
+            "RANKING_GENERATIONS_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.environ.get("RANKING_GENERATIONS_CACHE_LOCATION", "ranking_generations"),
+        # A counter per day, month and year with comments, never culled
+        "OPTIONS": {"MAX_ENTRIES": 2 ** 31},
+    },
+}
+
+# Timeout (in seconds) of cached rankings for date ranges which are still open to new comments
+RANKING_CACHE_TIMEOUT = int(os.environ.get("RANKING_CACHE_TIMEOUT", 60))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
@@ -125,5 +192,69 @@ USE_TZ = True
 
 STATIC_URL = "/static/"
 
-API_URL = "http://www.omdbapi.com/?apikey="
+API_URL = "http://www.omdbapi.com/"
 API_KEY = "a56c24d8"
+
+# OMDb client, timeouts are in seconds
+OMDB_CONNECT_TIMEOUT = float(os.environ.get("OMDB_CONNECT_TIMEOUT", 3.05))
+OMDB_READ_TIMEOUT = float(os.environ.get("OMDB_READ_TIMEOUT", 10))
+OMDB_RETRIES = int(os.environ.get("OMDB_RETRIES", 2))
+OMDB_BACKOFF_FACTOR = float(os.environ.get("OMDB_BACKOFF_FACTOR", 0.3))
+OMDB_POOL_SIZE = int(os.environ.get("OMDB_POOL_SIZE", 10))
+# A single event loop keeps many more requests in flight than a pool of worker threads
+OMDB_ASYNC_POOL_SIZE = int(os.environ.get("OMDB_ASYNC_POOL_SIZE", 100))
+OMDB_CACHE_SIZE = int(os.environ.get("OMDB_CACHE_SIZE", 1024))
+OMDB_CACHE_TTL = int(os.environ.get("OMDB_CACHE_TTL", 86400))
+OMDB_NEGATIVE_CACHE_TTL = int(os.environ.get("OMDB_NEGATIVE_CACHE_TTL", 600))
+OMDB_FAILURE_THRESHOLD = int(os.environ.get("OMDB_FAILURE_THRESHOLD", 5))
+OMDB_RESET_TIMEOUT = int(os.environ.get("OMDB_RESET_TIMEOUT", 30))
+
+# Bulk movies import
+MOVIES_IMPORT_WORKERS = int(os.environ.get("MOVIES_IMPORT_WORKERS", 8))
+MOVIES_IMPORT_BATCH_SIZE = int(os.environ.get("MOVIES_IMPORT_BATCH_SIZE", 100))
+MOVIES_BULK_MAX_TITLES = int(os.environ.get("MOVIES_BULK_MAX_TITLES", 1000))
+
+# Background fetching of the movies data (`fetch_movies` command), durations are in seconds
+MOVIES_FETCH_WORKERS = int(os.environ.get("MOVIES_FETCH_WORKERS", 8))
+MOVIES_FETCH_BATCH_SIZE = int(os.environ.get("MOVIES_FETCH_BATCH_SIZE", 50))
+MOVIES_FETCH_POLL_INTERVAL = float(os.environ.get("MOVIES_FETCH_POLL_INTERVAL", 1))
+# A claimed job is given to another worker if it isn't finished within the lease
+MOVIES_FETCH_LEASE = int(os.environ.get("MOVIES_FETCH_LEASE", 300))
+MOVIES_FETCH_MAX_ATTEMPTS = int(os.environ.get("MOVIES_FETCH_MAX_ATTEMPTS", 5))
+# Doubled after every failed attempt
+MOVIES_FETCH_RETRY_DELAY = int(os.environ.get("MOVIES_FETCH_RETRY_DELAY", 30))
+MOVIES_DATA_MAX_AGE = int(os.environ.get("MOVIES_DATA_MAX_AGE", 7 * 86400))
+MOVIES_REFRESH_INTERVAL = float(os.environ.get("MOVIES_REFRESH_INTERVAL", 3600))
+
+# Amount of comments validated and inserted at once by the bulk comments endpoint
+COMMENTS_BULK_CHUNK_SIZE = int(os.environ.get("COMMENTS_BULK_CHUNK_SIZE", 1000))
+
+# Amount of rows fetched at once from the server-side cursor of the streamed exports
+EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", 2000))
+
+# Amount of the latest comments included for every movie of the movies list
+MOVIES_LIST_COMMENTS = int(os.environ.get("MOVIES_LIST_COMMENTS", 5))
+
+# Requests slower than this amount of seconds are logged with their SQL queries, 0 disables the log
+SLOW_REQUEST_THRESHOLD = float(os.environ.get("SLOW_REQUEST_THRESHOLD", 1))
+
+# Django REST framework
+# https://www.django-rest-framework.org/api-guide/settings/
+
+REST_FRAMEWORK = {
+    # orjson when it's installed, the stdlib `json` otherwise
+    "DEFAULT_RENDERER_CLASSES": [
+        "movies.api.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "movies.api.parsers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
+}
+
+# Responses of at least this amount of bytes are compressed with gzip when the client accepts it, 0 disables it
+RESPONSE_COMPRESSION_MIN_SIZE = int(os.environ.get("RESPONSE_COMPRESSION_MIN_SIZE", 1024))
+# 1 (fastest) to 9 (smallest), JSON gets little smaller above 6 while it costs much more CPU
+RESPONSE_COMPRESSION_LEVEL = int(os.environ.get("RESPONSE_COMPRESSION_LEVEL", 6))
@@ -1,22 +1,52 @@
+from itertools import count
 from unittest.mock import patch
 
 from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.backends.postgresql.base import DatabaseWrapper
 from django.db.utils import OperationalError
-from django.test import TestCase
+from django.test import SimpleTestCase
 
 
-class CommandTests(TestCase):
+class CommandTests(SimpleTestCase):
+    # Not in a transaction, the command has to open a new connection
+    databases = {"default"}
+
+    def setUp(self):
+        connection.close()
+
+    def patch_connect(self, failures):
+        """Fail the first `failures` connection attempts"""
+        get_new_connection = DatabaseWrapper.get_new_connection
+        attempts = count(1)
+
+        def connect(self, conn_params):
+            if next(attempts) <= failures:
+                raise OperationalError("could not connect")
+            return get_new_connection(self, conn_params)
+
+        return patch.object(DatabaseWrapper, "get_new_connection", side_effect=connect, autospec=True)
+
     def test_wait_for_db_ready(self):
         """Test waiting for db when db is available"""
-        with patch("django.db.utils.ConnectionHandler.__getitem__") as gi:
-            gi.return_value = True
+        with self.patch_connect(0) as gnc:
             call_command("wait_for_db")
-            self.assertEqual(gi.call_count, 1)
+            self.assertEqual(gnc.call_count, 1)
 
     @patch("time.sleep", return_value=True)
     def test_wait_for_db(self, ts):
-        """Test waiting for db"""
-        with patch("django.db.utils.ConnectionHandler.__getitem__") as gi:
-            gi.side_effect = [OperationalError] * 5 + [True]
-            call_command("wait_for_db")
-            self.assertEqual(gi.call_count, 6)
+        """Test waiting for db with an exponential backoff"""
+        with self.patch_connect(5) as gnc:
+            call_command("wait_for_db", interval=0.5, max_interval=4)
+            self.assertEqual(gnc.call_count, 6)
+            self.assertEqual([call.args[0] for call in ts.call_args_list], [0.5, 1, 2, 4, 4])
+
+    @patch("config.management.commands.wait_for_db.time")
+    def test_wait_for_db_timeout(self, mock_time):
+        """Test waiting for db fails after the timeout"""
+        mock_time.monotonic.side_effect = count(step=10)
+        with self.patch_connect(10) as gnc:
+            with self.assertRaisesMessage(CommandError, "Database unavailable after 30 seconds: could not connect"):
+                call_command("wait_for_db", timeout=30)
+            self.assertEqual(gnc.call_count, 3)
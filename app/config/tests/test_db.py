@@ -0,0 +1,83 @@
+from unittest.mock import patch
+
+from django.db import connection, connections, transaction
+from django.test import SimpleTestCase
+
+from config.db.base import DatabaseWrapper
+
+
+class HealthCheckTests(SimpleTestCase):
+    databases = {"default"}
+    alias = "health_check"
+
+    def connect(self, **settings):
+        """A connection to the test database with health checks, checks are counted in `self.is_usable`"""
+        settings_dict = {**connection.settings_dict, "CONN_MAX_AGE": 60, "CONN_HEALTH_CHECKS": True, **settings}
+        wrapper = DatabaseWrapper(settings_dict, alias=self.alias)
+        connections[self.alias] = wrapper
+        self.addCleanup(connections.__delitem__, self.alias)
+        self.addCleanup(wrapper.close)
+
+        patcher = patch.object(wrapper, "is_usable", wraps=wrapper.is_usable)
+        self.is_usable = patcher.start()
+        self.addCleanup(patcher.stop)
+        return wrapper
+
+    @staticmethod
+    def query(wrapper):
+        with wrapper.cursor() as cursor:
+            cursor.execute("SELECT 1")
+
+    @staticmethod
+    def end_request(wrapper):
+        # What the request_started and request_finished signals do
+        wrapper.close_if_unusable_or_obsolete()
+
+    def test_broken_connection_replaced(self):
+        """Test a kept connection closed in the meantime is replaced by the next request"""
+        wrapper = self.connect()
+        self.query(wrapper)
+        self.end_request(wrapper)
+        broken = wrapper.connection
+
+        broken.close()
+        self.query(wrapper)
+
+        self.assertIsNot(wrapper.connection, broken)
+        self.assertFalse(wrapper.connection.closed)
+
+    def test_checked_once_per_request(self):
+        """Test a kept connection is checked before the first query of every request only"""
+        wrapper = self.connect()
+        # A new connection isn't checked
+        self.query(wrapper)
+        self.assertEqual(self.is_usable.call_count, 0)
+
+        for request in range(1, 3):
+            self.end_request(wrapper)
+            self.query(wrapper)
+            self.query(wrapper)
+
+            self.assertEqual(self.is_usable.call_count, request)
+
+    def test_not_checked_in_transaction(self):
+        """Test the connection isn't checked inside a transaction"""
+        wrapper = self.connect()
+        self.query(wrapper)
+
+        with transaction.atomic(using=self.alias):
+            self.query(wrapper)
+            wrapper.health_check_done = False
+            self.query(wrapper)
+
+        self.assertEqual(self.is_usable.call_count, 0)
+
+    def test_not_checked_without_persistent_connections(self):
+        """Test the connections aren't checked when they're closed at the end of every request"""
+        wrapper = self.connect(CONN_MAX_AGE=0)
+        self.query(wrapper)
+        wrapper.health_check_done = False
+
+        self.query(wrapper)
+
+        self.assertEqual(self.is_usable.call_count, 0)
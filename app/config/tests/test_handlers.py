@@ -0,0 +1,50 @@
+import json
+
+from asgiref.sync import async_to_sync
+from django.test import TransactionTestCase, override_settings
+
+from config.handlers import StreamingASGIHandler
+from movies.models import Movie
+
+
+class StreamingASGIHandlerTests(TransactionTestCase):
+    def request(self, path):
+        """Pass a GET request through the handler, return the sent messages"""
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": path,
+            "query_string": b"",
+            "headers": [(b"host", b"testserver")],
+            "http_version": "1.1",
+        }
+        messages = []
+
+        async def receive():
+            return {"type": "http.request", "body": b""}
+
+        async def send(message):
+            messages.append(message)
+
+        async_to_sync(StreamingASGIHandler())(scope, receive, send)
+        return messages
+
+    @override_settings(EXPORT_CHUNK_SIZE=2)
+    def test_streamed_export(self):
+        """Test an export is streamed from its server-side cursor, chunk by chunk, under ASGI"""
+        movies = [Movie.objects.create(title=f"Movie {i}") for i in range(5)]
+
+        start, *body, end = self.request("/api/movies/export")
+
+        self.assertEqual(start["status"], 200)
+        self.assertTrue(all(message["more_body"] for message in body))
+        self.assertNotIn("more_body", end)
+        rows = b"".join(message["body"] for message in body).decode().splitlines()
+        self.assertEqual([json.loads(row)["id"] for row in rows], [movie.id for movie in movies])
+
+    def test_not_streamed_response(self):
+        """Test the other responses are sent as usual"""
+        start, *body = self.request("/api/movies/0/status")
+
+        self.assertEqual(start["status"], 404)
+        self.assertFalse(body[-1].get("more_body"))
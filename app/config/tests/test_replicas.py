@@ -0,0 +1,82 @@
+from django.db import DEFAULT_DB_ALIAS, router
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from config.db.replicas import replica_middleware, use_primary
+from movies.models import Movie
+
+
+@override_settings(DATABASE_REPLICAS=["replica1"])
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def call(self, request, write=False):
+        """Pass the request through the middleware, return the read databases before and after a write"""
+        reads = []
+
+        def view(request):
+            reads.append(router.db_for_read(Movie))
+            if write:
+                router.db_for_write(Movie)
+                reads.append(router.db_for_read(Movie))
+            return HttpResponse()
+
+        response = replica_middleware(view)(request)
+        return reads, response
+
+    def test_read_from_replica(self):
+        """Test the safe requests read from a replica and don't stick to the primary"""
+        reads, res = self.call(self.factory.get("/api/movies/"))
+
+        self.assertEqual(reads, ["replica1"])
+        self.assertNotIn("use_primary", res.cookies)
+
+    def test_write_request_on_primary(self):
+        """Test the unsafe requests read from the primary and keep the client on it for a while"""
+        reads, res = self.call(self.factory.post("/api/comments/"))
+
+        self.assertEqual(reads, [DEFAULT_DB_ALIAS])
+        self.assertEqual(res.cookies["use_primary"]["max-age"], 5)
+
+    def test_read_your_writes(self):
+        """Test the reads after a write of a safe request go to the primary"""
+        reads, res = self.call(self.factory.get("/api/movies/"), write=True)
+
+        self.assertEqual(reads, ["replica1", DEFAULT_DB_ALIAS])
+        self.assertIn("use_primary", res.cookies)
+
+    def test_sticky_primary(self):
+        """Test the clients which wrote recently read from the primary"""
+        request = self.factory.get("/api/movies/")
+        request.COOKIES["use_primary"] = "1"
+
+        reads, _ = self.call(request)
+
+        self.assertEqual(reads, [DEFAULT_DB_ALIAS])
+
+    def test_use_primary(self):
+        """Test forcing the reads of a block to the primary"""
+        reads = []
+
+        def view(request):
+            with use_primary():
+                reads.append(router.db_for_read(Movie))
+            reads.append(router.db_for_read(Movie))
+            return HttpResponse()
+
+        replica_middleware(view)(self.factory.get("/api/movies/"))
+
+        self.assertEqual(reads, [DEFAULT_DB_ALIAS, "replica1"])
+
+    def test_outside_requests(self):
+        """Test the queries outside of the requests go to the primary"""
+        self.assertEqual(router.db_for_read(Movie), DEFAULT_DB_ALIAS)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        """Test everything goes to the primary without replicas"""
+        reads, res = self.call(self.factory.post("/api/comments/"), write=True)
+
+        self.assertEqual(reads, [DEFAULT_DB_ALIAS, DEFAULT_DB_ALIAS])
+        self.assertNotIn("use_primary", res.cookies)
@@ -17,4 +17,10 @@ from django.contrib import admin
 from django.urls import path
 from django.urls.conf import include
 
-urlpatterns = [path("admin/", admin.site.urls), path("api/", include("movies.urls"))]
+from movies.metrics import metrics_view
+
+urlpatterns = [
+    path("admin/", admin.site.urls),
+    path("api/", include("movies.urls")),
+    path("metrics", metrics_view, name="metrics"),
+]
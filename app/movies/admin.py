@@ -4,7 +4,8 @@ from .models import Movie, Comment
 
 @admin.register(Movie)
 class MovieAdmin(admin.ModelAdmin):
-    list_display = ("title", "data")
+    list_display = ("title", "status", "comment_count", "last_commented_at", "fetched_at")
+    list_filter = ("status",)
 
 
 @admin.register(Comment)
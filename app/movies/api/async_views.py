@@ -0,0 +1,66 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+
+from .serializers import MovieSerializer
+from movies.omdb import MovieNotFound, OMDbUnavailable, fetch_movie_data_async
+
+
+async def create_movie_async(request):
+    """
+    Create a movie in database with data fetched from external api.
+
+    Unlike `ListCreateMovieAPIView.create`, the external api is called without blocking, so under ASGI a single
+    process keeps many fetches in flight. Only the database work runs in a thread.
+    """
+    if request.method != "POST":
+        return JsonResponse({"message": "Method not allowed"}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    if request.content_type == "application/json":
+        try:
+            payload = json.loads(request.body or b"{}")
+        except ValueError:
+            return JsonResponse({"message": "Malformed request body"}, status=status.HTTP_400_BAD_REQUEST)
+        title = payload.get("title") if isinstance(payload, dict) else None
+    else:
+        title = request.POST.get("title")
+
+    serializer = get_serializer(data={"title": title})
+    try:
+        # Validate before the external api is called, e.g. titles which already exist don't need a fetch
+        await sync_to_async(serializer.is_valid)(raise_exception=True)
+    except ValidationError as e:
+        return JsonResponse(e.detail, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        fetched_data = await fetch_movie_data_async(title)
+    except MovieNotFound:
+        return JsonResponse({"message": "Movie not found, try different title"}, status=status.HTTP_404_NOT_FOUND)
+    except OMDbUnavailable:
+        return JsonResponse(
+            {"message": "Movies database is currently unavailable, please try again later"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    # Fill the `data` field with fetched data
+    serializer.validated_data["data"] = fetched_data
+    data = await sync_to_async(save)(serializer)
+
+    return JsonResponse(data, status=status.HTTP_201_CREATED)
+
+
+# Async views can't be wrapped with the csrf_exempt decorator in this Django version, like DRF views they are exempt
+create_movie_async.csrf_exempt = True
+
+
+def get_serializer(**kwargs):
+    return MovieSerializer(fields=("id", "title", "data"), read_only_fields=("id", "data"), **kwargs)
+
+
+def save(serializer):
+    serializer.save()
+    return serializer.data
@@ -0,0 +1,77 @@
+import hashlib
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.views.decorators.http import condition
+
+
+class PrefetchRelationsMixin:
+    """
+    Prefetch the relations needed by the serializer of the view.
+
+    Views declare the `Prefetch` loading every relation they may serialize in `get_prefetch_relations()`,
+    keyed by the serializer field name. Only the relations of the fields which are actually serialized
+    are prefetched, so serializing them doesn't issue a query per object.
+    """
+
+    def get_prefetch_relations(self):
+        return {}
+
+    def prefetch_relations(self, queryset):
+        fields = self.get_serializer().fields
+        return queryset.prefetch_related(
+            *(prefetch for field, prefetch in self.get_prefetch_relations().items() if field in fields)
+        )
+
+
+class StreamingExportMixin:
+    """
+    Stream the rows of the view's queryset, rendered by the accepted `RowsRenderer`, e.g. `?format=csv`.
+
+    The rows are fetched as `.values()` of the `export_fields` through a server-side cursor, `chunk_size`
+    rows at a time, and rendered one by one while the response is sent. So memory doesn't grow with the table,
+    but the database connection is held until the download ends. Under ASGI the rows are read in a thread by
+    `config.handlers.StreamingASGIHandler`, the event loop can't use the cursor.
+    """
+
+    export_fields = ()
+    export_name = "export"
+
+    def get(self, request, *args, **kwargs):
+        queryset = self.get_queryset()
+        # The rows are fetched after the response left the middleware, so the database is picked now
+        queryset = queryset.using(queryset.db)
+        rows = queryset.values(*self.export_fields).iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+        renderer = request.accepted_renderer
+
+        response = StreamingHttpResponse(
+            renderer.render_rows(rows, self.export_fields), content_type=f"{renderer.media_type}; charset=utf-8"
+        )
+        response["Content-Disposition"] = f'attachment; filename="{self.export_name}.{renderer.format}"'
+        return response
+
+
+class ConditionalGetMixin:
+    """
+    Answer conditional GET requests (`If-None-Match` / `If-Modified-Since`) with 304 Not Modified.
+
+    Views return the last modification time of the requested resource from `get_last_modified()`, usually with
+    a single indexed lookup. It's called before the view itself, so an unchanged resource is neither fetched
+    nor serialized. The ETag is derived from it and from the request, so every representation has its own.
+    Resources without a modification time, e.g. missing ones, are served as usual.
+    """
+
+    def get_last_modified(self):
+        return None
+
+    def get(self, request, *args, **kwargs):
+        last_modified = self.get_last_modified()
+        if last_modified is None:
+            return super().get(request, *args, **kwargs)
+
+        variant = f"{request.get_full_path()}:{request.META.get('HTTP_ACCEPT', '')}:{last_modified.isoformat()}"
+        etag = hashlib.md5(variant.encode()).hexdigest()
+        view = condition(
+            etag_func=lambda *args, **kwargs: etag, last_modified_func=lambda *args, **kwargs: last_modified
+        )
+        return view(super().get)(request, *args, **kwargs)
@@ -0,0 +1,171 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination.
+
+    Instead of an OFFSET, every page is fetched with a `WHERE (ordering) > (last row of the previous page)`
+    condition, so page N costs the same as page 1. The ordering is taken from the queryset (or the model's
+    `Meta.ordering`) and `id` is appended as a unique tie-breaker. Rows with NULL in the leading ordering
+    field are always returned last. The total count is only computed on request, e.g. `?count=true`.
+    """
+
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(queryset)
+        self.count = queryset.count() if self.count_requested(request) else None
+
+        page_size = self.get_page_size(request)
+        position = self.decode_cursor(request, queryset.model)
+        rows = self.fetch(queryset, position, page_size + 1)
+
+        self.has_next = len(rows) > page_size
+        page = rows[:page_size]
+        self.next_position = self.get_position(page[-1]) if self.has_next else None
+        return page
+
+    def get_paginated_response(self, data):
+        response = {"next": self.get_next_link(), "results": data}
+        if self.count is not None:
+            response = {"count": self.count, **response}
+        return Response(response)
+
+    def get_ordering(self, queryset):
+        """Return the ordering as a list of `(field, descending)` pairs, ending with the unique `id`"""
+        ordering = [
+            (field.lstrip("-"), field.startswith("-"))
+            for field in (queryset.query.order_by or queryset.model._meta.ordering)
+            if isinstance(field, str)
+        ]
+        # Unless specified, the tie-breaker follows the direction of the leading field so that one index can serve both
+        default = ordering[0][1] if ordering else False
+        id_descending = next((descending for field, descending in ordering if field in ("pk", "id")), default)
+        return [(field, descending) for field, descending in ordering if field not in ("pk", "id")] + [
+            ("id", id_descending)
+        ]
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def count_requested(self, request):
+        return request.query_params.get(self.count_query_param, "").lower() in ("1", "true", "yes")
+
+    def fetch(self, queryset, position, limit):
+        """Fetch up to `limit` rows following `position`, with NULLs in the leading field sorted last"""
+        (field, _), rest = self.ordering[0], self.ordering[1:]
+        if not rest or not self.is_nullable(queryset.model, field):
+            return list(self.after(queryset, self.ordering, position).order_by(*self.order_by(self.ordering))[:limit])
+
+        rows = []
+        if position is None or position[0] is not None:
+            not_null = queryset.filter(**{f"{field}__isnull": False})
+            rows = list(self.after(not_null, self.ordering, position).order_by(*self.order_by(self.ordering))[:limit])
+            position = None
+        if len(rows) < limit:
+            null = queryset.filter(**{f"{field}__isnull": True})
+            null = self.after(null, rest, position[1:] if position else None).order_by(*self.order_by(rest))
+            rows += list(null[: limit - len(rows)])
+        return rows
+
+    def after(self, queryset, ordering, position):
+        """Filter the queryset down to rows placed after `position` in the given ordering"""
+        if position is None:
+            return queryset
+
+        condition = None
+        for (field, descending), value in reversed(list(zip(ordering, position))):
+            beyond = Q(**{f"{field}__{'lt' if descending else 'gt'}": value})
+            condition = beyond if condition is None else beyond | (Q(**{field: value}) & condition)
+
+        # The redundant bound on the leading field lets the database seek the index instead of scanning it
+        (field, descending), value = ordering[0], position[0]
+        return queryset.filter(Q(**{f"{field}__{'lte' if descending else 'gte'}": value}) & condition)
+
+    def order_by(self, ordering):
+        return [f"-{field}" if descending else field for field, descending in ordering]
+
+    def get_position(self, row):
+        position = []
+        for field, _ in self.ordering:
+            value = row
+            for part in field.split("__"):
+                value = value.get(part) if isinstance(value, dict) else getattr(value, part, None)
+            position.append(value)
+        return position
+
+    @staticmethod
+    def is_nullable(model, field):
+        name, *transforms = field.split("__")
+        # Keys inside JSON documents may be missing, so anything behind a transform is treated as nullable
+        return bool(transforms) or model._meta.get_field(name).null
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")).decode("utf-8"))
+        except (TypeError, ValueError, UnicodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            return [self.to_python(model, field, value) for (field, _), value in zip(self.ordering, position)]
+        except (TypeError, ValueError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def to_python(self, model, field, value):
+        """Convert a value of the cursor to the type of its ordering field, raise ValueError if it can't be one"""
+        if isinstance(value, (dict, list)) or (value is None and not self.is_nullable(model, field)):
+            raise ValueError(f"Invalid value of {field}")
+        name, *transforms = field.split("__")
+        # Keys inside JSON documents can be any scalar
+        if value is None or transforms:
+            return value
+        return model._meta.get_field(name).to_python(value)
+
+    def encode_cursor(self, position):
+        encoded = json.dumps(position, cls=DjangoJSONEncoder, separators=(",", ":"))
+        return base64.urlsafe_b64encode(encoded.encode("utf-8")).decode("ascii")
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(
+            remove_query_param(self.base_url, self.count_query_param),
+            self.cursor_query_param,
+            self.encode_cursor(self.next_position),
+        )
+
+
+class SearchPagination(LimitOffsetPagination):
+    """Search results are ordered by their rank, which can't be used as a stable keyset"""
+
+    default_limit = 20
+    max_limit = 100
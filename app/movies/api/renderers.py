@@ -0,0 +1,97 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer encoding with orjson when it's installed, several times faster than the stdlib `json`.
+    The output is the same: compact, with types orjson doesn't know, dates and times among them, encoded
+    by DRF's encoder. Indented output (e.g. `Accept: application/json; indent=4`) is left to the stdlib.
+    """
+
+    options = orjson.OPT_PASSTHROUGH_DATETIME if orjson else None
+    encoder = JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.encoder.default, option=self.options)
+        except TypeError:
+            # E.g. integers over 64 bits
+            return super().render(data, accepted_media_type, renderer_context)
+        # Like JSONRenderer, keep the output a strict JavaScript subset
+        if b"\xe2\x80\xa8" in ret or b"\xe2\x80\xa9" in ret:
+            ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+        return ret
+
+
+class RowsRenderer(BaseRenderer):
+    """
+    Base renderer of flat rows, e.g. `.values()` of a queryset. `render_rows()` renders them one by one,
+    so they can be streamed while the queryset is iterated.
+    """
+
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Other responses of the view, e.g. errors, are rendered as a single row
+        rows = data if isinstance(data, list) else [data]
+        fields = list(rows[0]) if rows else []
+        return "".join(self.render_rows(rows, fields)).encode(self.charset)
+
+    def render_rows(self, rows, fields):
+        raise NotImplementedError(".render_rows() must be implemented")
+
+
+class NDJSONRenderer(RowsRenderer):
+    """Renders every row as a JSON object on its own line"""
+
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+
+    def render_rows(self, rows, fields):
+        for row in rows:
+            yield json.dumps({field: row[field] for field in fields}, cls=DjangoJSONEncoder, separators=(",", ":"))
+            yield "\n"
+
+
+class Echo:
+    """File-like object returning what is written to it, so `csv.writer` returns the rendered lines"""
+
+    def write(self, value):
+        return value
+
+
+class CSVRenderer(RowsRenderer):
+    """Renders the rows as CSV with a header, nested values are rendered as JSON"""
+
+    media_type = "text/csv"
+    format = "csv"
+    encoder = DjangoJSONEncoder()
+
+    def render_rows(self, rows, fields):
+        writer = csv.writer(Echo())
+        yield writer.writerow(fields)
+        for row in rows:
+            yield writer.writerow([self.render_value(row[field]) for field in fields])
+
+    def render_value(self, value):
+        if value is None:
+            return ""
+        if isinstance(value, (str, int, float)):
+            return value
+        if isinstance(value, (dict, list)):
+            return self.encoder.encode(value)
+        # Dates, times and decimals the same as in JSON
+        return self.encoder.default(value)
@@ -1,50 +1,212 @@
+import copy
+import threading
+
+from django.conf import settings
+from django.db.models import Func, JSONField, Value
+from django.db.models.fields.json import KeyTransform
 from rest_framework import serializers
 
+from movies.metrics import track
 from movies.models import Movie, Comment
 
 
+class TimedSerializerMixin:
+    """Adds the time spent building the representation to the metrics of the current request"""
+
+    @property
+    def data(self):
+        with track("serializer"):
+            return super().data
+
+
+class TimedListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    """List serializer for the `many=True` serializers of the timed ones"""
+
+
+def split_fields(fields):
+    """
+    Split sparse fieldsets like `("title", "data.Year", "data.imdbRating")` into the fields and the keys
+    selected from the JSON fields: `("title", "data"), {"data": ("Year", "imdbRating")}`. A JSON field
+    selected as a whole isn't projected.
+    """
+    names, keys, whole = [], {}, set()
+    for field in fields:
+        name, _, key = field.partition(".")
+        if name not in names:
+            names.append(name)
+        if key:
+            keys.setdefault(name, []).append(key)
+        else:
+            whole.add(name)
+    return tuple(names), {name: tuple(dict.fromkeys(keys[name])) for name in keys if name not in whole}
+
+
+# The fields and plans of the serializers are cached per process and shared by its threads
+cache_lock = threading.Lock()
+
+
+def cached(cache, key, build, size):
+    """
+    Return the value cached for the key, or build and cache it. The oldest entry is evicted from a full cache.
+    The value is built outside of the lock, so a value being built by two threads at once is cached once.
+    """
+    with cache_lock:
+        value = cache.get(key)
+    if value is None:
+        value = build()
+        with cache_lock:
+            if key not in cache and len(cache) >= size:
+                cache.pop(next(iter(cache)), None)
+            value = cache.setdefault(key, value)
+    return value
+
+
+class JSONBuildObject(Func):
+    """`jsonb_build_object()` of the given keys of a JSON field, missing keys are null"""
+
+    function = "jsonb_build_object"
+    output_field = JSONField()
+
+    def __init__(self, field, keys):
+        super().__init__(*(part for key in keys for part in (Value(key), KeyTransform(key, field))))
+
+
 class DynamicFieldsModelSerializer(serializers.ModelSerializer):
     """
     A ModelSerializer that takes an additional `fields` and `read_only_fields` argument that
-    controls which fields should be displayed.
+    controls which fields should be displayed. Keys of JSON fields can be selected as well,
+    e.g. `data.Year`, then only these keys are displayed.
+
+    Building the fields of a ModelSerializer introspects the model every time, so the fields of every
+    `(fields, read_only_fields)` combination are built once and copied for the next instances.
     """
 
+    _field_templates = {}
+    # The fields come from the clients with sparse fieldsets, so the cache is bounded
+    field_templates_size = 256
+
     def __init__(self, *args, **kwargs):
         # Don't pass the 'fields' arg up to the superclass
         fields = kwargs.pop("fields", None)
-
         read_only_fields = kwargs.pop("read_only_fields", None)
+        self.field_names, self.json_keys = split_fields(fields) if fields is not None else (None, {})
+        self.read_only_field_names = tuple(read_only_fields) if read_only_fields is not None else ()
 
         # Instantiate the superclass normally
         super(DynamicFieldsModelSerializer, self).__init__(*args, **kwargs)
 
-        if fields is not None:
+    def get_fields(self):
+        key = (type(self), self.field_names, self.read_only_field_names)
+        templates = cached(self._field_templates, key, self.build_fields, self.field_templates_size)
+
+        fields = {}
+        for name, template in templates.items():
+            fields[name] = copy.deepcopy(template)
+            # Not kept by the copy, which instantiates the field again with its arguments
+            if name in self.read_only_field_names:
+                fields[name].read_only = True
+        return fields
+
+    def build_fields(self):
+        fields = super().get_fields()
+        if self.field_names is not None:
             # Drop any fields that are not specified in the `fields` argument.
-            allowed = set(fields)
-            existing = set(self.fields)
-            for field_name in existing - allowed:
-                self.fields.pop(field_name)
-
-        #  Take care of read_only fields
-        if read_only_fields is not None:
-            for f in read_only_fields:
-                try:
-                    self.fields[f].read_only = True
-                except KeyError:
-                    # not in fields anyway
-                    pass
-
-
-class CommentSerializer(serializers.ModelSerializer):
+            allowed = set(self.field_names)
+            fields = {name: field for name, field in fields.items() if name in allowed}
+        for name in self.json_keys:
+            if not isinstance(fields.get(name), serializers.JSONField):
+                raise ValueError(f"Keys can only be selected from JSON fields, not {name!r}")
+        return fields
+
+    def to_representation(self, instance):
+        representation = super().to_representation(instance)
+        for name, keys in self.json_keys.items():
+            value = representation.get(name) or {}
+            representation[name] = {key: value.get(key) for key in keys}
+        return representation
+
+    @classmethod
+    def values_plan(cls, fields=None, read_only_fields=None):
+        """Return the cached `ValuesPlan` rendering `.values()` rows like this serializer with these fields"""
+        key = (cls, tuple(fields) if fields is not None else None)
+        # The fields come from the clients with sparse fieldsets, so the cache is bounded
+        return cached(
+            ValuesPlan.cache,
+            key,
+            lambda: ValuesPlan(cls(fields=fields, read_only_fields=read_only_fields)),
+            ValuesPlan.cache_size,
+        )
+
+
+class ValuesPlan:
+    """
+    Read path of a serializer for lists: renders the rows of `plan.values(queryset)` without instantiating
+    the models, and without the per-field overhead of `Serializer.to_representation()`. The fields are
+    resolved once: the values of the fields which would return them unchanged are copied as they are,
+    the others are converted by their field. The selected keys of JSON fields are extracted by the
+    database. Relations aren't supported.
+    """
+
+    cache = {}
+    cache_size = 256
+    # Fields whose representation of the database value is the value itself
+    passthrough_fields = (serializers.IntegerField, serializers.CharField, serializers.JSONField)
+
+    def __init__(self, serializer):
+        self.columns = []
+        self.expressions = {}
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, (serializers.RelatedField, serializers.ManyRelatedField, serializers.BaseSerializer)):
+                raise ValueError(f"The relation {name!r} can't be rendered from values")
+            if field.source == "*" or len(field.source_attrs) != 1:
+                raise ValueError(f"The field {name!r} isn't a column")
+
+            source = field.source
+            if name in serializer.json_keys:
+                source = f"{field.source}_keys"
+                self.expressions[source] = JSONBuildObject(field.source, serializer.json_keys[name])
+            convert = None if type(field) in self.passthrough_fields else field.to_representation
+            self.columns.append((name, source, convert))
+
+    @property
+    def sources(self):
+        return tuple(dict.fromkeys(source for _, source, _ in self.columns if source not in self.expressions))
+
+    def values(self, queryset, *fields):
+        """`.values()` of the queryset with the columns of the plan and the additional fields"""
+        return queryset.values(*self.sources, *fields, **self.expressions)
+
+    def render(self, rows):
+        with track("serializer"):
+            return [
+                {
+                    name: row[source] if convert is None or row[source] is None else convert(row[source])
+                    for name, source, convert in self.columns
+                }
+                for row in rows
+            ]
+
+
+class CommentSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for the comment object"""
 
     class Meta:
         model = Comment
+        list_serializer_class = TimedListSerializer
         fields = ("movie", "body", "created")
         read_only_fields = ("created",)
 
 
-class MovieSerializer(DynamicFieldsModelSerializer):
+class BulkCommentSerializer(serializers.Serializer):
+    """Serializer for a comment of the comments created at once, the movies are checked for the whole chunk"""
+
+    movie = serializers.IntegerField(min_value=1)
+    body = serializers.CharField()
+
+
+class MovieSerializer(TimedSerializerMixin, DynamicFieldsModelSerializer):
     """Serializer for the movie object"""
 
     comments = serializers.StringRelatedField(many=True)
@@ -54,9 +216,18 @@ class MovieSerializer(DynamicFieldsModelSerializer):
 
     class Meta:
         model = Movie
-        fields = ("id", "movie_id", "title", "data", "total_comments", "rank", "comments")
-        read_only_fields = ("id", "movie_id", "total_comments", "rank", "comments")
+        list_serializer_class = TimedListSerializer
+        fields = ("id", "movie_id", "title", "data", "status", "fetched_at", "total_comments", "rank", "comments")
+        read_only_fields = ("id", "movie_id", "status", "fetched_at", "total_comments", "rank", "comments")
 
     def create(self, validated_data):
         """Create a new movie with and return it"""
         return Movie.objects.create(**validated_data)
+
+
+class BulkMovieSerializer(serializers.Serializer):
+    """Serializer for the titles of movies imported at once"""
+
+    titles = serializers.ListField(
+        child=serializers.CharField(max_length=250), allow_empty=False, max_length=settings.MOVIES_BULK_MAX_TITLES
+    )
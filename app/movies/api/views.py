@@ -1,56 +1,122 @@
-import requests
+import re
+from collections.abc import Iterator
 from datetime import datetime
 
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from django.shortcuts import get_object_or_404, get_list_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from django.http.response import Http404
 
 from rest_framework import generics, status
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from config.settings import API_URL, API_KEY
-from .serializers import CommentSerializer, MovieSerializer
-from movies.models import Movie, Comment
+from .mixins import ConditionalGetMixin, PrefetchRelationsMixin, StreamingExportMixin
+from .pagination import KeysetPagination, SearchPagination
+from .parsers import FastJSONParser, NDJSONParser
+from .renderers import CSVRenderer, NDJSONRenderer
+from .serializers import BulkMovieSerializer, CommentSerializer, MovieSerializer
+from movies.cache import ranking_cache
+from movies.importer import import_movies
+from movies.ingest import ingest_comments
+from movies.models import FetchJob, Movie, Comment, day_start, parse_genres, trigram_available
+from movies.omdb import MovieNotFound, OMDbUnavailable, fetch_movie_data
+from movies.stats import INTERVALS, activity_stats, bucket_count, previous_window
 
 
 class ListCreateMovieAPIView(generics.ListCreateAPIView):
     """Create a new movie in the system, List all movies in the system"""
 
+    pagination_class = KeysetPagination
+
     def get_serializer(self, *args, **kwargs):
         kwargs["context"] = self.get_serializer_context()
 
-        kwargs["fields"] = ("id", "title", "data")
+        kwargs["fields"] = self.get_serializer_fields()
         # Pass`data` as ready_only_field so it's not required in the post request
         kwargs["read_only_fields"] = (
             "id",
             "data",
+            "status",
+            "comments",
         )
         return MovieSerializer(*args, **kwargs)
 
+    def get_serializer_fields(self):
+        fields = ("id", "title", "data")
+        # Sparse fieldsets, keys of `data` are extracted by the database, url example:
+        # movies/?fields=title,data.Year,data.imdbRating
+        if self.request.method == "GET" and "fields" in self.request.query_params:
+            fields = parse_sparse_fields(self.request.query_params["fields"], allowed=fields)
+        # Latest comments of every movie are included on demand, url example: movies/?include=comments
+        if self.request.method == "GET" and "comments" in self.request.query_params.getlist("include"):
+            fields += ("comments",)
+        # The created movie can be pending, when its data is fetched in the background
+        if self.request.method == "POST":
+            fields += ("status",)
+        return fields
+
+    def list(self, request, *args, **kwargs):
+        fields = self.get_serializer_fields()
+        if "comments" in fields:
+            return super().list(request, *args, **kwargs)
+
+        # Without relations the page is rendered straight from `.values()` rows, the ordering fields of the
+        # paginator (`id` included) are fetched as well for the cursor of the next page, but not rendered
+        queryset = self.get_queryset()
+        plan = MovieSerializer.values_plan(fields)
+        ordering = [field for field, _ in self.paginator.get_ordering(queryset)]
+        page = self.paginate_queryset(plan.values(queryset, *ordering))
+        return self.get_paginated_response(plan.render(page))
+
+    def paginate_queryset(self, queryset):
+        # The latest comments are looked up for the movies of the page only, once the page is fetched
+        page = super().paginate_queryset(queryset)
+        if "comments" in self.get_serializer_fields():
+            latest_comments = Comment.objects.latest_per_movie(
+                [movie.id for movie in page], settings.MOVIES_LIST_COMMENTS
+            )
+            prefetch_related_objects(page, Prefetch("comments", queryset=latest_comments))
+        return page
+
     def get_queryset(self):
         """Retrieve the movies"""
-        genre = self.request.query_params.get("genre")
+        genres = parse_genres(",".join(self.request.query_params.getlist("genre")))
         orderby = self.request.query_params.get("orderby")
 
-        # Simple filter based on genres, url example: movies/?genre=Drama, movies/?genre=Drama&genre=Fantasy etc.
-        if genre:
-            queryset = get_list_or_404(Movie, data__Genre__icontains=genre)
-        else:
-            queryset = get_list_or_404(Movie)
+        # Filter based on the indexed genres, url example: movies/?genre=Drama, movies/?genre=Drama&genre=Fantasy
+        # (movies with all the genres) or movies/?genre=Drama&genre=Fantasy&genre_match=any (with any of them)
+        queryset = Movie.objects.all()
+        if genres:
+            lookup = "genres__overlap" if self.request.query_params.get("genre_match") == "any" else "genres__contains"
+            queryset = queryset.filter(**{lookup: genres})
 
-        # Simple sort by any numeric value, best to use Year or Metascore, url example: movies/?orderby=Year,
-        # movies/?orderby=Metascore etc.
+        # Sort by the typed and indexed OMDb values, descending with "-", url example: movies/?orderby=Year,
+        # movies/?orderby=-Metascore, movies/?orderby=-imdbRating etc. Movies without the value come last.
         if orderby:
-            queryset = queryset.order_by(f"data__{orderby}")
+            field = Movie.SORTABLE_FIELDS.get(orderby.lstrip("-"))
+            if field is None:
+                raise ValidationError({"orderby": f"Movies can be sorted by: {', '.join(Movie.SORTABLE_FIELDS)}"})
+            queryset = queryset.order_by(f"-{field}" if orderby.startswith("-") else field)
 
+        # The queryset stays lazy, only the requested page is fetched by the paginator
         return queryset
 
     def create(self, request):
         """Create a movie in database with data fetched from external api"""
+        # The data can be fetched in the background instead, url example: movies/?defer=true
+        if self.request.query_params.get("defer", "").lower() in ("1", "true", "yes"):
+            return self.create_pending(request)
+
         try:
             fetched_data = fetch_movie_data(self.request.data["title"])
-        except KeyError:
+        except (KeyError, MovieNotFound):
             return Response({"message": "Movie not found, try different title"}, status=status.HTTP_404_NOT_FOUND)
-        except ConnectionError:
+        except OMDbUnavailable:
             return Response(
                 {"message": "Movies database is currently unavailable, please try again later"},
                 status=status.HTTP_400_BAD_REQUEST,
@@ -65,8 +131,59 @@ class ListCreateMovieAPIView(generics.ListCreateAPIView):
 
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    def create_pending(self, request):
+        """Create a pending movie in database and queue fetching its data, poll `movies/<id>/status` for the result"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        with transaction.atomic():
+            movie = serializer.save(status=Movie.Status.PENDING, fetched_at=None)
+            FetchJob.objects.enqueue([movie.id])
+
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+
+class ExportMoviesAPIView(StreamingExportMixin, generics.GenericAPIView):
+    """
+    Export all movies as NDJSON (default) or CSV, url example: movies/export?format=csv.
+    Only the movies added after a known one are exported with `since_id`, e.g. movies/export?since_id=100,
+    and only the movies changed (also by their comments) with `since`, e.g. movies/export?since=2020-12-01
+    """
+
+    renderer_classes = (NDJSONRenderer, CSVRenderer)
+    export_fields = ("id", "title", "data", "status", "fetched_at", "updated")
+    export_name = "movies"
+
+    def get_queryset(self):
+        queryset = Movie.objects.order_by("id")
+        since_id = parse_since_id(self.request)
+        if since_id is not None:
+            queryset = queryset.filter(id__gt=since_id)
+
+        since = parse_since(self.request)
+        if since is not None:
+            queryset = queryset.filter(updated__gte=since)
+        return queryset
+
+
+class BulkCreateMovieAPIView(generics.GenericAPIView):
+    """Create many movies in the system at once, with data fetched concurrently from external api"""
+
+    serializer_class = BulkMovieSerializer
 
-class RetrieveUpdateDestroyMovieAPIView(generics.RetrieveUpdateDestroyAPIView):
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        results = [
+            {"title": title, "status": result} for title, result in import_movies(serializer.validated_data["titles"])
+        ]
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+
+class RetrieveUpdateDestroyMovieAPIView(
+    ConditionalGetMixin, PrefetchRelationsMixin, generics.RetrieveUpdateDestroyAPIView
+):
     """Update or delete a movie in the system"""
 
     def get_serializer(self, *args, **kwargs):
@@ -81,9 +198,22 @@ class RetrieveUpdateDestroyMovieAPIView(generics.RetrieveUpdateDestroyAPIView):
         kwargs["read_only_fields"] = ("id", "title", "comments")
         return MovieSerializer(*args, **kwargs)
 
+    def get_prefetch_relations(self):
+        return {"comments": Prefetch("comments", queryset=Comment.objects.all())}
+
+    def get_queryset(self):
+        """Retrieve the movies, with the relations prefetched for reading"""
+        queryset = Movie.objects.all()
+        # Updates and deletes don't serialize the prefetched relations
+        return self.prefetch_relations(queryset) if self.request.method == "GET" else queryset
+
     def get_object(self):
         """Retrieve and return the movie"""
-        return get_object_or_404(Movie, pk=self.kwargs.get("id"))
+        return get_object_or_404(self.get_queryset(), pk=self.kwargs.get("id"))
+
+    def get_last_modified(self):
+        """Changes of the movie and of its comments are tracked by `Movie.updated`"""
+        return Movie.objects.filter(pk=self.kwargs.get("id")).values_list("updated", flat=True).first()
 
     def destroy(self, *args, **kwargs):
         super().destroy(*args, **kwargs)
@@ -92,31 +222,80 @@ class RetrieveUpdateDestroyMovieAPIView(generics.RetrieveUpdateDestroyAPIView):
         )
 
 
+class RetrieveMovieStatusAPIView(generics.RetrieveAPIView):
+    """Retrieve the status of the movie data, e.g. to poll a movie created with its data fetched in the background"""
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs["context"] = self.get_serializer_context()
+
+        kwargs["fields"] = ("id", "title", "status", "fetched_at")
+        return MovieSerializer(*args, **kwargs)
+
+    def get_object(self):
+        """Retrieve and return the movie"""
+        return get_object_or_404(Movie.objects.only("id", "title", "status", "fetched_at"), pk=self.kwargs.get("id"))
+
+
 class ListTopMoviesAPIView(generics.ListAPIView):
-    """Retrieve top movies ranked on amount of comments"""
+    """
+    Retrieve top movies ranked on amount of comments, optionally only the `limit` best ranked ones or the rank
+    of a single movie with `movie_id`
+    """
+
+    ranking_fields = ("movie_id", "total_comments", "rank")
+    max_limit = 1000
+    # The ids of the movies are 32-bit integers
+    max_movie_id = 2 ** 31 - 1
 
     def get_serializer(self, *args, **kwargs):
         kwargs["context"] = self.get_serializer_context()
 
-        kwargs["fields"] = ("movie_id", "total_comments", "rank")
-        kwargs["read_only_fields"] = ("movie_id", "total_comments", "rank")
+        kwargs["fields"] = self.ranking_fields
+        kwargs["read_only_fields"] = self.ranking_fields
         return MovieSerializer(*args, **kwargs)
 
-    def get_queryset(self):
-        """Retrieve the ranking"""
+    def get_date_range(self):
+        """Parse the date range of the ranking from the query params"""
         date_format = "%Y-%m-%d"
         date_range_start, date_range_end = (
-            datetime.strptime(self.request.query_params.get("start"), date_format),
-            datetime.strptime(self.request.query_params.get("end"), date_format),
+            datetime.strptime(self.request.query_params.get("start"), date_format).date(),
+            datetime.strptime(self.request.query_params.get("end"), date_format).date(),
         )
 
         if date_range_start > date_range_end:
             raise ValueError
-        return Movie.objects.create_ranking(date_range_start, date_range_end)
+        return date_range_start, date_range_end
+
+    def get_queryset(self):
+        """Retrieve the ranking"""
+        return Movie.objects.create_ranking(*self.get_date_range())
+
+    def get_filters(self):
+        """Parse the optional `movie_id` and `limit` query params, narrowing down the ranking"""
+        filters = {}
+        for name, maximum, message in (
+            ("movie_id", self.max_movie_id, "Expected the id of a movie"),
+            ("limit", self.max_limit, f"Expected an amount of movies from 1 to {self.max_limit}"),
+        ):
+            if name not in self.request.query_params:
+                continue
+            try:
+                filters[name] = int(self.request.query_params[name])
+            except ValueError:
+                filters[name] = 0
+            if not 1 <= filters[name] <= maximum:
+                raise ValidationError({name: message})
+        return filters
+
+    def render_ranking(self, **filters):
+        """Render the ranking from `.values()` rows, like `get_serializer()` would"""
+        plan = MovieSerializer.values_plan(self.ranking_fields)
+        return plan.render(Movie.objects.ranked_values(plan.values(self.get_queryset()), **filters))
 
     def list(self, request, *args, **kwargs):
+        filters = self.get_filters()
         try:
-            queryset = self.get_queryset()
+            date_range_start, date_range_end = self.get_date_range()
         except ValueError:
             return Response(
                 {
@@ -137,8 +316,22 @@ class ListTopMoviesAPIView(generics.ListAPIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        if queryset:
-            return super().list(request, *args, **kwargs)
+        # The serialized ranking is cached per date range (and filters) and invalidated when a comment of the range
+        # is written
+        ranking = ranking_cache.get_or_set(
+            date_range_start,
+            date_range_end,
+            lambda: self.render_ranking(**filters),
+            variant=tuple(sorted(filters.items())) or None,
+        )
+
+        if ranking:
+            return Response(ranking)
+        elif "movie_id" in filters:
+            return Response(
+                {"message": "The movie has no comments for provided date range"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
         else:
             return Response(
                 {"message": "There are no comments for provided date range"},
@@ -146,11 +339,71 @@ class ListTopMoviesAPIView(generics.ListAPIView):
             )
 
 
-class ListCreateCommentAPIView(generics.ListCreateAPIView):
+class RankingCacheStatsAPIView(APIView):
+    """Retrieve the hit and miss counters of the movies ranking cache"""
+
+    def get(self, request):
+        return Response(ranking_cache.stats())
+
+
+class ActivityStatsAPIView(APIView):
+    """
+    Retrieve the comments per movie per day or week of a date range, with the trending movies: their growth
+    relative to the previous window of the same length. Either all the given movies, e.g. `movie_id=1,2`, or the
+    `limit` most trending ones.
+    """
+
+    max_buckets = 366
+    max_movies = 100
+
+    def get(self, request):
+        params = request.query_params
+        start_date, end_date = parse_date_param(request, "start"), parse_date_param(request, "end")
+        if start_date > end_date:
+            raise ValidationError({"end": "The end date can't be before the start date"})
+
+        interval = params.get("interval", "day")
+        if interval not in INTERVALS:
+            raise ValidationError({"interval": f"The interval can be one of: {', '.join(INTERVALS)}"})
+        if bucket_count(start_date, end_date, interval) > self.max_buckets:
+            raise ValidationError({"interval": f"The date range can have at most {self.max_buckets} buckets"})
+        try:
+            previous_window(start_date, end_date)
+        except OverflowError:
+            raise ValidationError({"start": "The date range has no previous window to compare with"})
+
+        movie_ids = None
+        if "movie_id" in params:
+            try:
+                movie_ids = {int(movie_id) for movie_id in params["movie_id"].split(",")}
+            except ValueError:
+                raise ValidationError({"movie_id": "Expected comma separated ids of movies"})
+            if len(movie_ids) > self.max_movies:
+                raise ValidationError({"movie_id": f"At most {self.max_movies} movies can be selected"})
+
+        try:
+            limit = int(params.get("limit", 10))
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= self.max_movies:
+            raise ValidationError({"limit": f"Expected an amount of movies from 1 to {self.max_movies}"})
+
+        return Response(activity_stats(start_date, end_date, interval, movie_ids, limit))
+
+
+class ListCreateCommentAPIView(ConditionalGetMixin, generics.ListCreateAPIView):
     """Create a new comment in the system, List all comments in the system"""
 
     serializer_class = CommentSerializer
 
+    def get_last_modified(self):
+        """The comments of a movie change together with its `Movie.updated`"""
+        try:
+            movie_id = int(self.request.query_params["movie_id"])
+        except (KeyError, ValueError):
+            return None
+        return Movie.objects.filter(pk=movie_id).values_list("updated", flat=True).first()
+
     def get_queryset(self):
         """Retrieve the comments"""
 
@@ -167,12 +420,134 @@ class ListCreateCommentAPIView(generics.ListCreateAPIView):
         return queryset
 
 
-def fetch_movie_data(title: str):
-    """Fetch data from external movie API"""
-    r = requests.get(f"{API_URL}{API_KEY}&t={title}")
-    fetched_data = r.json()
-    # If movie doesn't exist, field Title also doesn't exist and it
-    # raises KeyError which is cought in the create function
-    del fetched_data["Title"]
+class ExportCommentsAPIView(StreamingExportMixin, generics.GenericAPIView):
+    """
+    Export all comments as NDJSON (default) or CSV, url example: comments/export?format=csv.
+    Only the newer comments are exported with `since` (date or datetime) or `since_id`,
+    e.g. comments/export?since=2020-12-01, comments/export?since=2020-12-01T12:00:00Z, comments/export?since_id=100
+    """
+
+    renderer_classes = (NDJSONRenderer, CSVRenderer)
+    export_fields = ("id", "movie_id", "body", "created")
+    export_name = "comments"
+
+    def get_queryset(self):
+        queryset = Comment.objects.order_by("id")
+        since_id = parse_since_id(self.request)
+        if since_id is not None:
+            queryset = queryset.filter(id__gt=since_id)
+
+        since = parse_since(self.request)
+        if since is not None:
+            queryset = queryset.filter(created__gte=since)
+        return queryset
+
+
+class BulkCreateCommentAPIView(generics.GenericAPIView):
+    """Create many comments in the system at once, from a JSON array or a streamed NDJSON body"""
+
+    parser_classes = (FastJSONParser, NDJSONParser)
+
+    def post(self, request):
+        items = request.data
+        if not isinstance(items, (list, Iterator)):
+            raise ValidationError({"message": "Expected a list of comments"})
+
+        created, errors = ingest_comments(items)
+        return Response({"created": created, "errors": errors}, status=status.HTTP_200_OK)
+
+
+class SearchAPIView(generics.ListAPIView):
+    """Full-text search of the movies (by title, director, actors and plot) or of the comments"""
 
-    return fetched_data
+    pagination_class = SearchPagination
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs["context"] = self.get_serializer_context()
+
+        if self.get_search_type() == "comments":
+            return CommentSerializer(*args, **kwargs)
+
+        kwargs["fields"] = ("id", "title", "data")
+        kwargs["read_only_fields"] = ("id", "title", "data")
+        return MovieSerializer(*args, **kwargs)
+
+    def get_search_type(self):
+        search_type = self.request.query_params.get("type", "movies")
+        if search_type not in ("movies", "comments"):
+            raise ValidationError({"type": "Search type has to be either movies or comments"})
+        return search_type
+
+    def get_queryset(self):
+        """Retrieve the best matches, url example: search/?q=matrix, search/?q=great+acting&type=comments"""
+        text = self.request.query_params.get("q", "").strip()
+        if not text:
+            raise ValidationError({"q": "Please provide the text to search for. Example: search/?q=matrix"})
+
+        if self.get_search_type() == "comments":
+            return Comment.objects.search(text)
+
+        # Fuzzy title matching resolves typos locally, url example: search/?q=teh+matirx&fuzzy=true
+        if self.request.query_params.get("fuzzy", "").lower() in ("1", "true", "yes"):
+            if not trigram_available():
+                raise ValidationError({"fuzzy": "Fuzzy search isn't available, the pg_trgm extension is missing"})
+            return Movie.objects.similar_titles(text)
+
+        return Movie.objects.search(text)
+
+
+def parse_since_id(request):
+    """Parse the `since_id` query param of the exports"""
+    since_id = request.query_params.get("since_id")
+    if since_id is None:
+        return None
+    try:
+        return int(since_id)
+    except ValueError:
+        raise ValidationError({"since_id": "Expected the id of a row"})
+
+
+def parse_since(request):
+    """Parse the `since` query param of the exports, a date means its midnight in the current timezone"""
+    since = request.query_params.get("since")
+    if since is None:
+        return None
+    try:
+        moment = parse_datetime(since) or parse_date(since)
+    except ValueError:
+        moment = None
+    if moment is None:
+        raise ValidationError({"since": "Expected a date (YYYY-MM-DD) or an ISO 8601 datetime"})
+
+    if not isinstance(moment, datetime):
+        return day_start(moment)
+    return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+
+
+def parse_date_param(request, name):
+    """Parse a required date (YYYY-MM-DD) query param"""
+    try:
+        value = parse_date(request.query_params.get(name, ""))
+    except ValueError:
+        value = None
+    if value is None:
+        raise ValidationError({name: "Expected a date (YYYY-MM-DD)"})
+    return value
+
+
+# Keys of the OMDb data, e.g. "Year", "imdbRating"
+SPARSE_KEY = re.compile(r"\w{1,50}")
+
+
+def parse_sparse_fields(value, allowed):
+    """Parse the comma separated `fields` query param, e.g. `title,data.Year`, raise ValidationError if invalid"""
+    fields = tuple(dict.fromkeys(field.strip() for field in value.split(",") if field.strip()))
+    for field in fields:
+        name, dot, key = field.partition(".")
+        if name not in allowed or (dot and (name != "data" or not SPARSE_KEY.fullmatch(key))):
+            raise ValidationError(
+                {"fields": f"Fields can be selected from: {', '.join(allowed)} and keys of data, e.g. data.Year"}
+            )
+    if not fields:
+        raise ValidationError({"fields": "Select at least one field"})
+    return fields
@@ -0,0 +1,307 @@
+import math
+import random
+import statistics
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from datetime import timedelta
+
+from django.db import connection, connections
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from movies.cache import ranking_cache
+from movies.importer import batches
+from movies.metrics import RequestMetrics
+from movies.models import Comment, DailyCommentCount, Movie, day_start
+
+GENRES = ("Action", "Adventure", "Comedy", "Crime", "Drama", "Fantasy", "Horror", "Romance", "Sci-Fi", "Thriller")
+# How the comments are spread over the days: evenly, or most of them in the last days like real activity
+DATE_DISTRIBUTIONS = ("uniform", "recent")
+# How the comments are spread over the movies: evenly, or few popular movies get most of them (Zipf)
+MOVIE_DISTRIBUTIONS = ("uniform", "zipf")
+
+
+def movie_data(rng):
+    """Random OMDb-like data of a movie"""
+    return {
+        "Year": str(rng.randint(1950, 2020)),
+        "Genre": ", ".join(rng.sample(GENRES, rng.randint(1, 3))),
+        "Metascore": str(rng.randint(20, 100)),
+        "imdbRating": f"{rng.uniform(2, 9.5):.1f}",
+        "Director": f"Director {rng.randint(1, 500)}",
+        "Plot": "A generated movie for the benchmarks.",
+    }
+
+
+def generate_data(
+    prefix, movies, comments, days=365, date_distribution="uniform", movie_distribution="zipf", seed=0, batch_size=5000
+):
+    """
+    Create `movies` movies titled "<prefix> <n>" and `comments` comments spread over the last `days` days.
+
+    The data is random but reproducible: the same seed generates the same data. The first comments are one
+    on every day, so every date range within the days has comments whatever the time of the day. Comments are
+    inserted without the signals, so like the bulk comments endpoint the comment counts are updated per batch.
+    Returns the ids of the movies.
+    """
+    rng = random.Random(seed)
+    created = [Movie(title=f"{prefix} {i}", data=movie_data(rng)) for i in range(movies)]
+    for movie in created:
+        movie.extract_data_fields()
+    Movie.objects.bulk_create(created, batch_size=batch_size)
+    movie_ids = [movie.id for movie in created]
+
+    weights = [1 / rank for rank in range(1, movies + 1)] if movie_distribution == "zipf" else None
+    now = timezone.now()
+    span = timedelta(days=days).total_seconds()
+
+    def comment_age(rng):
+        if date_distribution == "recent":
+            # Half of the comments in the last tenth of the span
+            return min(rng.expovariate(10 * math.log(2) / span), span)
+        return rng.uniform(0, span)
+
+    today = timezone.localdate(now)
+
+    def comment_created(number):
+        if number <= days:
+            return day_start(today - timedelta(days=number))
+        return now - timedelta(seconds=comment_age(rng))
+
+    days_commented = set()
+    for numbers in batches(range(comments), batch_size):
+        batch = [
+            Comment(movie_id=movie_id, body=f"Benchmark comment {number}", created=created)
+            for number, movie_id, created in zip(
+                numbers,
+                rng.choices(movie_ids, weights, k=len(numbers)),
+                [comment_created(number) for number in numbers],
+            )
+        ]
+        insert_comments(batch)
+        counts = Counter((comment.movie_id, timezone.localdate(comment.created)) for comment in batch)
+        DailyCommentCount.objects.add_many(counts)
+        Movie.objects.add_comments(batch)
+        days_commented.update(day for _, day in counts)
+
+    for day in days_commented:
+        ranking_cache.invalidate(day)
+    return movie_ids
+
+
+def insert_comments(comments):
+    # `created` is `auto_now_add`, which `bulk_create` would overwrite
+    table = Comment._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (movie_id, body, created) VALUES {', '.join(['(%s, %s, %s)'] * len(comments))}",
+            [value for comment in comments for value in (comment.movie_id, comment.body, comment.created)],
+        )
+
+
+def delete_data(prefix, days=365):
+    """Delete the movies titled "<prefix> ..." with their comments"""
+    movie_ids = list(Movie.objects.filter(title__startswith=f"{prefix} ").values_list("id", flat=True))
+    # Deleting the comments through the ORM would send a signal for each of them
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {Comment._meta.db_table} WHERE movie_id = ANY(%s)", [movie_ids])
+    Movie.objects.filter(id__in=movie_ids).delete()
+
+    today = timezone.localdate()
+    for offset in range(days + 1):
+        ranking_cache.invalidate(today - timedelta(days=offset))
+
+
+class Scenario:
+    """
+    Requests of an endpoint driven by the benchmark. `build()` returns the `(method, url, data)` of the
+    requests, picked at random from the generated data, so a seed repeats the same requests.
+    """
+
+    name = None
+    method = "get"
+
+    def __init__(self, movie_ids, days, prefix):
+        self.movie_ids = movie_ids
+        self.days = days
+        self.prefix = prefix
+
+    def build(self, rng, requests):
+        return [(self.method, *self.request(rng, number)) for number in range(requests)]
+
+    def request(self, rng, number):
+        raise NotImplementedError
+
+    def popular_movie(self, rng):
+        # The movies with the lowest numbers get most of the comments with the Zipf distribution
+        return self.movie_ids[min(int(rng.paretovariate(1)) - 1, len(self.movie_ids) - 1)]
+
+
+class MoviesListScenario(Scenario):
+    name = "movies_list"
+    orderings = (None, "-Year", "imdbRating", "-comments")
+
+    def request(self, rng, number):
+        params = {"genre": rng.choice(GENRES)} if rng.random() < 0.3 else {}
+        orderby = rng.choice(self.orderings)
+        if orderby:
+            params["orderby"] = orderby
+        return reverse("list_create_movie"), params
+
+
+class MovieDetailScenario(Scenario):
+    name = "movie_detail"
+
+    def request(self, rng, number):
+        return reverse("retrieve_update_destroy_movie", args=[self.popular_movie(rng)]), {}
+
+
+class CommentsListScenario(Scenario):
+    name = "comments_list"
+
+    def request(self, rng, number):
+        return reverse("list_create_comment"), {"movie_id": self.popular_movie(rng)}
+
+
+class TopScenario(Scenario):
+    name = "top"
+
+    def request(self, rng, number):
+        # A few ranges within the generated days are requested again and again, like the default ranges of a client
+        today = timezone.localdate()
+        end = today - timedelta(days=min(rng.choice((0, 0, 0, 1, 7)), self.days))
+        start = max(end - timedelta(days=rng.choice((1, 7, 30)) - 1), today - timedelta(days=self.days))
+        return reverse("list_top_movies"), {"start": start.isoformat(), "end": end.isoformat()}
+
+
+class CommentCreateScenario(Scenario):
+    name = "comment_create"
+    method = "post"
+
+    def request(self, rng, number):
+        return reverse("list_create_comment"), {"movie": self.popular_movie(rng), "body": f"Benchmark {number}"}
+
+
+class MovieCreateScenario(Scenario):
+    """Movies created with their data fetched from the stub OMDb, titles are in `omdb_movies()`"""
+
+    name = "movie_create"
+    method = "post"
+
+    def request(self, rng, number):
+        return reverse("list_create_movie"), {"title": self.title(number)}
+
+    def title(self, number):
+        return f"{self.prefix} created {number}"
+
+    def omdb_movies(self, rng, requests):
+        return {self.title(number): movie_data(rng) for number in range(requests)}
+
+
+SCENARIOS = {
+    scenario.name: scenario
+    for scenario in (
+        MoviesListScenario,
+        MovieDetailScenario,
+        CommentsListScenario,
+        TopScenario,
+        CommentCreateScenario,
+        MovieCreateScenario,
+    )
+}
+
+
+def run_requests(requests, concurrency):
+    """
+    Send the `(method, url, data)` requests with `concurrency` threads, each with its own test client and
+    database connection. Returns the run time and a `(status_code, duration, queries)` result per request.
+    """
+
+    def send(chunk):
+        client = Client()
+        results = []
+        for method, url, data in chunk:
+            request_metrics = RequestMetrics()
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(request_metrics.record_query))
+                started = time.perf_counter()
+                response = getattr(client, method)(url, data)
+                duration = time.perf_counter() - started
+            results.append((response.status_code, duration, request_metrics.queries))
+        return results
+
+    def send_in_thread(chunk):
+        try:
+            return send(chunk)
+        finally:
+            # The connections of the thread aren't reused once the scenario is over
+            if threading.current_thread() is not threading.main_thread():
+                connections.close_all()
+
+    started = time.perf_counter()
+    if concurrency == 1:
+        results = send(requests)
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            chunks = executor.map(send_in_thread, [requests[i::concurrency] for i in range(concurrency)])
+            results = [result for chunk in chunks for result in chunk]
+    return time.perf_counter() - started, results
+
+
+def percentile(values, percent):
+    """Nearest-rank percentile of the sorted values"""
+    return values[max(math.ceil(percent / 100 * len(values)) - 1, 0)] if values else None
+
+
+def summarize(elapsed, results, concurrency):
+    durations = sorted(duration for _, duration, _ in results)
+    queries = [amount for _, _, amount in results]
+    statuses = Counter(str(status_code) for status_code, _, _ in results)
+    return {
+        "requests": len(results),
+        "concurrency": concurrency,
+        "errors": sum(count for status_code, count in statuses.items() if int(status_code) >= 400),
+        "statuses": dict(sorted(statuses.items())),
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(len(results) / elapsed, 1) if elapsed else None,
+        "latency_ms": {
+            "mean": round(statistics.mean(durations) * 1000, 2),
+            "p50": round(percentile(durations, 50) * 1000, 2),
+            "p95": round(percentile(durations, 95) * 1000, 2),
+            "p99": round(percentile(durations, 99) * 1000, 2),
+            "max": round(durations[-1] * 1000, 2),
+        },
+        "queries_per_request": {"mean": round(statistics.mean(queries), 2), "max": max(queries)},
+    }
+
+
+def compare(results, baseline):
+    """
+    Relative change of the latency percentiles, throughput and queries of every scenario against the
+    results of a previous run, e.g. 0.1 is 10% more than the baseline.
+    """
+
+    def change(value, base):
+        return round((value - base) / base, 3) if value is not None and base else None
+
+    changes = {}
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        changes[name] = {
+            **{
+                f"latency_{key}": change(result["latency_ms"][key], base["latency_ms"][key])
+                for key in ("p50", "p95", "p99")
+            },
+            "requests_per_second": change(result["requests_per_second"], base["requests_per_second"]),
+            "queries_per_request": change(
+                result["queries_per_request"]["mean"], base["queries_per_request"]["mean"]
+            ),
+        }
+    return changes
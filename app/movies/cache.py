@@ -0,0 +1,115 @@
+import calendar
+import hashlib
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+
+from config.db.replicas import use_primary
+
+
+class RankingCache:
+    """
+    Cache of the serialized movies ranking, keyed by the date range.
+
+    Every comment write bumps the generation counters of its day, month and year. The cache key of a range
+    contains the generations of the whole years, whole months and single days the range is made of, so a write
+    invalidates exactly the ranges containing its day. Ranges which end before today can't get new comments
+    anymore and are cached without a timeout. The generations are kept in a cache of their own, which must not
+    evict them: an evicted generation would bring back the key of an older payload. Other payloads calculated
+    from the daily comment counts, e.g. the activity stats, are cached with a `variant` next to the rankings and
+    invalidated the same way.
+    """
+
+    key_prefix = "ranking"
+
+    def __init__(self, alias="ranking", generations_alias="ranking_generations"):
+        self.alias = alias
+        self.generations_alias = generations_alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @property
+    def generations(self):
+        """Cache of the generation counters, apart from the payloads which can be evicted"""
+        return caches[self.generations_alias]
+
+    def get_or_set(self, start_date, end_date, default, variant=None):
+        """
+        Return the cached ranking payload for the date range, or calculate it with `default()` on the primary
+        database and cache it.
+        The `variant` (any repr-able value) tells apart different payloads of the same date range.
+        """
+        key = self.make_key(start_date, end_date, variant)
+        payload = self.cache.get(key)
+        if payload is not None:
+            self.count("hits")
+            return payload
+
+        self.count("misses")
+        # Calculated on the primary: cached for good, a payload of a lagging replica would stay stale
+        with use_primary():
+            payload = default()
+        timeout = None if end_date < timezone.localdate() else settings.RANKING_CACHE_TIMEOUT
+        self.cache.set(key, payload, timeout)
+        return payload
+
+    def invalidate(self, day):
+        """Invalidate all the cached ranges which contain the given day, once the current transaction is committed"""
+        # Bumped before the commit, a concurrent request could cache the old counts under the new generations
+        transaction.on_commit(lambda: self.bump_generations(day))
+
+    def bump_generations(self, day):
+        for segment in (f"{day.year}", f"{day.year}-{day.month:02}", day.isoformat()):
+            key = self.generation_key(segment)
+            self.generations.add(key, 0, None)
+            self.generations.incr(key)
+
+    def stats(self):
+        keys = [self.counter_key("hits"), self.counter_key("misses")]
+        hits, misses = (self.cache.get_many(keys).get(key, 0) for key in keys)
+        return {"hits": hits, "misses": misses, "hit_ratio": hits / (hits + misses) if hits + misses else None}
+
+    def count(self, counter):
+        key = self.counter_key(counter)
+        self.cache.add(key, 0, None)
+        self.cache.incr(key)
+
+    def make_key(self, start_date, end_date, variant=None):
+        # There are no writes to the days after today, so they don't need generations
+        segments = self.segments(start_date, min(end_date, timezone.localdate()))
+        generations = self.generations.get_many([self.generation_key(segment) for segment in segments])
+        state = sorted(generations.items()) if variant is None else (sorted(generations.items()), variant)
+        digest = hashlib.md5(repr(state).encode()).hexdigest()
+        return f"{self.key_prefix}:{start_date.isoformat()}:{end_date.isoformat()}:{digest}"
+
+    @staticmethod
+    def segments(start_date, end_date):
+        """Split the date range into whole years, whole months and single days"""
+        segments = []
+        day = start_date
+        while day <= end_date:
+            end_of_month = date(day.year, day.month, calendar.monthrange(day.year, day.month)[1])
+            if (day.month, day.day) == (1, 1) and date(day.year, 12, 31) <= end_date:
+                segments.append(f"{day.year}")
+                day = date(day.year, 12, 31)
+            elif day.day == 1 and end_of_month <= end_date:
+                segments.append(f"{day.year}-{day.month:02}")
+                day = end_of_month
+            else:
+                segments.append(day.isoformat())
+            day += timedelta(days=1)
+        return segments
+
+    def generation_key(self, segment):
+        return f"{self.key_prefix}:generation:{segment}"
+
+    def counter_key(self, counter):
+        return f"{self.key_prefix}:{counter}"
+
+
+ranking_cache = RankingCache()
@@ -0,0 +1,74 @@
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+
+from movies.models import Movie
+from movies.omdb import MovieNotFound, OMDbUnavailable, fetch_movie_data
+
+CREATED = "created"
+EXISTS = "exists"
+NOT_FOUND = "not_found"
+UNAVAILABLE = "unavailable"
+INVALID = "invalid"
+
+
+def import_movies(titles, workers=None, batch_size=None):
+    """
+    Import the movies with the given titles, fetching their data from the external movie API concurrently.
+
+    Titles are processed in batches: the ones already in the database are skipped with a single query,
+    the rest is fetched with a bounded thread pool and inserted with one `bulk_create`. Yields a
+    `(title, status)` pair for every unique title. A movie created concurrently by another request
+    is still reported as created, the conflicting insert is ignored.
+    """
+    workers = workers or settings.MOVIES_IMPORT_WORKERS
+    batch_size = batch_size or settings.MOVIES_IMPORT_BATCH_SIZE
+    max_length = Movie._meta.get_field("title").max_length
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for batch in batches(unique_titles(titles), batch_size):
+            existing = set(Movie.objects.filter(title__in=batch).values_list("title", flat=True))
+            missing = [title for title in batch if title not in existing and len(title) <= max_length]
+            fetched = dict(zip(missing, executor.map(fetch, missing)))
+
+            movies = [Movie(title=title, data=data) for title, data in fetched.items() if isinstance(data, dict)]
+            for movie in movies:
+                movie.extract_data_fields()
+            Movie.objects.bulk_create(movies, ignore_conflicts=True)
+
+            for title in batch:
+                if title in existing:
+                    yield title, EXISTS
+                elif title not in fetched:
+                    yield title, INVALID
+                else:
+                    yield title, CREATED if isinstance(fetched[title], dict) else fetched[title]
+
+
+def fetch(title):
+    """Fetch the movie data, return the import status instead on failure"""
+    try:
+        return fetch_movie_data(title)
+    except MovieNotFound:
+        return NOT_FOUND
+    except OMDbUnavailable:
+        return UNAVAILABLE
+
+
+def unique_titles(titles):
+    seen = set()
+    for title in titles:
+        title = title.strip()
+        if title and title not in seen:
+            seen.add(title)
+            yield title
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
@@ -0,0 +1,58 @@
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from movies.api.serializers import BulkCommentSerializer
+from movies.cache import ranking_cache
+from movies.importer import batches
+from movies.models import Comment, DailyCommentCount, Movie
+
+
+def ingest_comments(items, chunk_size=None):
+    """
+    Create the comments from an iterable of `{"movie": id, "body": text}` items, e.g. a streamed request body.
+
+    Items are processed in chunks: the movies of a chunk are checked with a single query, its comments are
+    inserted with one `bulk_create` and its daily comment counts are updated with one upsert, all the chunks
+    in one transaction. Invalid items are skipped. Returns the amount of created comments and a list of
+    `{"index", "errors"}` of the invalid items.
+    """
+    chunk_size = chunk_size or settings.COMMENTS_BULK_CHUNK_SIZE
+    serializer = BulkCommentSerializer()
+    created, errors, days = 0, [], set()
+
+    with transaction.atomic():
+        for chunk in batches(enumerate(items), chunk_size):
+            valid = []
+            for index, item in chunk:
+                try:
+                    valid.append((index, serializer.run_validation(item)))
+                except ValidationError as e:
+                    errors.append({"index": index, "errors": e.detail})
+
+            movie_ids = set(
+                Movie.objects.filter(id__in={data["movie"] for _, data in valid}).values_list("id", flat=True)
+            )
+            comments = []
+            for index, data in valid:
+                if data["movie"] in movie_ids:
+                    comments.append(Comment(movie_id=data["movie"], body=data["body"]))
+                else:
+                    message = f'Invalid pk "{data["movie"]}" - object does not exist.'
+                    errors.append({"index": index, "errors": {"movie": [message]}})
+
+            # `bulk_create` doesn't send the signals which keep the ranking up to date, so it's done here
+            Comment.objects.bulk_create(comments)
+            counts = Counter((comment.movie_id, timezone.localdate(comment.created)) for comment in comments)
+            DailyCommentCount.objects.add_many(counts)
+            Movie.objects.add_comments(comments)
+            days.update(day for _, day in counts)
+            created += len(comments)
+
+    for day in days:
+        ranking_cache.invalidate(day)
+
+    return created, sorted(errors, key=lambda error: error["index"])
@@ -0,0 +1,104 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from movies.importer import batches
+from movies.models import FetchJob, Movie
+from movies.omdb import MovieNotFound, OMDbError, fetch_movie_data
+
+READY = "ready"
+FAILED = "failed"
+RETRY = "retry"
+SKIPPED = "skipped"
+
+
+def run_worker(workers=None, batch_size=None, poll_interval=None, refresh_interval=None, once=False):
+    """
+    Consume the queued fetch jobs, yield a `(title, status)` pair for every processed job.
+
+    Jobs are claimed in batches and their data is fetched with a bounded thread pool, several workers can run
+    at once. Every `refresh_interval` seconds the movies with stale data are queued again. With `once` the
+    worker returns as soon as there are no due jobs, instead of polling for new ones.
+    """
+    workers = workers or settings.MOVIES_FETCH_WORKERS
+    batch_size = batch_size or settings.MOVIES_FETCH_BATCH_SIZE
+    poll_interval = settings.MOVIES_FETCH_POLL_INTERVAL if poll_interval is None else poll_interval
+    refresh_interval = settings.MOVIES_REFRESH_INTERVAL if refresh_interval is None else refresh_interval
+
+    refreshed_at = None
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while True:
+            if refreshed_at is None or time.monotonic() - refreshed_at >= refresh_interval:
+                enqueue_stale()
+                refreshed_at = time.monotonic()
+
+            jobs = FetchJob.objects.claim(batch_size, settings.MOVIES_FETCH_LEASE)
+            for job, result in zip(jobs, executor.map(fetch, [job.movie.title for job in jobs])):
+                yield job.movie.title, complete(job, result)
+
+            if not jobs:
+                if once:
+                    return
+                time.sleep(poll_interval)
+
+
+def enqueue_stale(max_age=None, batch_size=1000):
+    """Queue fetching the movies whose data is older than `max_age` seconds, return the amount of them"""
+    max_age = settings.MOVIES_DATA_MAX_AGE if max_age is None else max_age
+    stale = Movie.objects.filter(status=Movie.Status.READY, fetched_at__lt=timezone.now() - timedelta(seconds=max_age))
+
+    queued = 0
+    for movie_ids in batches(stale.values_list("id", flat=True).iterator(chunk_size=batch_size), batch_size):
+        FetchJob.objects.enqueue(movie_ids)
+        queued += len(movie_ids)
+    return queued
+
+
+def fetch(title):
+    """Fetch the movie data, return the exception instead on failure"""
+    try:
+        return fetch_movie_data(title)
+    except OMDbError as e:
+        return e
+
+
+def complete(job, result):
+    """Store the fetched data or the failure of the job, return its status"""
+    movie = job.movie
+    if isinstance(result, dict):
+        movie.data = result
+        movie.extract_data_fields()
+        finish(
+            job,
+            data=movie.data,
+            genres=movie.genres,
+            year=movie.year,
+            metascore=movie.metascore,
+            imdb_rating=movie.imdb_rating,
+            status=Movie.Status.READY,
+            fetched_at=timezone.now(),
+        )
+        return READY
+
+    attempts = job.attempts + 1
+    if not isinstance(result, MovieNotFound) and attempts < settings.MOVIES_FETCH_MAX_ATTEMPTS:
+        run_at = timezone.now() + timedelta(seconds=settings.MOVIES_FETCH_RETRY_DELAY * 2 ** (attempts - 1))
+        FetchJob.objects.filter(id=job.id).update(attempts=attempts, run_at=run_at, last_error=str(result))
+        return RETRY
+
+    # A refresh which failed keeps the data the movie already has, until the next refresh
+    if movie.status == Movie.Status.PENDING:
+        finish(job, status=Movie.Status.FAILED)
+        return FAILED
+    finish(job, fetched_at=timezone.now())
+    return SKIPPED
+
+
+def finish(job, **fields):
+    with transaction.atomic():
+        Movie.objects.filter(id=job.movie_id).update(updated=timezone.now(), **fields)
+        FetchJob.objects.filter(id=job.id).delete()
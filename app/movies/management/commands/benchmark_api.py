@@ -0,0 +1,127 @@
+import json
+import random
+import subprocess
+import time
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from django.utils import timezone
+
+from movies.benchmark import (
+    DATE_DISTRIBUTIONS,
+    MOVIE_DISTRIBUTIONS,
+    SCENARIOS,
+    compare,
+    delete_data,
+    generate_data,
+    run_requests,
+    summarize,
+)
+from movies.stub_omdb import StubOMDbServer
+
+
+class Command(BaseCommand):
+    """
+    Django command to benchmark the main endpoints of the API. It generates movies and comments, starts a stub
+    of the external movie API, then sends the requests of every scenario with concurrent clients and reports
+    the latency percentiles, the throughput and the database queries per request. The data and the requests
+    only depend on `--seed`, so runs on different commits are comparable, e.g. with `--compare`.
+    """
+
+    help = "Benchmark the API endpoints on generated data, print the results as JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--movies", type=int, default=1000, help="Amount of generated movies")
+        parser.add_argument("--comments", type=int, default=50000, help="Amount of generated comments")
+        parser.add_argument("--days", type=int, default=90, help="Amount of days the comments are spread over")
+        parser.add_argument("--date-distribution", choices=DATE_DISTRIBUTIONS, default="recent")
+        parser.add_argument("--movie-distribution", choices=MOVIE_DISTRIBUTIONS, default="zipf")
+        parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma separated scenarios to run")
+        parser.add_argument("--requests", type=int, default=500, help="Amount of requests of every scenario")
+        parser.add_argument("--concurrency", type=int, default=8, help="Amount of concurrent clients")
+        parser.add_argument("--latency", type=float, default=0.05, help="Latency of the stub movie API in seconds")
+        parser.add_argument("--seed", type=int, default=0, help="Seed of the generated data and requests")
+        parser.add_argument("--output", help="File to write the results to as well")
+        parser.add_argument("--compare", help="Results file of a previous run to compare with")
+        parser.add_argument("--keep", action="store_true", help="Keep the generated data")
+
+    def handle(self, *args, **options):
+        names = [name.strip() for name in options["scenarios"].split(",") if name.strip()]
+        unknown = set(names) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}, available: {', '.join(SCENARIOS)}")
+        baseline = None
+        if options["compare"]:
+            with open(options["compare"]) as file:
+                baseline = json.load(file)
+
+        prefix = f"Benchmark {uuid.uuid4().hex[:8]}"
+        try:
+            started = time.perf_counter()
+            movie_ids = generate_data(
+                prefix,
+                options["movies"],
+                options["comments"],
+                days=options["days"],
+                date_distribution=options["date_distribution"],
+                movie_distribution=options["movie_distribution"],
+                seed=options["seed"],
+            )
+            generated = time.perf_counter() - started
+
+            results = {}
+            scenarios = {name: SCENARIOS[name](movie_ids, options["days"], prefix) for name in names}
+            omdb_movies = {}
+            if "movie_create" in scenarios:
+                omdb_movies = scenarios["movie_create"].omdb_movies(random.Random(options["seed"]), options["requests"])
+            with StubOMDbServer(omdb_movies, latency=options["latency"]) as stub, override_settings(
+                API_URL=stub.url, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]
+            ):
+                for name, scenario in scenarios.items():
+                    requests = scenario.build(random.Random(f"{options['seed']} {name}"), options["requests"])
+                    elapsed, responses = run_requests(requests, options["concurrency"])
+                    results[name] = summarize(elapsed, responses, options["concurrency"])
+                    self.stderr.write(f"{name}: {results[name]['latency_ms']}")
+        finally:
+            if not options["keep"]:
+                delete_data(prefix, options["days"])
+
+        report = {
+            "commit": self.commit(),
+            "finished": timezone.now().isoformat(),
+            "options": {
+                key: options[key]
+                for key in (
+                    "movies",
+                    "comments",
+                    "days",
+                    "date_distribution",
+                    "movie_distribution",
+                    "requests",
+                    "concurrency",
+                    "latency",
+                    "seed",
+                )
+            },
+            "generation_seconds": round(generated, 3),
+            "results": results,
+        }
+        if baseline is not None:
+            report["compared_to"] = {"commit": baseline.get("commit"), "changes": compare(results, baseline["results"])}
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(output)
+        self.stdout.write(output)
+
+    @staticmethod
+    def commit():
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR, capture_output=True, text=True
+            ).stdout.strip() or None
+        except OSError:
+            return None
@@ -0,0 +1,79 @@
+import json
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from movies.models import Comment, DailyCommentCount, Movie
+
+
+class Command(BaseCommand):
+    """
+    Django command to show the plans and timings of the comment lookups, with EXPLAIN ANALYZE. With `--seed` it
+    first generates the fixture: movies and comments spread over the last `--days` days, e.g. 10M comments with
+    `--seed 10000000`. Run it before and after a migration to compare the plans.
+    """
+
+    help = "Print the EXPLAIN ANALYZE plans and timings of the comment lookups as JSON, optionally seeding comments"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=0, help="Amount of comments to generate first")
+        parser.add_argument("--movies", type=int, default=10000, help="Amount of movies the comments belong to")
+        parser.add_argument("--days", type=int, default=365, help="Amount of days the comments are spread over")
+        parser.add_argument("--batch-size", type=int, default=1000000, help="Amount of comments inserted at once")
+
+    def handle(self, *args, **options):
+        if options["seed"]:
+            self.seed(options["seed"], options["movies"], options["days"], options["batch_size"])
+
+        movie = Movie.objects.filter(comments__isnull=False).order_by("id").first()
+        if movie is None:
+            self.stderr.write("There are no comments, generate them with --seed")
+            return
+
+        today = timezone.localdate()
+        week = (today - timedelta(days=6), today)
+        queries = {
+            "movie_comments": Comment.objects.filter(movie=movie)[:50],
+            "comments_in_week": Comment.objects.created_between(*week).values("id"),
+            "comments_in_week_by_date": Comment.objects.filter(created__date__range=week).values("id"),
+        }
+        results = {name: self.explain(queryset) for name, queryset in queries.items()}
+
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def seed(self, comments, movies, days, batch_size):
+        movie_table, comment_table = Movie._meta.db_table, Comment._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {movie_table} (title, data, genres, status, fetched_at, updated, comment_count) "
+                f"SELECT 'Benchmark movie ' || i, '{{}}', '{{}}', 'ready', now(), now(), 0 "
+                f"FROM generate_series(1, %s) i "
+                f"ON CONFLICT (title) DO NOTHING",
+                [movies],
+            )
+            for start in range(0, comments, batch_size):
+                cursor.execute(
+                    f"WITH movies AS (SELECT array_agg(id) AS ids FROM {movie_table} "
+                    f"WHERE title LIKE 'Benchmark movie %%') "
+                    f"INSERT INTO {comment_table} (movie_id, body, created) "
+                    f"SELECT ids[1 + floor(random() * array_length(ids, 1))::int], 'Benchmark comment ' || i, "
+                    f"now() - random() * %s * interval '1 day' "
+                    f"FROM movies, generate_series(%s, %s) i",
+                    [days, start + 1, min(start + batch_size, comments)],
+                )
+                self.stderr.write(f"Seeded {min(start + batch_size, comments)} comments")
+            cursor.execute(f"ANALYZE {movie_table}, {comment_table}")
+
+        # The comments are inserted without signals, so the ranking counts and the comment stats are rebuilt
+        DailyCommentCount.objects.rebuild(batch_size=10000)
+        Movie.objects.reconcile_comment_stats(batch_size=10000)
+
+    @staticmethod
+    def explain(queryset):
+        plan = queryset.explain(analyze=True, buffers=True)
+        timings = dict(
+            line.strip().split(": ", 1) for line in plan.splitlines() if line.strip().endswith(" ms")
+        )
+        return {"plan": plan.splitlines(), **timings}
@@ -0,0 +1,88 @@
+import json
+import time
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from movies.cache import ranking_cache
+from movies.models import Comment, Movie
+
+
+class Command(BaseCommand):
+    """
+    Django command to compare the throughput of creating comments one per request with the bulk comments
+    endpoint, fed with a JSON array and with NDJSON. Movies and comments are created in the configured database
+    and removed at the end.
+    """
+
+    help = "Benchmark the comments creation endpoints, print the comments created per second as JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--comments", type=int, default=20000, help="Amount of comments sent in bulk")
+        parser.add_argument("--single", type=int, default=500, help="Amount of comments sent one per request")
+        parser.add_argument("--movies", type=int, default=100, help="Amount of movies the comments belong to")
+        parser.add_argument("--chunk-size", type=int, help="Amount of comments inserted at once")
+
+    def handle(self, *args, **options):
+        run = uuid.uuid4().hex[:8]
+        movies = Movie.objects.bulk_create(
+            Movie(title=f"Benchmark {run} {i}", data={"Year": "2020"}) for i in range(options["movies"])
+        )
+        movie_ids = [movie.id for movie in movies]
+
+        def comments(amount):
+            return [{"movie": movie_ids[i % len(movie_ids)], "body": f"Benchmark comment {i}"} for i in range(amount)]
+
+        client = Client()
+        chunk_size = options["chunk_size"] or settings.COMMENTS_BULK_CHUNK_SIZE
+        try:
+            with override_settings(
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"], COMMENTS_BULK_CHUNK_SIZE=chunk_size
+            ):
+                results = {
+                    "chunk_size": chunk_size,
+                    "single": self.run_single(client, comments(options["single"])),
+                    "json": self.run_bulk(client, json.dumps(comments(options["comments"])), "application/json"),
+                    "ndjson": self.run_bulk(
+                        client,
+                        "\n".join(json.dumps(comment) for comment in comments(options["comments"])),
+                        "application/x-ndjson",
+                    ),
+                }
+        finally:
+            self.clean_up(movie_ids)
+
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def run_single(self, client, comments):
+        url = reverse("list_create_comment")
+        started = time.perf_counter()
+        created = sum(client.post(url, comment).status_code == 201 for comment in comments)
+        return self.summarize(created, time.perf_counter() - started)
+
+    def run_bulk(self, client, body, content_type):
+        started = time.perf_counter()
+        response = client.post(reverse("bulk_create_comment"), body, content_type=content_type)
+        return self.summarize(response.json()["created"], time.perf_counter() - started)
+
+    @staticmethod
+    def clean_up(movie_ids):
+        # Deleting the comments through the ORM would send a signal and update the daily counts for each of them,
+        # the counts are deleted together with the movies anyway
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {Comment._meta.db_table} WHERE movie_id = ANY(%s)", [movie_ids])
+        Movie.objects.filter(id__in=movie_ids).delete()
+        ranking_cache.invalidate(timezone.localdate())
+
+    @staticmethod
+    def summarize(created, elapsed):
+        return {
+            "created": created,
+            "seconds": round(elapsed, 3),
+            "comments_per_second": round(created / elapsed, 1),
+        }
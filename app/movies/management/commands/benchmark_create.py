@@ -0,0 +1,91 @@
+import asyncio
+import json
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+from movies.models import Movie
+from movies.stub_omdb import StubOMDbServer
+
+
+class Command(BaseCommand):
+    """
+    Django command to compare the sync (WSGI) and async (ASGI) movie creation paths against a local stub
+    of the external movie API with injected latency. The sync path is driven by a fixed amount of threads,
+    like WSGI workers, the async path by concurrent tasks on a single event loop.
+    """
+
+    help = "Benchmark the sync and async movie creation endpoints, print the results as JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200, help="Amount of movies created by each path")
+        parser.add_argument("--latency", type=float, default=0.2, help="Latency of the stub movie API in seconds")
+        parser.add_argument("--workers", type=int, default=8, help="Amount of sync workers")
+        parser.add_argument("--concurrency", type=int, default=200, help="Amount of async requests in flight")
+
+    def handle(self, *args, **options):
+        run = uuid.uuid4().hex[:8]
+        titles = {
+            path: [f"Benchmark {run} {path} {i}" for i in range(options["requests"])] for path in ("sync", "async")
+        }
+        movies = {title: {"Year": "2020", "Genre": "Drama"} for path_titles in titles.values() for title in path_titles}
+
+        try:
+            with StubOMDbServer(movies, latency=options["latency"]) as stub, override_settings(
+                API_URL=stub.url, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]
+            ):
+                results = {
+                    "requests": options["requests"],
+                    "latency": options["latency"],
+                    "sync": self.run_sync(titles["sync"], options["workers"]),
+                    "async": asyncio.run(self.run_async(titles["async"], options["concurrency"])),
+                }
+        finally:
+            Movie.objects.filter(title__startswith=f"Benchmark {run} ").delete()
+
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def run_sync(self, titles, workers):
+        url = reverse("list_create_movie")
+
+        def create(title):
+            started = time.perf_counter()
+            response = Client().post(url, {"title": title})
+            return response.status_code, time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            responses = list(executor.map(create, titles))
+        return dict(self.summarize(responses, time.perf_counter() - started), workers=workers)
+
+    async def run_async(self, titles, concurrency):
+        url = reverse("create_movie_async")
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def create(title):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post(url, {"title": title}, content_type="application/json")
+                return response.status_code, time.perf_counter() - started
+
+        started = time.perf_counter()
+        responses = await asyncio.gather(*(create(title) for title in titles))
+        return dict(self.summarize(responses, time.perf_counter() - started), concurrency=concurrency)
+
+    @staticmethod
+    def summarize(responses, elapsed):
+        durations = sorted(duration for _, duration in responses)
+        return {
+            "created": sum(status_code == 201 for status_code, _ in responses),
+            "seconds": round(elapsed, 3),
+            "requests_per_second": round(len(responses) / elapsed, 1),
+            "p50": round(statistics.median(durations), 4),
+            "p95": round(durations[int(len(durations) * 0.95) - 1], 4),
+        }
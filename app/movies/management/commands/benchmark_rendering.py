@@ -0,0 +1,110 @@
+import gzip
+import json
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from movies.api.renderers import FastJSONRenderer, orjson
+
+# A movie as returned by OMDb, the `data` of the movies is most of the list payload
+OMDB_MOVIE = {
+    "Title": "Great Movie",
+    "Year": "1999",
+    "Rated": "R",
+    "Released": "31 Mar 1999",
+    "Runtime": "136 min",
+    "Genre": "Action, Sci-Fi",
+    "Director": "Lana Wachowski, Lilly Wachowski",
+    "Writer": "Lilly Wachowski, Lana Wachowski",
+    "Actors": "Keanu Reeves, Laurence Fishburne, Carrie-Anne Moss, Hugo Weaving",
+    "Plot": "When a beautiful stranger leads computer hacker Neo to a forbidding underworld, he discovers the "
+    "shocking truth--the life he knows is the elaborate deception of an evil cyber-intelligence.",
+    "Language": "English",
+    "Country": "United States, Australia",
+    "Awards": "Won 4 Oscars. 42 wins & 51 nominations total",
+    "Poster": "https://m.media-amazon.com/images/M/MV5BNzQzOTk3OTAtNDQ0Zi00ZTVkLWI0MTEtMDllZjNkYzNjNTc4L2ltYWdl.jpg",
+    "Ratings": [
+        {"Source": "Internet Movie Database", "Value": "8.7/10"},
+        {"Source": "Rotten Tomatoes", "Value": "88%"},
+        {"Source": "Metacritic", "Value": "73/100"},
+    ],
+    "Metascore": "73",
+    "imdbRating": "8.7",
+    "imdbVotes": "1,799,744",
+    "imdbID": "tt0133093",
+    "Type": "movie",
+    "DVD": "15 Dec 2015",
+    "BoxOffice": "$172,076,928",
+    "Production": "Village Roadshow Prod., Silver Pictures",
+    "Website": "N/A",
+    "Response": "True",
+}
+
+
+class Command(BaseCommand):
+    """
+    Django command to compare rendering pages of the movies list with DRF's JSONRenderer and with
+    FastJSONRenderer, and the size and time of compressing them with the configured gzip level.
+    """
+
+    help = "Benchmark the JSON renderers and the compression of movie pages, print the results as JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--page-sizes", default="50,500", help="Comma separated amounts of movies of a page")
+        parser.add_argument("--repeat", type=int, default=50, help="Amount of timed runs")
+        parser.add_argument("--level", type=int, help="Compression level, RESPONSE_COMPRESSION_LEVEL by default")
+
+    def handle(self, *args, **options):
+        level = options["level"] or settings.RESPONSE_COMPRESSION_LEVEL
+        rng = random.Random(0)
+        results = {}
+        for page_size in (int(size) for size in options["page_sizes"].split(",")):
+            page = {
+                "next": "http://localhost:8000/api/movies/?cursor=WyJHcmVhdCBNb3ZpZSIsMV0%3D",
+                "results": [
+                    {"id": i, "title": f"Great Movie {i}", "data": self.movie(rng, i)} for i in range(page_size)
+                ],
+            }
+            body = JSONRenderer().render(page)
+            results[page_size] = {
+                "bytes": len(body),
+                "json_renderer_ms": self.time(lambda: JSONRenderer().render(page), options),
+                "fast_json_renderer_ms": self.time(lambda: FastJSONRenderer().render(page), options),
+                "gzip_bytes": len(gzip.compress(body, compresslevel=level, mtime=0)),
+                "gzip_ms": self.time(lambda: gzip.compress(body, compresslevel=level, mtime=0), options),
+            }
+
+        output = {"orjson": orjson is not None, "level": level, "pages": results}
+        self.stdout.write(json.dumps(output, indent=2))
+
+    @staticmethod
+    def movie(rng, number):
+        """The OMDb movie with shuffled texts and random values, so the pages don't compress unrealistically well"""
+        words = OMDB_MOVIE["Plot"].split()
+        rng.shuffle(words)
+        actors = OMDB_MOVIE["Actors"].split(", ")
+        rng.shuffle(actors)
+        return dict(
+            OMDB_MOVIE,
+            Title=f"Great Movie {number}",
+            Year=str(rng.randint(1950, 2020)),
+            Plot=" ".join(words),
+            Actors=", ".join(actors),
+            imdbRating=f"{rng.uniform(2, 9.5):.1f}",
+            imdbVotes=f"{rng.randint(1000, 2000000):,}",
+            imdbID=f"tt{rng.randint(0, 9999999):07}",
+            Poster=f"https://m.media-amazon.com/images/M/{rng.getrandbits(256):064x}.jpg",
+        )
+
+    @staticmethod
+    def time(render, options):
+        durations = []
+        for _ in range(options["repeat"]):
+            started = time.perf_counter()
+            render()
+            durations.append(time.perf_counter() - started)
+        return round(statistics.median(durations) * 1000, 3)
@@ -0,0 +1,74 @@
+import json
+import statistics
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db.models import IntegerField, Value
+
+from movies.api.serializers import MovieSerializer
+from movies.benchmark import delete_data, generate_data
+from movies.models import Movie
+
+# Fields of the movies list and of the ranking
+FIELD_SETS = {"list": ("id", "title", "data"), "top": ("movie_id", "total_comments", "rank")}
+
+
+class Command(BaseCommand):
+    """
+    Django command to compare rendering pages of movies with `MovieSerializer` and with its values plan,
+    which renders `.values()` rows. Both are timed with and without fetching the rows from the database.
+    Building the fields of a serializer is compared with copying the cached ones as well.
+    """
+
+    help = "Benchmark the movie serializer against its values plan, print the timings as JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=500, help="Amount of movies rendered at once")
+        parser.add_argument("--repeat", type=int, default=20, help="Amount of timed runs")
+
+    def handle(self, *args, **options):
+        prefix = f"Benchmark {uuid.uuid4().hex[:8]}"
+        try:
+            movie_ids = generate_data(prefix, options["rows"], 0)
+            movies = Movie.objects.filter(id__in=movie_ids).order_by("id")
+            # The ranking fields are annotated with constants, only the rendering is compared
+            ranked = movies.annotate(total_comments=Value(1, IntegerField()), rank=Value(1, IntegerField()))
+
+            results = {}
+            for name, queryset in (("list", movies), ("top", ranked)):
+                fields = FIELD_SETS[name]
+                instances, rows = list(queryset), list(queryset.values(*MovieSerializer.values_plan(fields).sources))
+                results[name] = {
+                    "serializer": self.time(lambda: MovieSerializer(instances, many=True, fields=fields).data, options),
+                    "values_plan": self.time(lambda: MovieSerializer.values_plan(fields).render(rows), options),
+                    "serializer_with_query": self.time(
+                        lambda: MovieSerializer(queryset.all(), many=True, fields=fields).data, options
+                    ),
+                    "values_plan_with_query": self.time(
+                        lambda: MovieSerializer.values_plan(fields).render(
+                            queryset.values(*MovieSerializer.values_plan(fields).sources)
+                        ),
+                        options,
+                    ),
+                }
+                # Building the fields of a serializer instance, from the model or from the cached templates
+                serializer = MovieSerializer(fields=fields, read_only_fields=fields)
+                results[name]["fields_built"] = self.time(serializer.build_fields, options)
+                results[name]["fields_cached"] = self.time(serializer.get_fields, options)
+                results[name]["speedup"] = round(
+                    results[name]["serializer"]["median_ms"] / results[name]["values_plan"]["median_ms"], 1
+                )
+        finally:
+            delete_data(prefix, days=0)
+
+        self.stdout.write(json.dumps({"rows": options["rows"], "results": results}, indent=2))
+
+    @staticmethod
+    def time(render, options):
+        durations = []
+        for _ in range(options["repeat"]):
+            started = time.perf_counter()
+            render()
+            durations.append(time.perf_counter() - started)
+        return {"median_ms": round(statistics.median(durations) * 1000, 3), "min_ms": round(min(durations) * 1000, 3)}
@@ -0,0 +1,32 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from movies.jobs import run_worker
+
+
+class Command(BaseCommand):
+    """Django command to run a worker fetching the data of the queued movies from the external movie API"""
+
+    help = "Fetch the data of the pending movies and refresh the stale data of the other ones"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, help="Amount of concurrent requests to the movie API")
+        parser.add_argument("--batch-size", type=int, help="Amount of jobs claimed at once")
+        parser.add_argument("--poll-interval", type=float, help="Seconds to wait for new jobs when the queue is empty")
+        parser.add_argument("--refresh-interval", type=float, help="Seconds between the queueings of stale movies")
+        parser.add_argument("--once", action="store_true", help="Exit once the queue is empty")
+
+    def handle(self, *args, **options):
+        summary = Counter()
+        for title, status in run_worker(
+            workers=options["workers"],
+            batch_size=options["batch_size"],
+            poll_interval=options["poll_interval"],
+            refresh_interval=options["refresh_interval"],
+            once=options["once"],
+        ):
+            summary[status] += 1
+            self.stdout.write(f"{title}: {status}")
+
+        self.stdout.write(self.style.SUCCESS(", ".join(f"{status}: {count}" for status, count in summary.items())))
@@ -0,0 +1,33 @@
+import sys
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from movies.importer import import_movies
+
+
+class Command(BaseCommand):
+    """Django command to import movies from a file (or stdin) with one title per line"""
+
+    help = "Import movies with the given titles, fetching their data from the external movie API"
+
+    def add_arguments(self, parser):
+        parser.add_argument("file", nargs="?", default="-", help="File with one title per line, stdin by default")
+        parser.add_argument("--workers", type=int, help="Amount of concurrent requests to the movie API")
+        parser.add_argument("--batch-size", type=int, help="Amount of movies inserted at once")
+
+    def handle(self, *args, **options):
+        if options["file"] == "-":
+            summary = self.import_titles(sys.stdin, options)
+        else:
+            with open(options["file"], encoding="utf-8") as titles:
+                summary = self.import_titles(titles, options)
+
+        self.stdout.write(self.style.SUCCESS(", ".join(f"{status}: {count}" for status, count in summary.items())))
+
+    def import_titles(self, titles, options):
+        summary = Counter()
+        for title, status in import_movies(titles, workers=options["workers"], batch_size=options["batch_size"]):
+            summary[status] += 1
+            self.stdout.write(f"{title}: {status}")
+        return summary
@@ -0,0 +1,35 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from movies.models import DailyCommentCount
+
+
+class Command(BaseCommand):
+    """Django command to rebuild (or backfill) the daily comment counts used by the movies ranking"""
+
+    help = "Recalculate the per-movie, per-day comment counts from the comments"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Amount of rows inserted at once")
+        parser.add_argument(
+            "--start", type=date.fromisoformat, help="First day to rebuild (YYYY-MM-DD), all days by default"
+        )
+        parser.add_argument("--end", type=date.fromisoformat, help="Last day to rebuild (YYYY-MM-DD), today by default")
+
+    def handle(self, *args, **options):
+        start_date, end_date = options["start"], options["end"]
+        if start_date is None and end_date is not None:
+            raise CommandError("--end requires --start")
+        if start_date is not None:
+            end_date = end_date or timezone.localdate()
+            if start_date > end_date:
+                raise CommandError("--start has to be before --end")
+
+        self.stdout.write("Rebuilding daily comment counts...")
+        created = DailyCommentCount.objects.rebuild(
+            batch_size=options["batch_size"], start_date=start_date, end_date=end_date
+        )
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {created} daily comment counts!"))
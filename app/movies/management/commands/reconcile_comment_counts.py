@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from movies.models import Movie
+
+
+class Command(BaseCommand):
+    """Django command to repair the comment counts and latest comment times kept on the movies"""
+
+    help = "Recalculate the comment stats of the movies which drifted from their comments"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Amount of movies checked at once")
+
+    def handle(self, *args, **options):
+        self.stdout.write("Reconciling comment counts...")
+        repaired = Movie.objects.reconcile_comment_stats(batch_size=options["batch_size"])
+
+        self.stdout.write(self.style.SUCCESS(f"Repaired {repaired} movies!"))
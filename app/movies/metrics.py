@@ -0,0 +1,187 @@
+import math
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.http import HttpResponse
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, math.inf)
+
+
+class Metric:
+    """Base of the metrics kept in the memory of the process, rendered in the Prometheus text format"""
+
+    type = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def label_values(self, labels):
+        return tuple(str(labels[label]) for label in self.labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            lines += self.render_samples()
+        return lines
+
+    def render_samples(self):
+        raise NotImplementedError
+
+    def sample(self, suffix, label_values, value, **extra):
+        labels = {**dict(zip(self.labels, label_values)), **extra}
+        rendered = ",".join(f'{label}="{escape(label_value)}"' for label, label_value in labels.items())
+        name = f"{self.name}{suffix}{{{rendered}}}" if rendered else f"{self.name}{suffix}"
+        return f"{name} {format_value(value)}"
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.values = defaultdict(float)
+
+    def inc(self, amount=1, **labels):
+        with self._lock:
+            self.values[self.label_values(labels)] += amount
+
+    def render_samples(self):
+        return [self.sample("_total", label_values, value) for label_values, value in sorted(self.values.items())]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, *args, buckets=DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(set(buckets) | {math.inf}))
+        # Per label values: the count of every bucket (not cumulative), the sum and the count of the observations
+        self.values = {}
+
+    def observe(self, value, **labels):
+        label_values = self.label_values(labels)
+        with self._lock:
+            counts, total, count = self.values.get(label_values) or ([0] * len(self.buckets), 0, 0)
+            counts[next(i for i, bound in enumerate(self.buckets) if value <= bound)] += 1
+            self.values[label_values] = (counts, total + value, count + 1)
+
+    def render_samples(self):
+        lines = []
+        for label_values, (counts, total, count) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(self.sample("_bucket", label_values, cumulative, le=format_value(bound)))
+            lines.append(self.sample("_sum", label_values, total))
+            lines.append(self.sample("_count", label_values, count))
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        return "".join(f"{line}\n" for metric in self.metrics for line in metric.render())
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+registry = Registry()
+
+REQUEST_DURATION = registry.register(
+    Histogram("http_request_duration_seconds", "Latency of the requests", labels=("method", "route", "status"))
+)
+REQUEST_DB_QUERIES = registry.register(
+    Histogram(
+        "http_request_db_queries",
+        "Amount of database queries of the requests",
+        labels=("route",),
+        buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 250),
+    )
+)
+REQUEST_DB_DURATION = registry.register(
+    Histogram("http_request_db_duration_seconds", "Time the requests spent in database queries", labels=("route",))
+)
+REQUEST_SERIALIZER_DURATION = registry.register(
+    Histogram("http_request_serializer_duration_seconds", "Time the requests spent serializing", labels=("route",))
+)
+REQUEST_OMDB_DURATION = registry.register(
+    Histogram("http_request_omdb_duration_seconds", "Time the requests spent calling OMDb", labels=("route",))
+)
+OMDB_REQUEST_DURATION = registry.register(
+    Histogram("omdb_request_duration_seconds", "Latency of the calls to OMDb, retries included", labels=("outcome",))
+)
+
+
+class RequestMetrics:
+    """Time spent by the current request, by kind (`db`, `serializer`, `omdb`), and its database queries"""
+
+    max_captured_queries = 100
+
+    def __init__(self, capture_sql=False):
+        self.timings = defaultdict(float)
+        self.queries = 0
+        self.captured_queries = [] if capture_sql else None
+
+    def record_query(self, execute, sql, params, many, context):
+        """Database execute wrapper, see `connection.execute_wrapper()`"""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.queries += 1
+            self.timings["db"] += duration
+            if self.captured_queries is not None and len(self.captured_queries) < self.max_captured_queries:
+                self.captured_queries.append((duration, sql))
+
+
+current_request = ContextVar("current_request_metrics", default=None)
+
+
+def record_request_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper of every connection (see `movies.signals`), recording the queries in the metrics
+    of the current request, if there is one. The context is passed to the threads running the sync code of the
+    async views, so their queries are recorded as well.
+    """
+    metrics = current_request.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics.record_query(execute, sql, params, many, context)
+
+
+@contextmanager
+def track(kind):
+    """Add the time spent in the block to the metrics of the current request, if there is one"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics = current_request.get()
+        if metrics is not None:
+            metrics.timings[kind] += time.perf_counter() - started
+
+
+def metrics_view(request):
+    """Expose the metrics of this process in the Prometheus text format"""
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
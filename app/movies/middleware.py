@@ -0,0 +1,138 @@
+import asyncio
+import gzip
+import logging
+import re
+import time
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.decorators import sync_and_async_middleware
+from django.utils.deprecation import MiddlewareMixin
+
+from movies import metrics
+
+logger = logging.getLogger("movies.slow_requests")
+
+
+@sync_and_async_middleware
+def metrics_middleware(get_response):
+    """
+    Record the latency of every request by route, with the time it spent in database queries, serializers
+    and OMDb calls, see `movies.metrics`. Requests slower than `SLOW_REQUEST_THRESHOLD` seconds are logged
+    together with their SQL. Async views stay async, so the middleware doesn't pin them to a thread.
+    """
+    if asyncio.iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            with RequestTracker() as tracker:
+                tracker.response = await get_response(request)
+            tracker.observe(request)
+            return tracker.response
+
+    else:
+
+        def middleware(request):
+            with RequestTracker() as tracker:
+                tracker.response = get_response(request)
+            tracker.observe(request)
+            return tracker.response
+
+    return middleware
+
+
+class RequestTracker:
+    def __enter__(self):
+        self.threshold = settings.SLOW_REQUEST_THRESHOLD
+        self.metrics = metrics.RequestMetrics(capture_sql=bool(self.threshold))
+        self.response = None
+        # The queries are recorded by `metrics.record_request_query()`, in whichever thread they run
+        self.token = metrics.current_request.set(self.metrics)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.duration = time.perf_counter() - self.started
+        metrics.current_request.reset(self.token)
+
+    def observe(self, request):
+        # Routes, not paths, so every movie shares `api/movies/<int:id>`
+        match = getattr(request, "resolver_match", None)
+        route = match.route if match is not None else "unmatched"
+        status = self.response.status_code if self.response is not None else 500
+
+        metrics.REQUEST_DURATION.observe(self.duration, method=request.method, route=route, status=status)
+        metrics.REQUEST_DB_QUERIES.observe(self.metrics.queries, route=route)
+        for kind, histogram in (
+            ("db", metrics.REQUEST_DB_DURATION),
+            ("serializer", metrics.REQUEST_SERIALIZER_DURATION),
+            ("omdb", metrics.REQUEST_OMDB_DURATION),
+        ):
+            histogram.observe(self.metrics.timings[kind], route=route)
+
+        if self.threshold and self.duration >= self.threshold:
+            queries = "\n".join(f"  {duration * 1000:.1f}ms {sql}" for duration, sql in self.metrics.captured_queries)
+            logger.warning(
+                "Slow request %s %s (%s) %s in %.3fs, %d queries in %.3fs, serializers %.3fs, OMDb %.3fs\n%s",
+                request.method,
+                request.get_full_path(),
+                route,
+                status,
+                self.duration,
+                self.metrics.queries,
+                self.metrics.timings["db"],
+                self.metrics.timings["serializer"],
+                self.metrics.timings["omdb"],
+                queries,
+            )
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compress the responses with gzip when the client accepts it, like Django's GZipMiddleware but with the
+    minimum size (`RESPONSE_COMPRESSION_MIN_SIZE`) and the level (`RESPONSE_COMPRESSION_LEVEL`) configurable.
+    Streamed responses, e.g. the exports, are compressed while they are sent.
+    """
+
+    accepts_gzip = re.compile(r"\bgzip\b")
+
+    def process_response(self, request, response):
+        min_size = settings.RESPONSE_COMPRESSION_MIN_SIZE
+        if not min_size or response.has_header("Content-Encoding"):
+            return response
+        if not response.streaming and len(response.content) < min_size:
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        if not self.accepts_gzip.search(request.META.get("HTTP_ACCEPT_ENCODING", "")):
+            return response
+
+        level = settings.RESPONSE_COMPRESSION_LEVEL
+        if response.streaming:
+            response.streaming_content = compress_sequence(response.streaming_content, level)
+            del response["Content-Length"]
+        else:
+            compressed = gzip.compress(response.content, compresslevel=level, mtime=0)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response["Content-Length"] = str(len(compressed))
+
+        # The compressed body differs, a strong ETag becomes weak (RFC 7232 section 2.1)
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        response["Content-Encoding"] = "gzip"
+        return response
+
+
+def compress_sequence(sequence, level):
+    """
+    Compress the chunks of a streamed body into a gzip stream while they are produced. Every chunk is flushed,
+    so the client can decompress it as soon as it's received instead of once the compressor's buffer is full.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in sequence:
+        if chunk:
+            yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
@@ -0,0 +1,44 @@
+# Generated by Django 3.1.14 on 2026-10-17 02:59
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+import django.db.models.deletion
+
+
+def backfill_daily_comment_counts(apps, schema_editor):
+    Comment = apps.get_model('movies', 'Comment')
+    DailyCommentCount = apps.get_model('movies', 'DailyCommentCount')
+
+    rows = Comment.objects.annotate(day=TruncDate('created')).values('movie_id', 'day').annotate(count=Count('id'))
+    DailyCommentCount.objects.bulk_create(
+        [DailyCommentCount(**row) for row in rows.order_by().iterator()], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0003_auto_20201128_1910'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyCommentCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_comment_counts', to='movies.movie')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='dailycommentcount',
+            index=models.Index(fields=['day'], name='movies_dail_day_dedf47_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailycommentcount',
+            constraint=models.UniqueConstraint(fields=('movie', 'day'), name='unique_movie_day_comment_count'),
+        ),
+        migrations.RunPython(backfill_daily_comment_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 3.1.14 on 2026-10-17 03:04
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+def backfill_genres(apps, schema_editor):
+    Movie = apps.get_model('movies', 'Movie')
+
+    movies = []
+    for movie in Movie.objects.only('id', 'data').iterator(chunk_size=1000):
+        genre = movie.data.get('Genre')
+        if isinstance(genre, str):
+            movie.genres = [g.strip().casefold() for g in genre.split(',') if g.strip() and g.strip() != 'N/A']
+            movies.append(movie)
+        if len(movies) == 1000:
+            Movie.objects.bulk_update(movies, ['genres'])
+            movies = []
+    Movie.objects.bulk_update(movies, ['genres'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0004_dailycommentcount'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='genres',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=50), blank=True, default=list, size=None),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['genres'], name='movies_movi_genres_c0d66b_gin'),
+        ),
+        migrations.RunPython(backfill_genres, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 3.1.14 on 2026-10-17 03:05
+
+import re
+from decimal import Decimal, InvalidOperation
+
+from django.db import migrations, models
+
+
+# Copies of the parsers in `movies.models` as of this migration, so later changes to them don't change it
+def parse_year(value):
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value if 0 <= value <= 9999 else None
+    match = re.match(r'\s*(\d{4})', value) if isinstance(value, str) else None
+    return int(match.group(1)) if match else None
+
+
+def parse_metascore(value):
+    try:
+        score = int(value)
+    except (TypeError, ValueError):
+        return None
+    return score if 0 <= score <= 100 else None
+
+
+def parse_rating(value):
+    try:
+        rating = Decimal(value)
+    except (TypeError, ValueError, InvalidOperation):
+        return None
+    return rating if rating.is_finite() and 0 <= rating <= 10 else None
+
+
+def backfill_sort_fields(apps, schema_editor):
+    Movie = apps.get_model('movies', 'Movie')
+
+    movies = []
+    for movie in Movie.objects.only('id', 'data').iterator(chunk_size=1000):
+        data = movie.data if isinstance(movie.data, dict) else {}
+        movie.year = parse_year(data.get('Year'))
+        movie.metascore = parse_metascore(data.get('Metascore'))
+        movie.imdb_rating = parse_rating(data.get('imdbRating'))
+        movies.append(movie)
+        if len(movies) == 1000:
+            Movie.objects.bulk_update(movies, ['year', 'metascore', 'imdb_rating'])
+            movies = []
+    Movie.objects.bulk_update(movies, ['year', 'metascore', 'imdb_rating'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0005_movie_genres'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='imdb_rating',
+            field=models.DecimalField(blank=True, decimal_places=1, max_digits=3, null=True),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='metascore',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='year',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['year', 'id'], name='movies_movi_year_59138e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['metascore', 'id'], name='movies_movi_metasco_80b1d7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['imdb_rating', 'id'], name='movies_movi_imdb_ra_8e74b2_idx'),
+        ),
+        migrations.RunPython(backfill_sort_fields, migrations.RunPython.noop),
+    ]
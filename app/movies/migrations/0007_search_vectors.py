@@ -0,0 +1,89 @@
+# Generated by Django 3.1.14 on 2026-10-17 03:06
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+MOVIE_SEARCH_VECTOR_TRIGGER = """
+CREATE FUNCTION movies_movie_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(NEW.data->>'Director', '') || ' ' || coalesce(NEW.data->>'Actors', '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(NEW.data->>'Plot', '')), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER movies_movie_search_vector_trigger BEFORE INSERT OR UPDATE OF title, data ON movies_movie
+FOR EACH ROW EXECUTE PROCEDURE movies_movie_search_vector_update();
+
+UPDATE movies_movie SET title = title;
+"""
+
+COMMENT_SEARCH_VECTOR_TRIGGER = """
+CREATE FUNCTION movies_comment_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := to_tsvector('english', coalesce(NEW.body, ''));
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER movies_comment_search_vector_trigger BEFORE INSERT OR UPDATE OF body ON movies_comment
+FOR EACH ROW EXECUTE PROCEDURE movies_comment_search_vector_update();
+
+UPDATE movies_comment SET body = body;
+"""
+
+
+def create_title_trigram_index(apps, schema_editor):
+    """Index the titles for fuzzy matching, if the pg_trgm extension is available on the server"""
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        cursor.execute('CREATE INDEX movies_movie_title_trgm ON movies_movie USING gin (title gin_trgm_ops)')
+
+
+def drop_title_trigram_index(apps, schema_editor):
+    schema_editor.execute('DROP INDEX IF EXISTS movies_movie_title_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0006_movie_sort_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='movies_comm_search__ee766d_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='movies_movi_search__eaebc6_gin'),
+        ),
+        migrations.RunSQL(
+            MOVIE_SEARCH_VECTOR_TRIGGER,
+            'DROP TRIGGER movies_movie_search_vector_trigger ON movies_movie; '
+            'DROP FUNCTION movies_movie_search_vector_update();',
+        ),
+        migrations.RunSQL(
+            COMMENT_SEARCH_VECTOR_TRIGGER,
+            'DROP TRIGGER movies_comment_search_vector_trigger ON movies_comment; '
+            'DROP FUNCTION movies_comment_search_vector_update();',
+        ),
+        migrations.RunPython(create_title_trigram_index, drop_title_trigram_index),
+    ]
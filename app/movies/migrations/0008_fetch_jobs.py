@@ -0,0 +1,53 @@
+# Generated by Django 3.1.14 on 2026-10-17 03:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0007_search_vectors'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FetchJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='fetched_at',
+            field=models.DateTimeField(blank=True, default=django.utils.timezone.now, null=True),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], default='ready', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='movie',
+            name='data',
+            field=models.JSONField(default=dict),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['fetched_at'], name='movies_movi_fetched_48ce7e_idx'),
+        ),
+        migrations.AddField(
+            model_name='fetchjob',
+            name='movie',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='fetch_job', to='movies.movie'),
+        ),
+        migrations.AddIndex(
+            model_name='fetchjob',
+            index=models.Index(fields=['run_at'], name='movies_fetc_run_at_95c4d5_idx'),
+        ),
+    ]
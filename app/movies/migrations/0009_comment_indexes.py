@@ -0,0 +1,31 @@
+# Generated by Django 3.1.14 on 2026-10-17 03:18
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    # The indexes are built without locking the comments table against writes
+    atomic = False
+
+    dependencies = [
+        ('movies', '0008_fetch_jobs'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='comment',
+            index=models.Index(fields=['movie', '-created'], name='movies_comment_movie_created'),
+        ),
+        AddIndexConcurrently(
+            model_name='comment',
+            index=models.Index(fields=['created'], name='movies_comment_created'),
+        ),
+        # Dropped once the composite index, which starts with movie_id, is there
+        migrations.AlterField(
+            model_name='comment',
+            name='movie',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='movies.movie'),
+        ),
+    ]
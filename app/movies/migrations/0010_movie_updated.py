@@ -0,0 +1,24 @@
+# Generated by Django 3.1.14 on 2026-10-17 03:20
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0009_comment_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['updated'], name='movies_movi_updated_09290b_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 3.1.14 on 2026-10-17 03:22
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_comment_stats(apps, schema_editor):
+    Movie = apps.get_model('movies', 'Movie')
+    Comment = apps.get_model('movies', 'Comment')
+
+    comments = Comment.objects.filter(movie=OuterRef('pk'))
+    Movie.objects.update(
+        comment_count=Coalesce(
+            Subquery(comments.order_by().values('movie').annotate(count=Count('id')).values('count')), 0
+        ),
+        last_commented_at=Subquery(comments.order_by('-created').values('created')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0010_movie_updated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='last_commented_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['comment_count', 'id'], name='movies_movi_comment_d05eff_idx'),
+        ),
+        migrations.RunPython(backfill_comment_stats, migrations.RunPython.noop),
+    ]
@@ -1,46 +1,437 @@
-from django.db import models
-from django.db.models.aggregates import Count
-from django.db.models import F, Window
+import re
+from datetime import datetime, time, timedelta
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField, TrigramSimilarity
+from django.db import IntegrityError, connection, connections, models, transaction
+from django.db.models.aggregates import Count, Sum
+from django.db.models import F, OuterRef, Subquery, Window
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce, TruncDate
 from django.db.models.functions.window import DenseRank
+from django.utils import timezone
+
+
+# Text search configuration of the search vectors, it has to match the one used by their database triggers
+SEARCH_CONFIG = "english"
+
+
+@lru_cache(maxsize=None)
+def trigram_available():
+    """Check whether the pg_trgm extension, needed by the fuzzy title search, is installed"""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        return cursor.fetchone() is not None
 
 
 class MovieManager(models.Manager):
     def create_ranking(self, start_date, end_date):
         """Create movies ranking for specified date range, based on amount of comments"""
         dense_rank = Window(expression=DenseRank(), order_by=F("total_comments").desc())
-        queryset = Movie.objects.filter(comments__created__date__range=[start_date, end_date])
+        # Rank from the daily comment counts, so the cost depends on movies x days instead of all the comments
+        queryset = Movie.objects.filter(
+            daily_comment_counts__day__range=[start_date, end_date], daily_comment_counts__count__gt=0
+        )
+
+        return queryset.annotate(total_comments=Sum("daily_comment_counts__count")).annotate(rank=dense_rank)
+
+    def ranked_values(self, ranking, movie_id=None, limit=None):
+        """
+        Rows of the `.values()` of a ranking, only of the movie and only the first `limit` rows by rank.
+        The rows are filtered outside of the ranked window, so their ranks are still among all the movies,
+        but only the returned rows leave the database.
+        """
+        if limit is not None:
+            ranking = ranking.order_by("rank", "title")[:limit]
+        if movie_id is None:
+            return list(ranking)
+
+        # Window functions can't be filtered in the same query (before Django 4.2)
+        sql, params = ranking.query.sql_with_params()
+        with connections[ranking.db].cursor() as cursor:
+            cursor.execute(f"SELECT * FROM ({sql}) ranking WHERE ranking.id = %s", [*params, movie_id])
+            columns = [column.name for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def search(self, text):
+        """Full-text search of the movies by title, director, actors and plot, the best matches first"""
+        query = SearchQuery(text, config=SEARCH_CONFIG, search_type="websearch")
+        return (
+            self.filter(search_vector=query)
+            .annotate(search_rank=SearchRank(F("search_vector"), query))
+            .order_by("-search_rank", "id")
+        )
 
-        return queryset.annotate(total_comments=Count("comments")).annotate(rank=dense_rank)
+    def add_comments(self, comments):
+        """
+        Count the created comments in the comment stats of their movies with a single UPDATE, for comments
+        created without the signals, e.g. by `bulk_create`
+        """
+        stats = {}
+        for comment in comments:
+            count, latest = stats.get(comment.movie_id, (0, comment.created))
+            stats[comment.movie_id] = (count + 1, max(latest, comment.created))
+        if not stats:
+            return
+
+        table = self.model._meta.db_table
+        # Sorted, so concurrent updates lock the rows in the same order and can't deadlock
+        rows = sorted(stats.items())
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} SET comment_count = {table}.comment_count + stats.count, "
+                f"last_commented_at = GREATEST({table}.last_commented_at, stats.latest), updated = %s "
+                f"FROM (VALUES {', '.join(['(%s::integer, %s::integer, %s::timestamptz)'] * len(rows))}) "
+                f"AS stats (id, count, latest) WHERE {table}.id = stats.id",
+                [timezone.now(), *(value for movie_id, (count, latest) in rows for value in (movie_id, count, latest))],
+            )
+
+    def reconcile_comment_stats(self, batch_size=1000):
+        """Repair the comment counts and latest comment times which drifted from the comments, return their amount"""
+        comments = Comment.objects.filter(movie=OuterRef("pk"))
+        actual_count = Coalesce(
+            Subquery(comments.order_by().values("movie").annotate(count=Count("id")).values("count")), 0
+        )
+        actual_latest = Subquery(comments.values("created")[:1])
+        movies = self.annotate(actual_count=actual_count, actual_latest=actual_latest).order_by("id")
+
+        repaired, last_id = 0, 0
+        while True:
+            batch = list(
+                movies.filter(id__gt=last_id).values_list(
+                    "id", "comment_count", "last_commented_at", "actual_count", "actual_latest"
+                )[:batch_size]
+            )
+            if not batch:
+                return repaired
+            last_id = batch[-1][0]
+
+            drifted = [movie_id for movie_id, *stats in batch if tuple(stats[:2]) != tuple(stats[2:])]
+            # Recalculated in the UPDATE, so the comments created in the meantime aren't lost
+            repaired += self.filter(id__in=drifted).update(comment_count=actual_count, last_commented_at=actual_latest)
+
+    def similar_titles(self, title):
+        """
+        Trigram search of the movies with titles similar to the given one, requires the pg_trgm extension.
+        The titles are matched by the `%` operator, which uses the trigram index, against the
+        `pg_trgm.similarity_threshold` of the connection. The similarity itself only orders the matches.
+        """
+        return (
+            self.filter(title__trigram_similar=title)
+            .annotate(similarity=TrigramSimilarity("title", title))
+            .order_by("-similarity", "id")
+        )
 
 
 class Movie(models.Model):
+    class Status(models.TextChoices):
+        # The data is being fetched in the background
+        PENDING = "pending"
+        READY = "ready"
+        # The movie doesn't exist in the external api or it couldn't be fetched
+        FAILED = "failed"
 
     title = models.CharField(max_length=250, unique=True)
-    data = models.JSONField()
+    data = models.JSONField(default=dict)
     # There are also other options, such as:
     # - rewriting manually every key/value pair from the json response into
     # the Model fields but I don't think it's needed for the task
     # - dynamically create fields based on the response but I believe it's
     # too complicated and it's not the purpose of the task
 
+    # Fields extracted from `data` on save, so they can be indexed
+    genres = ArrayField(models.CharField(max_length=50), default=list, blank=True)
+    year = models.PositiveSmallIntegerField(null=True, blank=True)
+    metascore = models.PositiveSmallIntegerField(null=True, blank=True)
+    imdb_rating = models.DecimalField(max_digits=3, decimal_places=1, null=True, blank=True)
+    # Maintained by a database trigger from the title, director, actors and plot
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.READY)
+    # When `data` was fetched from the external api, used to refresh the stale data
+    fetched_at = models.DateTimeField(null=True, blank=True, default=timezone.now)
+    # Last change of the movie or of its comments, bumped by `update()`s too, validates the cached responses
+    updated = models.DateTimeField(auto_now=True)
+
+    # Maintained on every comment write, `reconcile_comment_counts` repairs them
+    comment_count = models.PositiveIntegerField(default=0)
+    last_commented_at = models.DateTimeField(null=True, blank=True)
+    COMMENT_STATS_FIELDS = ("comment_count", "last_commented_at")
+
     objects = MovieManager()
 
+    # OMDb keys (and comments) which movies can be sorted by, mapped to their typed fields
+    SORTABLE_FIELDS = {
+        "title": "title",
+        "Year": "year",
+        "Metascore": "metascore",
+        "imdbRating": "imdb_rating",
+        "comments": "comment_count",
+    }
+
     class Meta:
         ordering = ("title",)
+        indexes = [
+            GinIndex(fields=("genres",)),
+            GinIndex(fields=("search_vector",)),
+            # Together with `id` as the tie-breaker they serve the keyset pagination of the sorted movies list
+            models.Index(fields=("year", "id")),
+            models.Index(fields=("metascore", "id")),
+            models.Index(fields=("imdb_rating", "id")),
+            models.Index(fields=("comment_count", "id")),
+            models.Index(fields=("fetched_at",)),
+            models.Index(fields=("updated",)),
+        ]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        self.extract_data_fields()
+        # The comment stats are updated in the database by the comment writes, so saving a loaded movie
+        # doesn't write them back, it would overwrite the comments written since it was loaded
+        if not self._state.adding and kwargs.get("update_fields") is None and not kwargs.get("force_insert"):
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COMMENT_STATS_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    def extract_data_fields(self):
+        """Fill the indexed fields from `data`, call it before `bulk_create` which doesn't call `save`"""
+        # `data` can be any JSON value, only the keys of an object are indexed
+        data = self.data if isinstance(self.data, dict) else {}
+        self.genres = parse_genres(data.get("Genre"))
+        self.year = parse_year(data.get("Year"))
+        self.metascore = parse_metascore(data.get("Metascore"))
+        self.imdb_rating = parse_rating(data.get("imdbRating"))
+
+
+def day_start(day):
+    """Return the midnight which starts the day in the current timezone"""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def parse_genres(value):
+    """Normalize comma separated OMDb genres, e.g. "Drama, Fantasy" -> ["drama", "fantasy"]"""
+    if not isinstance(value, str):
+        return []
+    return [genre.strip().casefold() for genre in value.split(",") if genre.strip() and genre.strip() != "N/A"]
+
+
+def parse_year(value):
+    """Parse the (first) year of an OMDb year, e.g. "1999", "1999–2003", "2015–" or 1994 -> 1999, 1999, 2015, 1994"""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value if 0 <= value <= 9999 else None
+    match = re.match(r"\s*(\d{4})", value) if isinstance(value, str) else None
+    return int(match.group(1)) if match else None
+
+
+def parse_metascore(value):
+    """Parse an OMDb Metascore, e.g. "73" -> 73, "N/A" -> None"""
+    try:
+        score = int(value)
+    except (TypeError, ValueError):
+        return None
+    return score if 0 <= score <= 100 else None
+
+
+def parse_rating(value):
+    """Parse an OMDb imdbRating, e.g. "7.8" -> Decimal("7.8"), "N/A" -> None"""
+    try:
+        rating = Decimal(value)
+    except (TypeError, ValueError, InvalidOperation):
+        return None
+    return rating if rating.is_finite() and 0 <= rating <= 10 else None
+
+
+class CommentQuerySet(models.QuerySet):
+    def created_between(self, start_date, end_date):
+        """
+        Keep the comments created on the days of the date range (inclusive) in the current timezone. The range
+        is compared as `start <= created < day after end`, so unlike `created__date__range` it uses the index.
+        """
+        start, end = day_start(start_date), day_start(end_date + timedelta(days=1))
+        return self.filter(created__gte=start, created__lt=end)
+
+    def latest_per_movie(self, movie_ids, limit):
+        """
+        Keep only the `limit` latest comments of each of the movies. They're looked up by a lateral join once per
+        movie, which reads only the first `limit` entries of the movie in the (movie, -created) index.
+        """
+        latest = RawSQL(
+            f"""
+            SELECT latest.id
+            FROM unnest(%s::integer[]) AS movie(id)
+            CROSS JOIN LATERAL (
+                SELECT comment.id FROM {Comment._meta.db_table} comment
+                WHERE comment.movie_id = movie.id
+                ORDER BY comment.created DESC, comment.id DESC
+                LIMIT %s
+            ) latest
+            """,
+            (list(movie_ids), limit),
+        )
+        return self.filter(id__in=latest)
+
+    def search(self, text):
+        """Full-text search of the comments, the best matches first"""
+        query = SearchQuery(text, config=SEARCH_CONFIG, search_type="websearch")
+        return (
+            self.filter(search_vector=query)
+            .annotate(search_rank=SearchRank(F("search_vector"), query))
+            .order_by("-search_rank", "-created")
+        )
+
 
 # This class and all other logic like serializers, views etc. could be also in a different Django app,
 # but I believe it's not necessary for this task
 class Comment(models.Model):
-    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name="comments")
+    # Indexed by the (movie, -created) index below
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name="comments", db_index=False)
     body = models.TextField()
     created = models.DateTimeField(auto_now_add=True)
+    # Maintained by a database trigger from the body
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = CommentQuerySet.as_manager()
 
     class Meta:
         ordering = ("-created",)
+        indexes = [
+            GinIndex(fields=("search_vector",)),
+            # Serves the comments of a movie, newest first, and leads with `movie` so it replaces the FK index
+            models.Index(fields=("movie", "-created"), name="movies_comment_movie_created"),
+            models.Index(fields=("created",), name="movies_comment_created"),
+        ]
 
     def __str__(self):
         return self.body
+
+
+class DailyCommentCountManager(models.Manager):
+    def add(self, movie_id, day, amount=1):
+        """Add `amount` (which can be negative) to the comment count of the movie for the given day"""
+        counts = self.filter(movie_id=movie_id, day=day)
+        if amount < 0:
+            # Never go below zero, even if the counts have drifted away from the comments
+            counts = counts.filter(count__gte=-amount)
+
+        updated = counts.update(count=F("count") + amount)
+        if updated or amount <= 0:
+            return
+
+        try:
+            with transaction.atomic():
+                self.create(movie_id=movie_id, day=day, count=amount)
+        except IntegrityError:
+            # The row has been created concurrently in the meantime
+            self.filter(movie_id=movie_id, day=day).update(count=F("count") + amount)
+
+    def add_many(self, counts):
+        """Add the positive comment counts of many `{(movie_id, day): amount}` at once, with a single upsert"""
+        if not counts:
+            return
+
+        table = self.model._meta.db_table
+        # Sorted, so concurrent upserts lock the rows in the same order and can't deadlock
+        rows = sorted(counts.items())
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (movie_id, day, count) VALUES {', '.join(['(%s, %s, %s)'] * len(rows))} "
+                f"ON CONFLICT (movie_id, day) DO UPDATE SET count = {table}.count + EXCLUDED.count",
+                [value for (movie_id, day), amount in rows for value in (movie_id, day, amount)],
+            )
+
+    def rebuild(self, batch_size=1000, start_date=None, end_date=None):
+        """
+        Recalculate the daily comment counts from the comments, of all the days or only of the given date range,
+        return the amount of created rows
+        """
+        comments, counts = Comment.objects.all(), self.all()
+        if start_date is not None:
+            comments = comments.created_between(start_date, end_date)
+            counts = counts.filter(day__range=[start_date, end_date])
+
+        rows = (
+            comments.annotate(day=TruncDate("created"))
+            .values("movie_id", "day")
+            .annotate(count=Count("id"))
+            .order_by()
+        )
+
+        created = 0
+        with transaction.atomic():
+            counts.delete()
+            batch = []
+            for row in rows.iterator(chunk_size=batch_size):
+                batch.append(self.model(**row))
+                if len(batch) == batch_size:
+                    created += len(self.bulk_create(batch))
+                    batch = []
+            created += len(self.bulk_create(batch))
+
+        return created
+
+
+class DailyCommentCount(models.Model):
+    """Amount of comments added to the movie on a given day, maintained on every comment write"""
+
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name="daily_comment_counts")
+    day = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+
+    objects = DailyCommentCountManager()
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=("movie", "day"), name="unique_movie_day_comment_count")]
+        indexes = [models.Index(fields=("day",))]
+
+    def __str__(self):
+        return f"{self.movie_id} {self.day}: {self.count}"
+
+
+class FetchJobManager(models.Manager):
+    def enqueue(self, movie_ids, run_at=None):
+        """Queue fetching the data of the movies, movies which are already queued are skipped"""
+        run_at = run_at or timezone.now()
+        jobs = [self.model(movie_id=movie_id, run_at=run_at) for movie_id in movie_ids]
+        self.bulk_create(jobs, ignore_conflicts=True)
+
+    def claim(self, limit, lease):
+        """
+        Lock up to `limit` due jobs for `lease` seconds and return them. Concurrent workers skip the rows locked
+        by each other, and a job of a worker which died is claimed again once its lease runs out.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            jobs = list(
+                self.select_related("movie")
+                .select_for_update(skip_locked=True, of=("self",))
+                .filter(run_at__lte=now)
+                .order_by("run_at")[:limit]
+            )
+            self.filter(id__in=[job.id for job in jobs]).update(run_at=now + timedelta(seconds=lease))
+        return jobs
+
+
+class FetchJob(models.Model):
+    """Queued fetch of the movie data from the external api, consumed by the `fetch_movies` command"""
+
+    movie = models.OneToOneField(Movie, on_delete=models.CASCADE, related_name="fetch_job")
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    objects = FetchJobManager()
+
+    class Meta:
+        indexes = [models.Index(fields=("run_at",))]
+
+    def __str__(self):
+        return f"{self.movie_id} at {self.run_at}"
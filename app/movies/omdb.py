@@ -0,0 +1,346 @@
+import asyncio
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import httpx
+import requests
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from movies import metrics
+
+
+class OMDbError(Exception):
+    """Base exception of the OMDb client"""
+
+
+class MovieNotFound(OMDbError):
+    """The movie doesn't exist in the OMDb database"""
+
+
+class OMDbUnavailable(OMDbError):
+    """The OMDb API can't be reached or it's failing"""
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after their time to live"""
+
+    def __init__(self, maxsize, ttl, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                expires, value = self._entries[key]
+            except KeyError:
+                return default
+
+            if expires <= self.clock():
+                del self._entries[key]
+                return default
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._entries[key] = (self.clock() + (self.ttl if ttl is None else ttl), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing upstream for `reset_timeout` seconds after `failure_threshold` consecutive failures.
+    Once the timeout passes a single trial call is let through, which either closes or reopens the circuit.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self.clock() - self.opened_at >= self.reset_timeout:
+                # Half-open, let a single trial call through and keep rejecting the others for another timeout
+                self.opened_at = self.clock()
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+
+
+class BaseOMDbClient:
+    """
+    Client of the OMDb API with pooled connections, connect/read timeouts, bounded retries with backoff
+    and a circuit breaker. Fetched movies and "not found" responses are cached by normalized title.
+    Subclasses provide the HTTP transport.
+    """
+
+    retry_statuses = (500, 502, 503, 504)
+
+    def __init__(
+        self,
+        url,
+        api_key,
+        connect_timeout=3.05,
+        read_timeout=10,
+        retries=2,
+        backoff_factor=0.3,
+        pool_size=10,
+        cache_size=1024,
+        cache_ttl=86400,
+        negative_cache_ttl=600,
+        failure_threshold=5,
+        reset_timeout=30,
+    ):
+        self.url = url
+        self.api_key = api_key
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.pool_size = pool_size
+        self.negative_cache_ttl = negative_cache_ttl
+        self.cache = TTLCache(cache_size, cache_ttl)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+
+    @classmethod
+    def from_settings(cls, **kwargs):
+        options = dict(
+            connect_timeout=settings.OMDB_CONNECT_TIMEOUT,
+            read_timeout=settings.OMDB_READ_TIMEOUT,
+            retries=settings.OMDB_RETRIES,
+            backoff_factor=settings.OMDB_BACKOFF_FACTOR,
+            pool_size=settings.OMDB_POOL_SIZE,
+            cache_size=settings.OMDB_CACHE_SIZE,
+            cache_ttl=settings.OMDB_CACHE_TTL,
+            negative_cache_ttl=settings.OMDB_NEGATIVE_CACHE_TTL,
+            failure_threshold=settings.OMDB_FAILURE_THRESHOLD,
+            reset_timeout=settings.OMDB_RESET_TIMEOUT,
+        )
+        return cls(settings.API_URL, settings.API_KEY, **{**options, **kwargs})
+
+    @property
+    def params(self):
+        return {"apikey": self.api_key}
+
+    def lookup(self, title):
+        """Return the cache key of the title and its cached data, None when it isn't cached"""
+        key = normalize_title(title)
+        if not key:
+            raise MovieNotFound(title)
+        return key, self.cache.get(key)
+
+    def remember(self, key, data):
+        self.cache.set(key, data, ttl=None if data else self.negative_cache_ttl)
+
+    def result(self, title, data):
+        if not data:
+            raise MovieNotFound(title)
+        return dict(data)
+
+    def check_breaker(self):
+        if not self.breaker.allow():
+            raise OMDbUnavailable("Circuit breaker is open")
+
+    def parse(self, data):
+        """Return the movie data without its title, or an empty dict when the movie doesn't exist"""
+        self.breaker.record_success()
+        # If movie doesn't exist, the response doesn't contain its Title
+        if "Title" not in data:
+            return {}
+
+        del data["Title"]
+        return data
+
+    @contextmanager
+    def measure(self):
+        """Time a call to the API, yield a dict to set the `outcome` of the call in"""
+        call = {"outcome": "error"}
+        started = time.perf_counter()
+        with metrics.track("omdb"):
+            try:
+                yield call
+            finally:
+                metrics.OMDB_REQUEST_DURATION.observe(time.perf_counter() - started, outcome=call["outcome"])
+
+    def fail(self, error):
+        self.breaker.record_failure()
+        return OMDbUnavailable(str(error))
+
+
+class OMDbClient(BaseOMDbClient):
+    """Blocking OMDb client, built on a pooled `requests` session"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        retry = Retry(
+            total=self.retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=self.retry_statuses,
+            allowed_methods=("GET",),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def fetch(self, title):
+        """Fetch the movie data, without its title, raise MovieNotFound or OMDbUnavailable on failure"""
+        key, data = self.lookup(title)
+        if data is None:
+            with self.measure() as call:
+                data = self.request(title)
+                call["outcome"] = "ok" if data else "not_found"
+            self.remember(key, data)
+        return self.result(title, data)
+
+    def request(self, title):
+        """Call the API, return the movie data or an empty dict when the movie doesn't exist"""
+        self.check_breaker()
+
+        try:
+            response = self.session.get(
+                self.url, params={**self.params, "t": title}, timeout=(self.connect_timeout, self.read_timeout)
+            )
+            response.raise_for_status()
+            data = response.json()
+        except (requests.RequestException, ValueError) as e:
+            raise self.fail(e) from e
+
+        return self.parse(data)
+
+
+class AsyncOMDbClient(BaseOMDbClient):
+    """
+    Non-blocking OMDb client, built on a pooled `httpx.AsyncClient`. The connections belong to the event loop
+    the client is used in, use `get_async_client()` to get the client of the running loop.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+            limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+        )
+
+    async def fetch(self, title):
+        """Fetch the movie data, without its title, raise MovieNotFound or OMDbUnavailable on failure"""
+        key, data = self.lookup(title)
+        if data is None:
+            with self.measure() as call:
+                data = await self.request(title)
+                call["outcome"] = "ok" if data else "not_found"
+            self.remember(key, data)
+        return self.result(title, data)
+
+    async def request(self, title):
+        """Call the API, return the movie data or an empty dict when the movie doesn't exist"""
+        self.check_breaker()
+
+        for attempt in range(self.retries + 1):
+            if attempt:
+                await asyncio.sleep(self.backoff_factor * 2 ** (attempt - 1))
+            try:
+                response = await self.client.get(self.url, params={**self.params, "t": title})
+            except httpx.TransportError as e:
+                error = e
+                continue
+            if response.status_code not in self.retry_statuses:
+                break
+            error = httpx.HTTPStatusError(
+                f"Server error {response.status_code}", request=response.request, response=response
+            )
+        else:
+            raise self.fail(error) from error
+
+        try:
+            response.raise_for_status()
+            data = response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            raise self.fail(e) from e
+
+        return self.parse(data)
+
+    async def close(self):
+        await self.client.aclose()
+
+
+def normalize_title(title):
+    """Normalize the title for caching, OMDb lookups are case and whitespace insensitive"""
+    return " ".join(str(title).split()).casefold()
+
+
+_client = None
+_async_clients = weakref.WeakKeyDictionary()
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the shared, lazily created OMDb client"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OMDbClient.from_settings()
+        return _client
+
+
+def get_async_client():
+    """Return the lazily created async OMDb client of the running event loop"""
+    loop = asyncio.get_running_loop()
+    with _client_lock:
+        if loop not in _async_clients:
+            _async_clients[loop] = AsyncOMDbClient.from_settings(pool_size=settings.OMDB_ASYNC_POOL_SIZE)
+        return _async_clients[loop]
+
+
+@receiver(setting_changed)
+def reset_client(setting, **kwargs):
+    global _client
+    if setting in ("API_URL", "API_KEY") or setting.startswith("OMDB_"):
+        with _client_lock:
+            _client = None
+            _async_clients.clear()
+
+
+def fetch_movie_data(title):
+    """Fetch data from external movie API"""
+    return get_client().fetch(title)
+
+
+async def fetch_movie_data_async(title):
+    """Fetch data from external movie API without blocking the event loop"""
+    return await get_async_client().fetch(title)
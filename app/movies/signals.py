@@ -0,0 +1,70 @@
+from contextvars import ContextVar
+
+from django.db.backends.signals import connection_created
+from django.db.models import DateTimeField, F, OuterRef, Subquery, Value
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from movies import metrics
+from movies.cache import ranking_cache
+from movies.models import Comment, DailyCommentCount, Movie
+
+
+@receiver(post_save, sender=Comment)
+def count_created_comment(sender, instance, created, **kwargs):
+    """Increment the daily comment count and comment stats of the movie when a comment is created"""
+    if created:
+        day = timezone.localdate(instance.created)
+        DailyCommentCount.objects.add(instance.movie_id, day)
+        ranking_cache.invalidate(day)
+        Movie.objects.filter(id=instance.movie_id).update(
+            comment_count=F("comment_count") + 1,
+            # GREATEST ignores the NULL of the first comment
+            last_commented_at=Greatest("last_commented_at", Value(instance.created, output_field=DateTimeField())),
+            updated=timezone.now(),
+        )
+
+
+# Ids of the movies being deleted, their daily comment counts are deleted on cascade together with the comments
+deleting_movies = ContextVar("deleting_movies", default=frozenset())
+
+
+@receiver(pre_delete, sender=Movie)
+def invalidate_deleted_movie(sender, instance, **kwargs):
+    """Invalidate the rankings of the days the movie was commented on, once for all the comments deleted on cascade"""
+    deleting_movies.set(deleting_movies.get() | {instance.pk})
+    for day in DailyCommentCount.objects.filter(movie_id=instance.pk, count__gt=0).values_list("day", flat=True):
+        ranking_cache.invalidate(day)
+
+
+@receiver(post_delete, sender=Movie)
+def forget_deleted_movie(sender, instance, **kwargs):
+    deleting_movies.set(deleting_movies.get() - {instance.pk})
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    """Decrement the daily comment count and comment stats of the movie when a comment is deleted"""
+    # The counts and stats of a deleted movie are gone with it
+    if instance.movie_id in deleting_movies.get():
+        return
+
+    day = timezone.localdate(instance.created)
+    DailyCommentCount.objects.add(instance.movie_id, day, amount=-1)
+    ranking_cache.invalidate(day)
+    Movie.objects.filter(id=instance.movie_id).update(
+        comment_count=Greatest(F("comment_count") - 1, 0),
+        # The latest of the remaining comments, read from the (movie, -created) index
+        last_commented_at=Subquery(Comment.objects.filter(movie=OuterRef("pk")).values("created")[:1]),
+        updated=timezone.now(),
+    )
+
+
+@receiver(connection_created)
+def record_request_queries(sender, connection, **kwargs):
+    """Record the queries of the requests on every connection, of any thread, see `metrics.record_request_query()`"""
+    # First, so the wrappers pushed and popped by `connection.execute_wrapper()` stay last
+    if metrics.record_request_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, metrics.record_request_query)
@@ -0,0 +1,127 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db.models import DateField, ExpressionWrapper, F, FloatField, Q, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, Trunc
+from django.utils import timezone
+
+from movies.cache import ranking_cache
+from movies.models import DailyCommentCount
+
+INTERVALS = ("day", "week")
+
+
+def bucket_start(day, interval):
+    """First day of the bucket containing the day, weeks start on Monday"""
+    return day - timedelta(days=day.weekday()) if interval == "week" else day
+
+
+def bucket_count(start_date, end_date, interval):
+    """Amount of the buckets of the date range, without building them"""
+    return (end_date - bucket_start(start_date, interval)).days // (7 if interval == "week" else 1) + 1
+
+
+def bucket_starts(start_date, end_date, interval):
+    """First days of all the buckets of the date range, the first one can start before the range"""
+    step = timedelta(days=7 if interval == "week" else 1)
+    first = bucket_start(start_date, interval)
+    return [first + step * number for number in range(bucket_count(start_date, end_date, interval))]
+
+
+def previous_window(start_date, end_date):
+    """The date range of the same length right before the given one, raise OverflowError before year 1"""
+    return start_date - (end_date - start_date) - timedelta(days=1), start_date - timedelta(days=1)
+
+
+def trending_movies(start_date, end_date, movie_ids=None, limit=None):
+    """
+    Comments of the movies in the date range and in the previous window of the same length, with a single grouped
+    query. The trending score is the growth of the comments relative to the previous window, a movie without
+    comments in the previous window grows from 1. Without `movie_ids` only the first `limit` movies commented in
+    the date range are returned, the most trending first.
+    """
+    previous_start, _ = previous_window(start_date, end_date)
+    counts = DailyCommentCount.objects.filter(day__range=[previous_start, end_date])
+    if movie_ids is not None:
+        counts = counts.filter(movie_id__in=movie_ids)
+
+    rows = (
+        counts.values("movie_id")
+        .annotate(
+            total_comments=Coalesce(Sum("count", filter=Q(day__gte=start_date)), 0),
+            previous_comments=Coalesce(Sum("count", filter=Q(day__lt=start_date)), 0),
+        )
+        .annotate(
+            trending=ExpressionWrapper(
+                (F("total_comments") - F("previous_comments")) * Value(1.0) / Greatest("previous_comments", 1),
+                output_field=FloatField(),
+            )
+        )
+        .order_by("-trending", "-total_comments", "movie_id")
+    )
+    if movie_ids is None:
+        rows = rows.filter(total_comments__gt=0)[:limit]
+    movies = [{**row, "trending": round(row["trending"], 3)} for row in rows]
+
+    # Movies asked for without any comments in both windows
+    missing = [] if movie_ids is None else sorted(set(movie_ids) - {movie["movie_id"] for movie in movies})
+    return movies + [
+        {"movie_id": movie_id, "total_comments": 0, "previous_comments": 0, "trending": 0.0} for movie_id in missing
+    ]
+
+
+def comment_activity(start_date, end_date, interval, movie_ids):
+    """`(movie_id, bucket start, comments)` rows of the movies in the date range, with a single grouped query"""
+    return list(
+        DailyCommentCount.objects.filter(movie_id__in=movie_ids, day__range=[start_date, end_date], count__gt=0)
+        .annotate(bucket=Trunc("day", interval, output_field=DateField()))
+        .values_list("movie_id", "bucket")
+        .annotate(comments=Sum("count"))
+        .order_by()
+    )
+
+
+def activity_stats(start_date, end_date, interval="day", movie_ids=None, limit=10):
+    """
+    Comments per movie per day or week of the date range, with the trending scores of `trending_movies()`.
+    The `limit` only applies to the most trending movies, all the given `movie_ids` are returned.
+
+    The buckets which are over can't get new comments anymore (unless they're deleted, which invalidates
+    them), so their counts are cached without a timeout and only the current bucket is queried again.
+    """
+    if movie_ids is not None:
+        movie_ids, limit = sorted(set(movie_ids)), None
+    movies = ranking_cache.get_or_set(
+        previous_window(start_date, end_date)[0],
+        end_date,
+        lambda: trending_movies(start_date, end_date, movie_ids, limit),
+        variant=("trending", start_date, movie_ids, limit),
+    )
+    ids = sorted(movie["movie_id"] for movie in movies)
+
+    rows = []
+    open_start = bucket_start(timezone.localdate(), interval)
+    if ids and start_date < open_start:
+        closed_end = min(end_date, open_start - timedelta(days=1))
+        rows += ranking_cache.get_or_set(
+            start_date,
+            closed_end,
+            lambda: comment_activity(start_date, closed_end, interval, ids),
+            variant=("activity", interval, ids),
+        )
+    if ids and end_date >= open_start:
+        rows += comment_activity(max(start_date, open_start), end_date, interval, ids)
+
+    counts = defaultdict(dict)
+    for movie_id, bucket, comments in rows:
+        counts[movie_id][bucket] = comments
+    buckets = bucket_starts(start_date, end_date, interval)
+    return {
+        "start": start_date,
+        "end": end_date,
+        "interval": interval,
+        "buckets": buckets,
+        "movies": [
+            {**movie, "counts": [counts[movie["movie_id"]].get(bucket, 0) for bucket in buckets]} for movie in movies
+        ],
+    }
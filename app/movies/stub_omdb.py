@@ -0,0 +1,75 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class StubOMDbHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        stub = self.server.stub
+        with stub.lock:
+            stub.requests += 1
+            failing, stub.failures = stub.failures > 0, max(stub.failures - 1, 0)
+
+        if stub.latency:
+            time.sleep(stub.latency)
+        if failing:
+            return self.respond(503, {"Response": "False", "Error": "Service unavailable"})
+
+        title = parse_qs(urlparse(self.path).query).get("t", [""])[0]
+        data = stub.movies.get(title.casefold())
+        if data is None:
+            return self.respond(200, {"Response": "False", "Error": "Movie not found!"})
+        return self.respond(200, {"Title": title, **data, "Response": "True"})
+
+    def respond(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Benchmarks open hundreds of connections at once
+    request_queue_size = 1024
+
+
+class StubOMDbServer:
+    """
+    Local stand-in for the OMDb API serving the given movies from a background thread.
+    Latency and failing (503) responses can be injected to test timeouts, retries and the circuit breaker.
+    """
+
+    def __init__(self, movies=None, latency=0):
+        self.movies = {title.casefold(): data for title, data in (movies or {}).items()}
+        self.latency = latency
+        self.failures = 0
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.server = StubHTTPServer(("127.0.0.1", 0), StubOMDbHandler)
+        self.server.stub = self
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_port}/"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
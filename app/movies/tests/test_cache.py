@@ -0,0 +1,97 @@
+from datetime import date, timedelta
+from unittest.mock import patch
+
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, router
+from django.test import TestCase
+
+from config.db.replicas import RequestDatabases, current_databases
+from movies.cache import RankingCache
+from movies.models import Movie
+from movies.tests.utils import capture_on_commit_callbacks
+
+
+class RankingCacheTests(TestCase):
+    def setUp(self):
+        caches["ranking"].clear()
+        caches["ranking_generations"].clear()
+        self.cache = RankingCache()
+        self.today = date(2020, 12, 15)
+        patcher = patch("movies.cache.timezone.localdate", return_value=self.today)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_segments(self):
+        """Test splitting a date range into whole years, whole months and single days"""
+        segments = RankingCache.segments(date(2018, 12, 30), date(2020, 3, 2))
+
+        self.assertEqual(
+            segments, ["2018-12-30", "2018-12-31", "2019", "2020-01", "2020-02", "2020-03-01", "2020-03-02"]
+        )
+
+    def test_get_or_set(self):
+        """Test the payload is calculated only once per date range"""
+        default = ["ranking"]
+        calls = []
+
+        for _ in range(2):
+            payload = self.cache.get_or_set(date(2020, 1, 1), date(2020, 1, 31), lambda: calls.append(1) or default)
+
+        self.assertEqual(payload, default)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(self.cache.stats(), {"hits": 1, "misses": 1, "hit_ratio": 0.5})
+
+    def test_invalidate_affected_ranges(self):
+        """Test invalidating a day only invalidates the ranges containing it"""
+        ranges = [(date(2020, 1, 1), date(2020, 12, 31)), (date(2020, 12, 1), date(2020, 12, 10))]
+        for start_date, end_date in ranges:
+            self.cache.get_or_set(start_date, end_date, lambda: ["ranking"])
+
+        with capture_on_commit_callbacks(execute=True):
+            self.cache.invalidate(self.today - timedelta(days=1))
+
+        for start_date, end_date in ranges:
+            self.cache.get_or_set(start_date, end_date, lambda: ["ranking"])
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+    def test_invalidate_on_commit(self):
+        """Test the ranges are invalidated only once the transaction writing the comments is committed"""
+        self.cache.get_or_set(date(2020, 12, 1), date(2020, 12, 10), lambda: ["ranking"])
+
+        with capture_on_commit_callbacks() as callbacks:
+            self.cache.invalidate(date(2020, 12, 5))
+        # A concurrent request still sees the committed comments, and caches them under the current generations
+        self.cache.get_or_set(date(2020, 12, 1), date(2020, 12, 10), lambda: ["ranking"])
+        for callback in callbacks:
+            callback()
+        self.cache.get_or_set(date(2020, 12, 1), date(2020, 12, 10), lambda: ["ranking"])
+
+        self.assertEqual(self.cache.stats(), {"hits": 1, "misses": 2, "hit_ratio": 1 / 3})
+
+    def test_generations_not_evicted_with_payloads(self):
+        """Test evicting the payloads doesn't bring back the keys of the ranges before their invalidation"""
+        key = self.cache.make_key(date(2020, 12, 1), date(2020, 12, 10))
+        with capture_on_commit_callbacks(execute=True):
+            self.cache.invalidate(date(2020, 12, 5))
+
+        caches["ranking"].clear()
+
+        self.assertNotEqual(self.cache.make_key(date(2020, 12, 1), date(2020, 12, 10)), key)
+
+    def test_calculated_on_primary(self):
+        """Test the payloads are calculated on the primary database, also in requests reading from a replica"""
+        token = current_databases.set(RequestDatabases("replica1"))
+        self.addCleanup(current_databases.reset, token)
+
+        payload = self.cache.get_or_set(date(2020, 1, 1), date(2020, 1, 31), lambda: [router.db_for_read(Movie)])
+
+        self.assertEqual(payload, [DEFAULT_DB_ALIAS])
+
+    def test_closed_range_without_timeout(self):
+        """Test ranges ending before today are cached without a timeout"""
+        with patch.object(self.cache.cache, "set") as cache_set:
+            self.cache.get_or_set(date(2020, 1, 1), date(2020, 1, 31), lambda: [])
+            self.cache.get_or_set(date(2020, 12, 1), date(2020, 12, 31), lambda: [])
+
+        self.assertIsNone(cache_set.call_args_list[0][0][2])
+        self.assertIsNotNone(cache_set.call_args_list[1][0][2])
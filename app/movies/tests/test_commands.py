@@ -0,0 +1,130 @@
+import json
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from movies.benchmark import generate_data
+from movies.models import FetchJob, Movie, Comment, DailyCommentCount, day_start
+from movies.stub_omdb import StubOMDbServer
+
+
+class CommandTests(TestCase):
+    def test_rebuild_comment_counts(self):
+        """Test rebuilding the daily comment counts"""
+        movie = Movie.objects.create(title="Great Movie", data={"Year": "1999", "Genre": "Drama"})
+        Comment.objects.create(movie=movie, body="Test comment")
+        DailyCommentCount.objects.all().delete()
+
+        call_command("rebuild_comment_counts", stdout=StringIO())
+
+        self.assertEqual(DailyCommentCount.objects.get(movie=movie).count, 1)
+
+    def test_rebuild_comment_counts_date_range(self):
+        """Test rebuilding the daily comment counts of a date range"""
+        movie = Movie.objects.create(title="Great Movie", data={"Year": "1999", "Genre": "Drama"})
+        Comment.objects.create(movie=movie, body="Test comment")
+        DailyCommentCount.objects.update(count=10)
+
+        call_command("rebuild_comment_counts", start=timezone.localdate(), stdout=StringIO())
+
+        self.assertEqual(DailyCommentCount.objects.get(movie=movie).count, 1)
+
+    def test_reconcile_comment_counts(self):
+        """Test repairing the comment counts kept on the movies"""
+        movie = Movie.objects.create(title="Great Movie", data={"Year": "1999", "Genre": "Drama"})
+        Comment.objects.create(movie=movie, body="Test comment")
+        Movie.objects.update(comment_count=0)
+        out = StringIO()
+
+        call_command("reconcile_comment_counts", stdout=out)
+
+        movie.refresh_from_db()
+        self.assertEqual(movie.comment_count, 1)
+        self.assertIn("Repaired 1 movies", out.getvalue())
+
+    def test_import_movies(self):
+        """Test importing movies from a file with one title per line"""
+        Movie.objects.create(title="Great Movie", data={"Year": "1999", "Genre": "Drama"})
+        out = StringIO()
+
+        with StubOMDbServer({"Test movie": {"Year": "2020"}}) as omdb, override_settings(API_URL=omdb.url):
+            with tempfile.NamedTemporaryFile("w", suffix=".txt") as titles:
+                titles.write("Test movie\nGreat Movie\n\nUnknown movie\n")
+                titles.flush()
+                call_command("import_movies", titles.name, batch_size=2, stdout=out)
+
+        self.assertTrue(Movie.objects.filter(title="Test movie").exists())
+        self.assertIn("Unknown movie: not_found", out.getvalue())
+        self.assertIn("created: 1, exists: 1, not_found: 1", out.getvalue())
+
+    def test_fetch_movies(self):
+        """Test fetching the data of the queued movies until the queue is empty"""
+        movie = Movie.objects.create(title="Test movie", status=Movie.Status.PENDING, fetched_at=None)
+        FetchJob.objects.enqueue([movie.id])
+        out = StringIO()
+
+        with StubOMDbServer({"Test movie": {"Year": "2020"}}) as omdb, override_settings(API_URL=omdb.url):
+            call_command("fetch_movies", once=True, stdout=out)
+
+        movie.refresh_from_db()
+        self.assertEqual(movie.status, Movie.Status.READY)
+        self.assertIn("ready: 1", out.getvalue())
+
+    def test_benchmark_comment_queries_seed(self):
+        """Test seeding the comments of the comment lookups benchmark keeps the comment stats of the movies"""
+        out = StringIO()
+
+        call_command("benchmark_comment_queries", seed=50, movies=5, days=3, stdout=out, stderr=StringIO())
+
+        movies = Movie.objects.filter(title__startswith="Benchmark movie ")
+        self.assertEqual(sum(movie.comment_count for movie in movies), 50)
+        self.assertEqual(
+            set(json.loads(out.getvalue())), {"movie_comments", "comments_in_week", "comments_in_week_by_date"}
+        )
+
+    def test_generate_benchmark_data(self):
+        """Test the generated comments cover every day, also right after midnight"""
+        today = timezone.localdate()
+        with patch("movies.benchmark.timezone.now", return_value=day_start(today) + timedelta(seconds=1)):
+            movie_ids = generate_data("Benchmark", movies=3, comments=20, days=3)
+
+        days = DailyCommentCount.objects.filter(movie_id__in=movie_ids).values_list("day", flat=True)
+        self.assertEqual(set(days), {today - timedelta(days=offset) for offset in range(4)})
+        self.assertEqual(Comment.objects.filter(movie_id__in=movie_ids).count(), 20)
+
+    def test_benchmark_api(self):
+        """Test benchmarking the endpoints on generated data, which is removed afterwards"""
+        out = StringIO()
+
+        with tempfile.NamedTemporaryFile("r", suffix=".json") as output:
+            call_command(
+                "benchmark_api",
+                movies=5,
+                comments=50,
+                days=3,
+                requests=4,
+                concurrency=1,
+                latency=0,
+                output=output.name,
+                stdout=out,
+                stderr=StringIO(),
+            )
+            report = json.load(output)
+
+        self.assertEqual(json.loads(out.getvalue()), report)
+        self.assertEqual(
+            set(report["results"]),
+            {"movies_list", "movie_detail", "comments_list", "top", "comment_create", "movie_create"},
+        )
+        for result in report["results"].values():
+            self.assertEqual(result["requests"], 4)
+            self.assertEqual(result["errors"], 0, result["statuses"])
+            self.assertEqual(set(result["latency_ms"]), {"mean", "p50", "p95", "p99", "max"})
+            self.assertGreaterEqual(result["queries_per_request"]["max"], 1)
+        self.assertFalse(Movie.objects.filter(title__startswith="Benchmark ").exists())
+        self.assertFalse(Comment.objects.exists())
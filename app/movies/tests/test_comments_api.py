@@ -1,13 +1,20 @@
+import json
+from datetime import timedelta
+from unittest.mock import ANY
+
 from django.urls import reverse
 from django.test import TestCase
+from django.utils import timezone
 
 from rest_framework import status
-from rest_framework.test import APIClient
 
-from movies.models import Movie, Comment
+from movies.models import Movie, Comment, DailyCommentCount
+from movies.tests.utils import QueryBudgetAPIClient
 from movies.api.serializers import CommentSerializer
 
 LIST_CREATE_COMMENTS_URL = reverse("list_create_comment")
+BULK_CREATE_COMMENTS_URL = reverse("bulk_create_comment")
+EXPORT_COMMENTS_URL = reverse("export_comments")
 
 
 def sample_movie(title="Great Movie", data={"Year": "1999", "Genre": "Drama"}):
@@ -22,7 +29,7 @@ def sample_comment(movie, body="Test comment"):
 
 class CommentsAPITests(TestCase):
     def setUp(self):
-        self.client = APIClient()
+        self.client = QueryBudgetAPIClient()
 
     def test_list_comments(self):
         """Test retrieving a list of comments"""
@@ -75,3 +82,86 @@ class CommentsAPITests(TestCase):
 
         serializer = CommentSerializer(comments, many=True)
         self.assertEqual(serializer.data, res.data)
+
+    def test_bulk_create_comments(self):
+        """Test creating many comments at once, with the invalid ones reported by their index"""
+        movie = sample_movie()
+        payload = [
+            {"movie": movie.id, "body": "Test comment"},
+            {"movie": movie.id + 1, "body": "Test comment"},
+            {"movie": movie.id, "body": ""},
+            {"movie": movie.id, "body": "Test comment 2"},
+        ]
+
+        with self.settings(COMMENTS_BULK_CHUNK_SIZE=2):
+            res = self.client.post(BULK_CREATE_COMMENTS_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["created"], 2)
+        self.assertEqual([error["index"] for error in res.data["errors"]], [1, 2])
+        self.assertIn("movie", res.data["errors"][0]["errors"])
+        self.assertIn("body", res.data["errors"][1]["errors"])
+        self.assertEqual(Comment.objects.filter(movie=movie).count(), 2)
+        self.assertEqual(DailyCommentCount.objects.get(movie=movie, day=timezone.localdate()).count, 2)
+        movie.refresh_from_db()
+        self.assertEqual(movie.comment_count, 2)
+
+    def test_bulk_create_comments_ndjson(self):
+        """Test creating many comments at once from newline delimited JSON"""
+        movie = sample_movie()
+        sample_comment(movie)
+        body = "\n".join(json.dumps({"movie": movie.id, "body": f"Test comment {i}"}) for i in range(5))
+
+        res = self.client.post(BULK_CREATE_COMMENTS_URL, body, content_type="application/x-ndjson")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {"created": 5, "errors": []})
+        self.assertEqual(DailyCommentCount.objects.get(movie=movie, day=timezone.localdate()).count, 6)
+
+    def test_bulk_create_comments_malformed_ndjson(self):
+        """Test malformed newline delimited JSON creates no comments"""
+        movie = sample_movie()
+        body = json.dumps({"movie": movie.id, "body": "Test comment"}) + "\n{"
+
+        res = self.client.post(BULK_CREATE_COMMENTS_URL, body, content_type="application/x-ndjson")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Comment.objects.exists())
+
+    def test_bulk_create_comments_not_a_list(self):
+        """Test creating comments at once requires a list"""
+        res = self.client.post(BULK_CREATE_COMMENTS_URL, {"movie": 1, "body": "Test comment"}, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_comments_since(self):
+        """Test streaming the comments created since a moment"""
+        movie = sample_movie()
+        old = sample_comment(movie, body="Old comment")
+        Comment.objects.filter(id=old.id).update(created=timezone.now() - timedelta(days=10))
+        comment = sample_comment(movie)
+
+        res = self.client.get(EXPORT_COMMENTS_URL, {"since": (timezone.localdate() - timedelta(days=1)).isoformat()})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        rows = [json.loads(line) for line in b"".join(res.streaming_content).splitlines()]
+        self.assertEqual(rows, [{"id": comment.id, "movie_id": movie.id, "body": "Test comment", "created": ANY}])
+
+    def test_export_comments_invalid_since(self):
+        """Test exporting the comments since an invalid moment"""
+        res = self.client.get(EXPORT_COMMENTS_URL, {"since": "yesterday"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filter_comments_by_movie_not_modified(self):
+        """Test the comments of a movie are answered with 304 until one of them is deleted"""
+        movie = sample_movie()
+        comment = sample_comment(movie)
+        res = self.client.get(LIST_CREATE_COMMENTS_URL, {"movie_id": movie.id})
+
+        not_modified = self.client.get(LIST_CREATE_COMMENTS_URL, {"movie_id": movie.id}, HTTP_IF_NONE_MATCH=res["ETag"])
+        comment.delete()
+        modified = self.client.get(LIST_CREATE_COMMENTS_URL, {"movie_id": movie.id}, HTTP_IF_NONE_MATCH=res["ETag"])
+
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(modified.status_code, status.HTTP_404_NOT_FOUND)
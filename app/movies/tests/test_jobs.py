@@ -0,0 +1,91 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from movies.jobs import enqueue_stale, run_worker
+from movies.models import FetchJob, Movie
+from movies.stub_omdb import StubOMDbServer
+
+
+def pending_movie(title="Test movie"):
+    movie = Movie.objects.create(title=title, status=Movie.Status.PENDING, fetched_at=None)
+    FetchJob.objects.enqueue([movie.id])
+    return movie
+
+
+@override_settings(OMDB_RETRIES=0, MOVIES_FETCH_RETRY_DELAY=60, MOVIES_FETCH_MAX_ATTEMPTS=2)
+class FetchJobTests(TestCase):
+    def setUp(self):
+        self.omdb = StubOMDbServer({"Test movie": {"Year": "2020", "Genre": "Drama"}}).start()
+        self.addCleanup(self.omdb.stop)
+        omdb_settings = override_settings(API_URL=self.omdb.url)
+        omdb_settings.enable()
+        self.addCleanup(omdb_settings.disable)
+
+    def work(self):
+        return list(run_worker(workers=2, poll_interval=0, once=True))
+
+    def test_fetch_pending_movie(self):
+        """Test the worker fills the data of a pending movie"""
+        movie = pending_movie()
+
+        self.assertEqual(self.work(), [("Test movie", "ready")])
+
+        movie.refresh_from_db()
+        self.assertEqual(movie.status, Movie.Status.READY)
+        self.assertEqual(movie.data, {"Year": "2020", "Genre": "Drama", "Response": "True"})
+        self.assertEqual(movie.year, 2020)
+        self.assertEqual(movie.genres, ["drama"])
+        self.assertIsNotNone(movie.fetched_at)
+        self.assertFalse(FetchJob.objects.exists())
+
+    def test_fetch_not_found(self):
+        """Test a movie which doesn't exist in the external api fails without retries"""
+        movie = pending_movie(title="Unknown movie")
+
+        self.assertEqual(self.work(), [("Unknown movie", "failed")])
+
+        movie.refresh_from_db()
+        self.assertEqual(movie.status, Movie.Status.FAILED)
+        self.assertFalse(FetchJob.objects.exists())
+
+    def test_fetch_retried(self):
+        """Test a failing fetch is retried later with a backoff, until the attempts are exhausted"""
+        movie = pending_movie()
+        self.omdb.failures = 10
+
+        self.assertEqual(self.work(), [("Test movie", "retry")])
+
+        job = FetchJob.objects.get(movie=movie)
+        self.assertEqual(job.attempts, 1)
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=50))
+        self.assertIn("503", job.last_error)
+
+        FetchJob.objects.update(run_at=timezone.now())
+        self.assertEqual(self.work(), [("Test movie", "failed")])
+        movie.refresh_from_db()
+        self.assertEqual(movie.status, Movie.Status.FAILED)
+
+    def test_claimed_job_is_leased(self):
+        """Test a claimed job isn't claimed again until its lease runs out"""
+        pending_movie()
+
+        self.assertEqual(len(FetchJob.objects.claim(10, lease=60)), 1)
+        self.assertEqual(FetchJob.objects.claim(10, lease=60), [])
+
+    def test_refresh_stale_movies(self):
+        """Test the stale data is fetched again, and kept when the movie can't be found anymore"""
+        stale = timezone.now() - timedelta(days=30)
+        movie = Movie.objects.create(title="Test movie", data={"Year": "1999"}, fetched_at=stale)
+        gone = Movie.objects.create(title="Gone movie", data={"Year": "1999"}, fetched_at=stale)
+        Movie.objects.create(title="Fresh movie", data={"Year": "1999"})
+
+        self.assertEqual(enqueue_stale(max_age=86400), 2)
+        self.assertEqual(sorted(self.work()), [("Gone movie", "skipped"), ("Test movie", "ready")])
+
+        movie.refresh_from_db()
+        gone.refresh_from_db()
+        self.assertEqual(movie.year, 2020)
+        self.assertEqual(gone.data, {"Year": "1999"})
+        self.assertGreater(gone.fetched_at, stale)
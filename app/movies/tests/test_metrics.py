@@ -0,0 +1,103 @@
+import math
+
+from django.test import AsyncClient, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from movies import metrics
+from movies.models import Movie
+
+METRICS_URL = reverse("metrics")
+
+
+class HistogramTests(TestCase):
+    def test_render(self):
+        """Test rendering a histogram with cumulative buckets, sum and count"""
+        histogram = metrics.Histogram("test_seconds", "Test histogram", labels=("route",), buckets=(0.1, 1))
+        histogram.observe(0.05, route="a")
+        histogram.observe(0.5, route="a")
+        histogram.observe(5, route="a")
+
+        self.assertEqual(
+            histogram.render(),
+            [
+                "# HELP test_seconds Test histogram",
+                "# TYPE test_seconds histogram",
+                'test_seconds_bucket{route="a",le="0.1"} 1',
+                'test_seconds_bucket{route="a",le="1"} 2',
+                'test_seconds_bucket{route="a",le="+Inf"} 3',
+                'test_seconds_sum{route="a"} 5.55',
+                'test_seconds_count{route="a"} 3',
+            ],
+        )
+        self.assertEqual(histogram.buckets, (0.1, 1, math.inf))
+
+    def test_escape_labels(self):
+        """Test the label values are escaped"""
+        counter = metrics.Counter("test", "Test counter", labels=("route",))
+        counter.inc(route='a"b\\')
+
+        self.assertEqual(counter.render()[-1], 'test_total{route="a\\"b\\\\"} 1.0')
+
+
+class MetricsMiddlewareTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.movie = Movie.objects.create(title="Great Movie", data={"Year": "1999"})
+
+    def test_request_recorded(self):
+        """Test the requests are recorded by route, with their database queries and serializer time"""
+        self.client.get(reverse("retrieve_update_destroy_movie", args=[self.movie.id]))
+
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res["Content-Type"].startswith("text/plain; version=0.0.4"))
+        body = res.content.decode()
+        self.assertIn(
+            'http_request_duration_seconds_count{method="GET",route="api/movies/<int:id>",status="200"}', body
+        )
+        self.assertIn('http_request_db_queries_count{route="api/movies/<int:id>"}', body)
+        self.assertIn('http_request_serializer_duration_seconds_count{route="api/movies/<int:id>"}', body)
+
+    async def test_async_request_queries_recorded(self):
+        """Test the queries of the async views, which run in another thread, are recorded"""
+        route = ("api/movies/async/",)
+        _, queries, count = metrics.REQUEST_DB_QUERIES.values.get(route, (None, 0, 0))
+
+        # An existing title is checked in the database before OMDb is called
+        res = await AsyncClient().post(
+            reverse("create_movie_async"), {"title": "Great Movie"}, content_type="application/json"
+        )
+
+        self.assertEqual(res.status_code, 400)
+        _, recorded_queries, recorded_count = metrics.REQUEST_DB_QUERIES.values[route]
+        self.assertEqual(recorded_count, count + 1)
+        self.assertGreater(recorded_queries, queries)
+
+    def test_unmatched_route(self):
+        """Test requests to unknown paths share a single route"""
+        self.client.get("/unknown/path")
+
+        body = self.client.get(METRICS_URL).content.decode()
+
+        self.assertIn('route="unmatched",status="404"', body)
+        self.assertNotIn("/unknown/path", body)
+
+    @override_settings(SLOW_REQUEST_THRESHOLD=1e-9)
+    def test_slow_request_logged(self):
+        """Test requests slower than the threshold are logged with their SQL"""
+        with self.assertLogs("movies.slow_requests", level="WARNING") as logs:
+            self.client.get(reverse("retrieve_update_destroy_movie", args=[self.movie.id]))
+
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("api/movies/<int:id>", logs.output[0])
+        self.assertIn("FROM \"movies_movie\"", logs.output[0])
+
+    @override_settings(SLOW_REQUEST_THRESHOLD=0)
+    def test_slow_request_log_disabled(self):
+        """Test a zero threshold disables the slow requests log"""
+        with self.assertRaises(AssertionError):
+            with self.assertLogs("movies.slow_requests", level="WARNING"):
+                self.client.get(reverse("retrieve_update_destroy_movie", args=[self.movie.id]))
@@ -1,6 +1,11 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection
 from django.test import TestCase
+from django.utils import timezone
 
-from movies.models import Movie, Comment
+from movies.models import Movie, Comment, DailyCommentCount, trigram_available
 from movies.api.serializers import MovieSerializer
 
 
@@ -21,6 +26,36 @@ class ModelTests(TestCase):
 
         self.assertEqual(str(movie), movie.title)
 
+    def test_movie_genres(self):
+        """Test the genres are extracted from the movie data on save"""
+        movie = sample_movie(data={"Genre": "Drama, Science Fiction"})
+
+        self.assertEqual(movie.genres, ["drama", "science fiction"])
+
+        movie.data = {"Genre": "N/A"}
+        movie.save()
+        movie.refresh_from_db()
+        self.assertEqual(movie.genres, [])
+
+    def test_movie_sort_fields(self):
+        """Test the typed sort fields are extracted from the movie data on save"""
+        movie = sample_movie(data={"Year": "1999–2003", "Metascore": "73", "imdbRating": "7.8"})
+        movie.refresh_from_db()
+        self.assertEqual((movie.year, movie.metascore, movie.imdb_rating), (1999, 73, Decimal("7.8")))
+
+        movie.data = {"Year": "N/A", "Metascore": "N/A", "imdbRating": "N/A"}
+        movie.save()
+        movie.refresh_from_db()
+        self.assertEqual((movie.year, movie.metascore, movie.imdb_rating), (None, None, None))
+
+        movie.data = {"Year": 1994}
+        movie.save()
+        self.assertEqual(movie.year, 1994)
+
+        movie.data = [1, 2]
+        movie.save()
+        self.assertEqual((movie.year, movie.genres), (None, []))
+
     def test_comment_str(self):
         """Test the comment string representation"""
         comment = sample_comment(movie=sample_movie())
@@ -58,3 +93,218 @@ class ModelTests(TestCase):
         movies = Movie.objects.create_ranking(start_date="2010-11-27", end_date="3020-11-29")
         serializer = MovieSerializer(movies, many=True, fields=["movie_id", "total_comments", "rank"])
         self.assertEqual(serializer.data, correct_ranking)
+
+    def test_movie_create_ranking_date_range(self):
+        """Test the ranking only counts comments from the specified date range"""
+        movie1 = sample_movie()
+        movie2 = sample_movie(title="Another Great Movie", data={"Year": "2000", "Genre": "Drama"})
+        sample_comment(movie1)
+        old_comment = sample_comment(movie2)
+        Comment.objects.filter(pk=old_comment.pk).update(created=timezone.now() - timedelta(days=10))
+        DailyCommentCount.objects.rebuild()
+
+        today = timezone.localdate()
+        movies = Movie.objects.create_ranking(start_date=today - timedelta(days=1), end_date=today)
+
+        self.assertEqual([(movie.id, movie.total_comments) for movie in movies], [(movie1.id, 1)])
+
+    def test_daily_comment_count_created(self):
+        """Test the daily comment count is incremented when a comment is created"""
+        movie = sample_movie()
+        sample_comment(movie)
+        sample_comment(movie)
+
+        count = DailyCommentCount.objects.get(movie=movie)
+        self.assertEqual(count.day, timezone.localdate())
+        self.assertEqual(count.count, 2)
+
+    def test_daily_comment_count_deleted(self):
+        """Test the daily comment count is decremented when a comment is deleted"""
+        movie = sample_movie()
+        comment = sample_comment(movie)
+        sample_comment(movie)
+
+        comment.delete()
+
+        self.assertEqual(DailyCommentCount.objects.get(movie=movie).count, 1)
+
+    def test_daily_comment_count_cascade(self):
+        """Test the daily comment counts are removed together with the movie"""
+        movie = sample_movie()
+        sample_comment(movie)
+
+        movie.delete()
+
+        self.assertFalse(DailyCommentCount.objects.exists())
+
+    def test_daily_comment_count_rebuild(self):
+        """Test rebuilding the daily comment counts from the comments"""
+        movie = sample_movie()
+        sample_comment(movie)
+        sample_comment(movie)
+        DailyCommentCount.objects.update(count=10)
+
+        created = DailyCommentCount.objects.rebuild()
+
+        self.assertEqual(created, 1)
+        self.assertEqual(DailyCommentCount.objects.get(movie=movie).count, 2)
+
+    def test_daily_comment_count_rebuild_date_range(self):
+        """Test rebuilding the daily comment counts of a date range keeps the other days"""
+        movie = sample_movie()
+        sample_comment(movie)
+        old_comment = sample_comment(movie)
+        Comment.objects.filter(pk=old_comment.pk).update(created=timezone.now() - timedelta(days=10))
+        DailyCommentCount.objects.rebuild()
+        DailyCommentCount.objects.update(count=10)
+
+        today = timezone.localdate()
+        created = DailyCommentCount.objects.rebuild(start_date=today - timedelta(days=1), end_date=today)
+
+        self.assertEqual(created, 1)
+        self.assertEqual(
+            list(DailyCommentCount.objects.order_by("day").values_list("count", flat=True)),
+            [10, 1],
+        )
+
+    def test_comment_created_between(self):
+        """Test filtering the comments by the days they were created on, both days included"""
+        movie = sample_movie()
+        comment = sample_comment(movie)
+        old_comment = sample_comment(movie)
+        Comment.objects.filter(pk=old_comment.pk).update(created=timezone.now() - timedelta(days=10))
+
+        today = timezone.localdate()
+        self.assertEqual(list(Comment.objects.created_between(today, today)), [comment])
+        self.assertEqual(Comment.objects.created_between(today - timedelta(days=10), today).count(), 2)
+
+    def test_comment_latest_per_movie(self):
+        """Test keeping only the latest comments of each of the given movies"""
+        movies = [sample_movie(title=f"Movie {i}") for i in range(3)]
+        comments = [[sample_comment(movie) for _ in range(3)] for movie in movies]
+
+        latest = Comment.objects.latest_per_movie([movies[0].id, movies[1].id], 2)
+
+        self.assertEqual(
+            sorted(latest.values_list("id", flat=True)),
+            sorted(comment.id for movie_comments in comments[:2] for comment in movie_comments[1:]),
+        )
+        self.assertFalse(Comment.objects.latest_per_movie([], 2).exists())
+
+
+class CommentStatsTests(TestCase):
+    def test_comment_stats_created(self):
+        """Test the comment count and the latest comment time of the movie are updated when a comment is created"""
+        movie = sample_movie()
+        sample_comment(movie)
+        comment = sample_comment(movie)
+
+        movie.refresh_from_db()
+        self.assertEqual(movie.comment_count, 2)
+        self.assertEqual(movie.last_commented_at, comment.created)
+
+    def test_comment_stats_deleted(self):
+        """Test the comment stats fall back to the remaining comments when a comment is deleted"""
+        movie = sample_movie()
+        comment = sample_comment(movie)
+        sample_comment(movie).delete()
+
+        movie.refresh_from_db()
+        self.assertEqual(movie.comment_count, 1)
+        self.assertEqual(movie.last_commented_at, comment.created)
+
+        comment.delete()
+        movie.refresh_from_db()
+        self.assertEqual(movie.comment_count, 0)
+        self.assertIsNone(movie.last_commented_at)
+
+    def test_comment_stats_kept_on_save(self):
+        """Test saving a movie loaded before a comment was created doesn't overwrite its comment stats"""
+        movie = sample_movie()
+        comment = sample_comment(Movie.objects.get(id=movie.id))
+
+        movie.data = {"Year": "1999"}
+        movie.save()
+
+        movie.refresh_from_db()
+        self.assertEqual((movie.comment_count, movie.last_commented_at), (1, comment.created))
+        self.assertEqual(movie.year, 1999)
+
+    def test_comment_stats_added_in_bulk(self):
+        """Test adding the comments created without signals to the comment stats"""
+        movie = sample_movie()
+        comments = Comment.objects.bulk_create([Comment(movie=movie, body=f"Test comment {i}") for i in range(3)])
+
+        Movie.objects.add_comments(comments)
+
+        movie.refresh_from_db()
+        self.assertEqual(movie.comment_count, 3)
+        self.assertEqual(movie.last_commented_at, max(comment.created for comment in comments))
+
+    def test_comment_stats_reconciled(self):
+        """Test repairing the comment stats which drifted from the comments"""
+        movie = sample_movie()
+        comment = sample_comment(movie)
+        sample_movie(title="Another Great Movie")
+        Movie.objects.filter(id=movie.id).update(comment_count=5, last_commented_at=None)
+
+        repaired = Movie.objects.reconcile_comment_stats(batch_size=1)
+
+        movie.refresh_from_db()
+        self.assertEqual(repaired, 1)
+        self.assertEqual((movie.comment_count, movie.last_commented_at), (1, comment.created))
+
+
+class QueryPlanTests(TestCase):
+    """
+    The plans of the comment lookups, captured with EXPLAIN. Sequential and bitmap scans are disabled, so on the
+    tiny test tables the planner still picks a plain index scan whenever the query can use one.
+    """
+
+    def setUp(self):
+        movie = sample_movie()
+        sample_comment(movie)
+        self.movie = movie
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute("SET LOCAL enable_bitmapscan = off")
+
+    def test_movie_comments_plan(self):
+        """Test the comments of a movie, newest first, are read from the composite index without sorting"""
+        plan = Comment.objects.filter(movie=self.movie)[:10].explain()
+
+        self.assertIn("movies_comment_movie_created", plan)
+        self.assertNotIn("Sort", plan)
+
+    def test_latest_comments_plan(self):
+        """Test the latest comments are read from the composite index once per movie, not once per comment"""
+        plan = Comment.objects.latest_per_movie([self.movie.id], 5).explain()
+
+        self.assertIn("movies_comment_movie_created", plan)
+        self.assertNotIn("SubPlan", plan)
+
+    def test_similar_titles_plan(self):
+        """Test the similar titles are matched through the trigram index of the titles"""
+        if not trigram_available():
+            self.skipTest("pg_trgm extension isn't installed")
+        plan = Movie.objects.similar_titles("teh matirx").explain()
+
+        self.assertIn("movies_movie_title_trgm", plan)
+
+    def test_comments_date_range_plan(self):
+        """Test the half-open range of the comments creation uses the index, unlike a range over the date"""
+        today = timezone.localdate()
+
+        plan = Comment.objects.created_between(today, today).explain()
+        date_plan = Comment.objects.filter(created__date__range=[today, today]).explain()
+
+        self.assertIn("Index Cond", plan)
+        self.assertIn("movies_comment_created", plan)
+        self.assertNotIn("Index Cond", date_plan)
+
+    def test_movies_by_comments_plan(self):
+        """Test the movies sorted by their comment count are read from the index without sorting"""
+        plan = Movie.objects.order_by("-comment_count", "-id")[:10].explain()
+
+        self.assertIn("movies_movi_comment_d05eff_idx", plan)
+        self.assertNotIn("Sort", plan)
@@ -1,20 +1,44 @@
+import base64
+import csv
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from itertools import combinations
+from unittest.mock import patch
+
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django.db import connection
 from django.urls import reverse
-from django.test import TestCase
+from django.utils import timezone
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 
 from rest_framework import status
-from rest_framework.test import APIClient
 
-from movies.models import Movie, Comment
-from movies.api.serializers import MovieSerializer
+from movies.cache import ranking_cache
+from movies.models import DailyCommentCount, FetchJob, Movie, Comment
+from movies.tests.utils import QueryBudgetAPIClient, assert_max_queries, capture_on_commit_callbacks
+from movies.api.serializers import MovieSerializer, ValuesPlan
+from movies.stub_omdb import StubOMDbServer
 
 LIST_CREATE_MOVIES_URL = reverse("list_create_movie")
+BULK_CREATE_MOVIES_URL = reverse("bulk_create_movie")
+EXPORT_MOVIES_URL = reverse("export_movies")
+CREATE_MOVIE_ASYNC_URL = reverse("create_movie_async")
 LIST_TOP_MOVIES_URL = reverse("list_top_movies")
+RANKING_CACHE_STATS_URL = reverse("ranking_cache_stats")
+ACTIVITY_STATS_URL = reverse("activity_stats")
 
 
 def detail_url(movie_id):
     return reverse("retrieve_update_destroy_movie", kwargs={"id": movie_id})
 
 
+def status_url(movie_id):
+    return reverse("retrieve_movie_status", kwargs={"id": movie_id})
+
+
 def sample_movie(title="Great Movie", data={"Year": "1999", "Genre": "Drama"}):
     """Create a sample movie"""
     return Movie.objects.create(title=title, data=data)
@@ -27,7 +51,19 @@ def sample_comment(movie, body="Test comment"):
 
 class MoviesAPITests(TestCase):
     def setUp(self):
-        self.client = APIClient()
+        self.client = QueryBudgetAPIClient()
+        caches["ranking"].clear()
+
+        self.omdb = StubOMDbServer(
+            {
+                "Test movie": {"Year": "2020", "Genre": "Drama"},
+                "Another test movie": {"Year": "2021", "Genre": "Comedy"},
+            }
+        ).start()
+        self.addCleanup(self.omdb.stop)
+        omdb_settings = override_settings(API_URL=self.omdb.url)
+        omdb_settings.enable()
+        self.addCleanup(omdb_settings.disable)
 
     def test_list_movies(self):
         """Test retrieving a list of movies"""
@@ -39,7 +75,95 @@ class MoviesAPITests(TestCase):
         movies = Movie.objects.all()
         serializer = MovieSerializer(movies, many=True, fields=["id", "title", "data"])
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data["results"], serializer.data)
+
+    def test_values_plan(self):
+        """Test the values plan renders the rows like the serializer, and refuses relations"""
+        sample_movie()
+        fields = ("id", "movie_id", "title", "data", "status", "fetched_at")
+        plan = MovieSerializer.values_plan(fields)
+
+        rows = plan.render(Movie.objects.values(*plan.sources))
+
+        self.assertEqual(rows, MovieSerializer(Movie.objects.all(), many=True, fields=fields).data)
+        self.assertIs(MovieSerializer.values_plan(list(fields)), plan)
+        with self.assertRaises(ValueError):
+            MovieSerializer.values_plan(("id", "comments"))
+
+    def test_values_plan_cache_bounded(self):
+        """Test the values plans and the fields of the serializers are cached up to their size, also by threads"""
+        field_sets = [fields for size in (1, 2) for fields in combinations(("id", "title", "data", "status"), size)]
+        with patch.object(ValuesPlan, "cache", {}), patch.object(ValuesPlan, "cache_size", 3), patch.object(
+            MovieSerializer, "_field_templates", {}
+        ), patch.object(MovieSerializer, "field_templates_size", 3):
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                plans = list(executor.map(MovieSerializer.values_plan, field_sets * 4))
+
+            for fields, plan in zip(field_sets * 4, plans):
+                self.assertEqual(tuple(name for name, _, _ in plan.columns), fields)
+            self.assertEqual(len(ValuesPlan.cache), 3)
+            self.assertEqual(len(MovieSerializer._field_templates), 3)
+
+    def test_list_movies_paginated(self):
+        """Test walking through the movies list page by page with a cursor"""
+        for i in range(5):
+            sample_movie(title=f"Movie {i}")
+
+        res = self.client.get(LIST_CREATE_MOVIES_URL, {"page_size": 2})
+        titles = [movie["title"] for movie in res.data["results"]]
+        while res.data["next"]:
+            res = self.client.get(res.data["next"])
+            titles += [movie["title"] for movie in res.data["results"]]
+
+        self.assertEqual(titles, [f"Movie {i}" for i in range(5)])
+        self.assertNotIn("count", res.data)
+
+    def test_list_movies_count(self):
+        """Test the total count is only returned when requested"""
+        sample_movie()
+        sample_movie(title="Another Great movie")
+
+        res = self.client.get(LIST_CREATE_MOVIES_URL, {"page_size": 1, "count": "true"})
+
+        self.assertEqual(res.data["count"], 2)
+        self.assertEqual(len(res.data["results"]), 1)
+
+    def test_list_movies_invalid_cursor(self):
+        """Test retrieving a list of movies with a malformed cursor"""
+        res = self.client.get(LIST_CREATE_MOVIES_URL, {"cursor": "invalid"})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_movies_cursor_invalid_values(self):
+        """Test retrieving a list of movies with a cursor whose values don't match the ordering fields"""
+        sample_movie()
+
+        for params, position in (
+            ({}, ["a", "x"]),
+            ({"orderby": "Year"}, ["x", 1]),
+            ({"orderby": "Year"}, [{"year": 1999}, 1]),
+            ({"orderby": "-comments"}, [None, 1]),
+        ):
+            cursor = base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+            with self.subTest(params=params, position=position):
+                res = self.client.get(LIST_CREATE_MOVIES_URL, {**params, "cursor": cursor})
+
+                self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_order_movies_paginated(self):
+        """Test paginating movies ordered by a key which is missing for some movies"""
+        sample_movie(title="A", data={"Year": "2001"})
+        sample_movie(title="B", data={"Genre": "Drama"})
+        sample_movie(title="C", data={"Year": "1999"})
+        sample_movie(title="D", data={"Year": "1999"})
+
+        res = self.client.get(LIST_CREATE_MOVIES_URL, {"orderby": "Year", "page_size": 1})
+        titles = [movie["title"] for movie in res.data["results"]]
+        while res.data["next"]:
+            res = self.client.get(res.data["next"])
+            titles += [movie["title"] for movie in res.data["results"]]
+
+        self.assertEqual(titles, ["C", "D", "A", "B"])
 
     def test_create_movie_successful(self):
         """Test creating a new movie"""
@@ -49,6 +173,121 @@ class MoviesAPITests(TestCase):
         exists = Movie.objects.filter(title=payload["title"]).exists()
         self.assertTrue(exists)
 
+    def test_create_movie_upstream_unavailable(self):
+        """Test creating a new movie when the external movie API is failing"""
+        self.omdb.failures = 10
+        payload = {"title": "Test movie"}
+
+        with override_settings(OMDB_RETRIES=0):
+            res = self.client.post(LIST_CREATE_MOVIES_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_create_movie_deferred(self):
+        """Test creating a new movie with its data fetched in the background"""
+        res = self.client.post(f"{LIST_CREATE_MOVIES_URL}?defer=true", {"title": "Test movie"})
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(res.data["status"], Movie.Status.PENDING)
+        self.assertEqual(res.data["data"], {})
+        self.assertTrue(FetchJob.objects.filter(movie_id=res.data["id"]).exists())
+        self.assertEqual(self.omdb.requests, 0)
+
+    def test_retrieve_movie_status(self):
+        """Test polling the status of a movie"""
+        movie = Movie.objects.create(title="Test movie", status=Movie.Status.PENDING, fetched_at=None)
+
+        res = self.client.get(status_url(movie.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {"id": movie.id, "title": "Test movie", "status": "pending", "fetched_at": None})
+
+    async def test_create_movie_async(self):
+        """Test creating a new movie through the async view"""
+        res = await AsyncClient().post(CREATE_MOVIE_ASYNC_URL, {"title": "Test movie"}, content_type="application/json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.json()["data"]["Year"], "2020")
+        exists = await sync_to_async(Movie.objects.filter(title="Test movie").exists)()
+        self.assertTrue(exists)
+
+    async def test_create_movie_async_not_found(self):
+        """Test creating a new movie which doesn't exist through the async view"""
+        res = await AsyncClient().post(
+            CREATE_MOVIE_ASYNC_URL, {"title": "Unknown movie"}, content_type="application/json"
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_create_movie_async_existing(self):
+        """Test creating an existing movie through the async view doesn't call the external api"""
+        await sync_to_async(sample_movie)(title="Test movie")
+
+        res = await AsyncClient().post(
+            CREATE_MOVIE_ASYNC_URL, {"title": "Test movie"}, content_type="application/json"
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.omdb.requests, 0)
+
+    def test_export_movies(self):
+        """Test streaming all movies as NDJSON"""
+        movie = sample_movie()
+        sample_movie(title="Another Great movie")
+
+        res = self.client.get(EXPORT_MOVIES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        self.assertEqual(res["Content-Type"], "application/x-ndjson; charset=utf-8")
+        rows = [json.loads(line) for line in b"".join(res.streaming_content).splitlines()]
+        self.assertEqual([row["title"] for row in rows], ["Great Movie", "Another Great movie"])
+        self.assertEqual(rows[0]["data"], movie.data)
+
+    def test_export_movies_csv_since_id(self):
+        """Test streaming the movies added after a known one as CSV"""
+        movie = sample_movie()
+        sample_movie(title="Another Great movie")
+
+        res = self.client.get(EXPORT_MOVIES_URL, {"format": "csv", "since_id": movie.id})
+
+        self.assertEqual(res["Content-Type"], "text/csv; charset=utf-8")
+        rows = list(csv.reader(b"".join(res.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[0], ["id", "title", "data", "status", "fetched_at", "updated"])
+        self.assertEqual([row[1] for row in rows[1:]], ["Another Great movie"])
+        self.assertEqual(json.loads(rows[1][2]), {"Year": "1999", "Genre": "Drama"})
+
+    def test_export_movies_invalid_since_id(self):
+        """Test exporting the movies after an invalid id"""
+        res = self.client.get(EXPORT_MOVIES_URL, {"since_id": "x"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_create_movies(self):
+        """Test creating many movies at once"""
+        sample_movie()
+        payload = {"titles": ["Test movie", "Another test movie", "Great Movie", "Unknown movie", "Test movie"]}
+
+        res = self.client.post(BULK_CREATE_MOVIES_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data["results"],
+            [
+                {"title": "Test movie", "status": "created"},
+                {"title": "Another test movie", "status": "created"},
+                {"title": "Great Movie", "status": "exists"},
+                {"title": "Unknown movie", "status": "not_found"},
+            ],
+        )
+        self.assertEqual(Movie.objects.get(title="Another test movie").data["Year"], "2021")
+
+    def test_bulk_create_movies_invalid(self):
+        """Test creating many movies at once without any titles"""
+        res = self.client.post(BULK_CREATE_MOVIES_URL, {"titles": []}, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_create_movie_invalid(self):
         """Test creating a new movie with invalid payload"""
         payload = {"title": ""}
@@ -67,6 +306,107 @@ class MoviesAPITests(TestCase):
         serializer = MovieSerializer(movie, fields=["id", "title", "data", "comments"])
         self.assertEqual(res.data, serializer.data)
 
+    def test_retrieve_movie_detail_queries(self):
+        """Test retrieving a movie detail doesn't execute a query per comment"""
+        movie = sample_movie()
+        for i in range(5):
+            sample_comment(movie, body=f"Test comment {i}")
+
+        # The last modification lookup of the conditional GET, the movie and its comments
+        self.client.max_queries = 3
+        res = self.client.get(detail_url(movie.id))
+
+        self.assertEqual(len(res.data["comments"]), 5)
+
+    def test_retrieve_movie_not_modified(self):
+        """Test retrieving an unchanged movie again is answered with 304 with a single query"""
+        movie = sample_movie()
+        res = self.client.get(detail_url(movie.id))
+
+        self.client.max_queries = 1
+        not_modified = self.client.get(detail_url(movie.id), HTTP_IF_NONE_MATCH=res["ETag"])
+        not_modified_since = self.client.get(detail_url(movie.id), HTTP_IF_MODIFIED_SINCE=res["Last-Modified"])
+
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(not_modified_since.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_retrieve_movie_modified_by_comment(self):
+        """Test a new comment of the movie changes its ETag"""
+        movie = sample_movie()
+        res = self.client.get(detail_url(movie.id))
+        sample_comment(movie)
+
+        res = self.client.get(detail_url(movie.id), HTTP_IF_NONE_MATCH=res["ETag"])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data["comments"]), 1)
+
+    def test_list_movies_sparse_fields(self):
+        """Test selecting the fields and keys of the movie data, extracted by the database"""
+        sample_movie(data={"Year": "1999", "Genre": "Drama", "Plot": "Long plot"})
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(LIST_CREATE_MOVIES_URL, {"fields": "title,data.Year,data.imdbRating"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["results"], [{"title": "Great Movie", "data": {"Year": "1999", "imdbRating": None}}])
+        self.assertIn("jsonb_build_object", queries[0]["sql"])
+        self.assertNotIn('"movies_movie"."data",', queries[0]["sql"])
+
+    def test_list_movies_sparse_fields_paginated(self):
+        """Test walking through the pages of movies with fields which don't include the ordering ones"""
+        for i in range(5):
+            sample_movie(title=f"Movie {i}", data={"Year": str(2000 + i % 2)})
+
+        for params, expected in (
+            ({"fields": "title"}, [{"title": f"Movie {i}"} for i in range(5)]),
+            ({"fields": "data.Year"}, [{"data": {"Year": str(2000 + i % 2)}} for i in range(5)]),
+            (
+                {"fields": "title,data.Year", "orderby": "-Year"},
+                [{"title": f"Movie {i}", "data": {"Year": str(2000 + i % 2)}} for i in (3, 1, 4, 2, 0)],
+            ),
+        ):
+            with self.subTest(params=params):
+                res = self.client.get(LIST_CREATE_MOVIES_URL, {**params, "page_size": 2})
+                movies = res.data["results"]
+                while res.data["next"]:
+                    res = self.client.get(res.data["next"])
+                    self.assertEqual(res.status_code, status.HTTP_200_OK)
+                    movies += res.data["results"]
+
+                self.assertEqual(movies, expected)
+
+    def test_list_movies_sparse_fields_with_comments(self):
+        """Test selecting keys of the movie data together with the comments"""
+        sample_comment(sample_movie())
+
+        res = self.client.get(LIST_CREATE_MOVIES_URL, {"fields": "id,data.Genre", "include": "comments"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(res.data["results"][0]), {"id", "data", "comments"})
+        self.assertEqual(res.data["results"][0]["data"], {"Genre": "Drama"})
+
+    def test_list_movies_sparse_fields_invalid(self):
+        """Test selecting unknown fields or keys of other fields fails"""
+        for fields in ("title,rank", "title.Year", "data.Year;DROP", ","):
+            res = self.client.get(LIST_CREATE_MOVIES_URL, {"fields": fields})
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST, fields)
+            self.assertIn("fields", res.data)
+
+    def test_list_movies_with_comments(self):
+        """Test listing movies with their latest comments in a constant amount of queries"""
+        for i in range(3):
+            movie = sample_movie(title=f"Movie {i}")
+            for j in range(7):
+                sample_comment(movie, body=f"Test comment {i} {j}")
+
+        self.client.max_queries = 2
+        res = self.client.get(LIST_CREATE_MOVIES_URL, {"include": "comments"})
+
+        for i, movie in enumerate(res.data["results"]):
+            self.assertEqual(movie["comments"], [f"Test comment {i} {j}" for j in range(6, 1, -1)])
+
     def test_update_movie(self):
         """Test updating a movie"""
         movie = sample_movie()
@@ -79,6 +419,17 @@ class MoviesAPITests(TestCase):
 
         self.assertEqual(movie.data, payload["data"])
 
+    def test_update_movie_data_not_object(self):
+        """Test updating a movie with data which isn't a JSON object"""
+        movie = sample_movie()
+
+        for data in ([1, 2], "x"):
+            res = self.client.put(detail_url(movie.id), {"data": data}, format="json")
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            movie.refresh_from_db()
+            self.assertEqual((movie.data, movie.year), (data, None))
+
     def test_destroy_movie(self):
         """Test destroying a movie"""
         movie = sample_movie()
@@ -101,9 +452,33 @@ class MoviesAPITests(TestCase):
 
         serializer = MovieSerializer(movies, many=True, fields=["id", "title", "data"])
         filtered_serializer = MovieSerializer(filtered_movies, many=True, fields=["id", "title", "data"])
-        self.assertEqual(filtered_serializer.data, res.data)
+        self.assertEqual(filtered_serializer.data, res.data["results"])
         self.assertNotEqual(filtered_serializer.data, serializer.data)
 
+    def test_filter_movies_by_genre_exact(self):
+        """Test filtering by genre matches whole genres only, regardless of their case"""
+        sample_movie(title="Drama", data={"Genre": "Drama"})
+        sample_movie(title="Melodrama", data={"Genre": "Melodrama"})
+
+        res = self.client.get(LIST_CREATE_MOVIES_URL, {"genre": "drama"})
+
+        self.assertEqual([movie["title"] for movie in res.data["results"]], ["Drama"])
+
+    def test_filter_movies_by_many_genres(self):
+        """Test filtering by many genres, matching all or any of them"""
+        sample_movie(title="Drama", data={"Genre": "Drama"})
+        sample_movie(title="Fantasy drama", data={"Genre": "Drama, Fantasy"})
+        sample_movie(title="Fantasy", data={"Genre": "Fantasy"})
+        sample_movie(title="Comedy", data={"Genre": "Comedy"})
+
+        res_all = self.client.get(LIST_CREATE_MOVIES_URL, {"genre": ["Drama", "Fantasy"]})
+        res_any = self.client.get(LIST_CREATE_MOVIES_URL, {"genre": ["Drama", "Fantasy"], "genre_match": "any"})
+
+        self.assertEqual([movie["title"] for movie in res_all.data["results"]], ["Fantasy drama"])
+        self.assertEqual(
+            [movie["title"] for movie in res_any.data["results"]], ["Drama", "Fantasy", "Fantasy drama"]
+        )
+
     def test_order_movies_by_year(self):
         """Test returning movies ordered by year"""
         sample_movie()
@@ -116,9 +491,46 @@ class MoviesAPITests(TestCase):
 
         serializer = MovieSerializer(movies, many=True, fields=["id", "title", "data"])
         ordered_serializer = MovieSerializer(ordered_movies, many=True, fields=["id", "title", "data"])
-        self.assertEqual(ordered_serializer.data, res.data)
+        self.assertEqual(ordered_serializer.data, res.data["results"])
         self.assertNotEqual(ordered_serializer, serializer)
 
+    def test_order_movies_by_metascore_descending(self):
+        """Test paginating movies ordered by descending metascore, with movies without one last"""
+        sample_movie(title="A", data={"Metascore": "61"})
+        sample_movie(title="B", data={"Metascore": "N/A"})
+        sample_movie(title="C", data={"Metascore": "9"})
+        sample_movie(title="D", data={"Metascore": "100"})
+        sample_movie(title="E", data={"Metascore": "61"})
+
+        res = self.client.get(LIST_CREATE_MOVIES_URL, {"orderby": "-Metascore", "page_size": 2})
+        titles = [movie["title"] for movie in res.data["results"]]
+        while res.data["next"]:
+            res = self.client.get(res.data["next"])
+            titles += [movie["title"] for movie in res.data["results"]]
+
+        self.assertEqual(titles, ["D", "E", "A", "C", "B"])
+
+    def test_order_movies_by_comments(self):
+        """Test ordering movies by their amount of comments, page by page"""
+        for title, comments in (("A", 1), ("B", 3), ("C", 0), ("D", 2)):
+            movie = sample_movie(title=title)
+            for i in range(comments):
+                sample_comment(movie, body=f"Test comment {i}")
+
+        res = self.client.get(LIST_CREATE_MOVIES_URL, {"orderby": "-comments", "page_size": 3})
+        titles = [movie["title"] for movie in res.data["results"]]
+        while res.data["next"]:
+            res = self.client.get(res.data["next"])
+            titles += [movie["title"] for movie in res.data["results"]]
+
+        self.assertEqual(titles, ["B", "D", "A", "C"])
+
+    def test_order_movies_invalid(self):
+        """Test ordering movies by a key which isn't sortable"""
+        res = self.client.get(LIST_CREATE_MOVIES_URL, {"orderby": "Plot"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_list_top_movies_successful(self):
         """Test retrieving top movies by amount of comments for specific date"""
         movie1 = sample_movie()
@@ -134,6 +546,86 @@ class MoviesAPITests(TestCase):
         self.assertEqual(serializer.data, res.data)
         self.assertNotEqual([], res.data)
 
+    def test_list_top_movies_cached(self):
+        """Test the ranking is served from the cache until a comment for its date range is created"""
+        movie = sample_movie()
+        sample_comment(movie)
+        params = {"start": "2010-11-27", "end": "3020-11-29"}
+
+        self.client.get(LIST_TOP_MOVIES_URL, params)
+        with self.assertNumQueries(0):
+            self.client.get(LIST_TOP_MOVIES_URL, params)
+
+        with capture_on_commit_callbacks(execute=True):
+            sample_comment(movie)
+        res = self.client.get(LIST_TOP_MOVIES_URL, params)
+
+        self.assertEqual(res.data[0]["total_comments"], 2)
+        self.assertEqual(self.client.get(RANKING_CACHE_STATS_URL).data["hits"], 1)
+
+    def test_delete_movie_with_comments(self):
+        """Test deleting a movie deletes its comments on cascade in a constant amount of queries"""
+        movie = sample_movie()
+        Comment.objects.bulk_create([Comment(movie=movie, body=f"Test comment {i}") for i in range(200)])
+        DailyCommentCount.objects.rebuild()
+        params = {"start": "2010-11-27", "end": "3020-11-29"}
+        self.client.get(LIST_TOP_MOVIES_URL, params)
+
+        with assert_max_queries(10), capture_on_commit_callbacks(execute=True):
+            res = self.client.delete(detail_url(movie.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertFalse(Comment.objects.filter(movie_id=movie.id).exists())
+        self.assertEqual(self.client.get(LIST_TOP_MOVIES_URL, params).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_top_movies_limit(self):
+        """Test retrieving only the best ranked movies, and the rank of a single movie"""
+        movies = [sample_movie(title=f"Movie {i}") for i in range(3)]
+        for movie, comments in zip(movies, (1, 3, 2)):
+            for _ in range(comments):
+                sample_comment(movie)
+        params = {"start": "2010-11-27", "end": "3020-11-29"}
+
+        res = self.client.get(LIST_TOP_MOVIES_URL, {**params, "limit": 2})
+
+        self.assertEqual(
+            res.data,
+            [
+                {"movie_id": movies[1].id, "total_comments": 3, "rank": 1},
+                {"movie_id": movies[2].id, "total_comments": 2, "rank": 2},
+            ],
+        )
+
+        res = self.client.get(LIST_TOP_MOVIES_URL, {**params, "movie_id": movies[0].id})
+
+        self.assertEqual(res.data, [{"movie_id": movies[0].id, "total_comments": 1, "rank": 3}])
+        # The filtered rankings are cached apart from the whole one
+        self.assertEqual(len(self.client.get(LIST_TOP_MOVIES_URL, params).data), 3)
+
+    def test_list_top_movies_of_movie_without_comments(self):
+        """Test retrieving the rank of a movie without comments in the date range"""
+        sample_comment(sample_movie())
+        movie = sample_movie(title="Another Great Movie")
+
+        res = self.client.get(LIST_TOP_MOVIES_URL, {"start": "2010-11-27", "end": "3020-11-29", "movie_id": movie.id})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_top_movies_invalid_limit(self):
+        """Test retrieving top movies with an invalid limit or movie"""
+        for params in (
+            {"limit": "0"},
+            {"limit": "ten"},
+            {"limit": "1001"},
+            {"limit": "99999999999999999999999"},
+            {"movie_id": "a"},
+            {"movie_id": "2147483648"},
+        ):
+            with self.subTest(params=params):
+                res = self.client.get(LIST_TOP_MOVIES_URL, {"start": "2010-11-27", "end": "3020-11-29", **params})
+
+                self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_list_top_movies_invalid_params(self):
         """Test retrieving top movies by amount of comments for specific date range with invalid query params"""
         res = self.client.get(LIST_TOP_MOVIES_URL, {"start": "2020-11-999", "end": "2020-11-999"})
@@ -146,6 +638,115 @@ class MoviesAPITests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_activity_stats(self):
+        """Test retrieving the comments of the most trending movies per week"""
+        movie1 = sample_movie()
+        movie2 = sample_movie(title="Another Great Movie")
+        # 2020-11-30 is a Monday, the previous window of 2020-11-30 - 2020-12-13 starts on 2020-11-16
+        DailyCommentCount.objects.bulk_create(
+            [
+                DailyCommentCount(movie=movie1, day=date(2020, 11, 20), count=4),
+                DailyCommentCount(movie=movie1, day=date(2020, 12, 1), count=2),
+                DailyCommentCount(movie=movie1, day=date(2020, 12, 13), count=3),
+                DailyCommentCount(movie=movie2, day=date(2020, 12, 2), count=3),
+                DailyCommentCount(movie=movie2, day=date(2020, 12, 20), count=7),
+            ]
+        )
+
+        res = self.client.get(ACTIVITY_STATS_URL, {"start": "2020-11-30", "end": "2020-12-13", "interval": "week"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["buckets"], [date(2020, 11, 30), date(2020, 12, 7)])
+        self.assertEqual(
+            res.data["movies"],
+            [
+                {"movie_id": movie2.id, "total_comments": 3, "previous_comments": 0, "trending": 3.0, "counts": [3, 0]},
+                {
+                    "movie_id": movie1.id,
+                    "total_comments": 5,
+                    "previous_comments": 4,
+                    "trending": 0.25,
+                    "counts": [2, 3],
+                },
+            ],
+        )
+
+        res = self.client.get(ACTIVITY_STATS_URL, {"start": "2020-11-30", "end": "2020-12-13", "limit": 1})
+
+        self.assertEqual([movie["movie_id"] for movie in res.data["movies"]], [movie2.id])
+        self.assertEqual(len(res.data["movies"][0]["counts"]), 14)
+
+    def test_activity_stats_of_movies(self):
+        """Test retrieving the comments per day of the given movies, also of those without comments"""
+        movie1 = sample_movie()
+        movie2 = sample_movie(title="Another Great Movie")
+        DailyCommentCount.objects.create(movie=movie1, day=date(2020, 12, 2), count=3)
+
+        res = self.client.get(
+            ACTIVITY_STATS_URL, {"start": "2020-12-01", "end": "2020-12-03", "movie_id": f"{movie1.id},{movie2.id}"}
+        )
+
+        self.assertEqual(
+            [(movie["movie_id"], movie["counts"]) for movie in res.data["movies"]],
+            [(movie1.id, [0, 3, 0]), (movie2.id, [0, 0, 0])],
+        )
+
+    def test_activity_stats_of_many_movies(self):
+        """Test the limit of the most trending movies doesn't apply to the given movies"""
+        movies = [sample_movie(title=f"Movie {i}") for i in range(12)]
+        DailyCommentCount.objects.bulk_create(
+            [DailyCommentCount(movie=movie, day=date(2020, 12, 1), count=i + 1) for i, movie in enumerate(movies)]
+        )
+
+        res = self.client.get(
+            ACTIVITY_STATS_URL,
+            {"start": "2020-12-01", "end": "2020-12-01", "movie_id": ",".join(str(movie.id) for movie in movies)},
+        )
+
+        self.assertEqual(
+            sorted((movie["movie_id"], movie["total_comments"], movie["counts"]) for movie in res.data["movies"]),
+            [(movie.id, i + 1, [i + 1]) for i, movie in enumerate(movies)],
+        )
+
+    def test_activity_stats_cached(self):
+        """Test the buckets which are over are cached until their comments change"""
+        movie = sample_movie()
+        today = timezone.localdate()
+        yesterday = today - timedelta(days=1)
+        DailyCommentCount.objects.create(movie=movie, day=yesterday, count=2)
+        params = {"start": (today - timedelta(days=6)).isoformat(), "end": today.isoformat()}
+
+        self.client.get(ACTIVITY_STATS_URL, params)
+        with CaptureQueriesContext(connection) as context:
+            res = self.client.get(ACTIVITY_STATS_URL, params)
+        # Only today is queried again
+        self.assertEqual(len(context), 1)
+        self.assertEqual(res.data["movies"][0]["counts"], [0, 0, 0, 0, 0, 2, 0])
+
+        DailyCommentCount.objects.add(movie.id, yesterday)
+        with capture_on_commit_callbacks(execute=True):
+            ranking_cache.invalidate(yesterday)
+        res = self.client.get(ACTIVITY_STATS_URL, params)
+
+        self.assertEqual(res.data["movies"][0]["counts"], [0, 0, 0, 0, 0, 3, 0])
+
+    def test_activity_stats_invalid_params(self):
+        """Test retrieving the comment activity with invalid query params"""
+        for params in (
+            {"start": "2020-12-01"},
+            {"start": "2020-12-02", "end": "2020-12-01"},
+            {"start": "2020-12-01", "end": "2020-12-07", "interval": "hour"},
+            {"start": "2010-12-01", "end": "2020-12-07"},
+            {"start": "0001-01-01", "end": "9999-12-31", "interval": "week"},
+            {"start": "0001-01-01", "end": "0001-01-02"},
+            {"start": "2020-12-01", "end": "2020-12-07", "movie_id": "1,a"},
+            {"start": "2020-12-01", "end": "2020-12-07", "limit": "1000"},
+        ):
+            with self.subTest(params=params):
+                res = self.client.get(ACTIVITY_STATS_URL, params)
+
+                self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_list_top_movies_empty(self):
         """Test retrieving top movies by amount of comments for specific date range without any comments"""
         movie1 = sample_movie()
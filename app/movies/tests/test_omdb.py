@@ -0,0 +1,187 @@
+from django.test import SimpleTestCase, override_settings
+
+from movies import metrics
+from movies.omdb import (
+    AsyncOMDbClient,
+    CircuitBreaker,
+    MovieNotFound,
+    OMDbClient,
+    OMDbUnavailable,
+    TTLCache,
+    fetch_movie_data,
+    fetch_movie_data_async,
+)
+from movies.stub_omdb import StubOMDbServer
+
+MOVIES = {"Great Movie": {"Year": "1999", "Genre": "Drama"}}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class OMDbClientTests(SimpleTestCase):
+    def setUp(self):
+        self.stub = StubOMDbServer(MOVIES).start()
+        self.addCleanup(self.stub.stop)
+
+    def make_client(self, **kwargs):
+        kwargs.setdefault("backoff_factor", 0)
+        return OMDbClient(self.stub.url, "key", **kwargs)
+
+    def test_fetch(self):
+        """Test fetching the movie data without its title"""
+        data = self.make_client().fetch("Great Movie")
+
+        self.assertEqual(data, {"Year": "1999", "Genre": "Drama", "Response": "True"})
+
+    def test_fetch_cached(self):
+        """Test the movie is fetched from the API only once, regardless of the title case and whitespace"""
+        client = self.make_client()
+        client.fetch("Great Movie")
+        client.fetch("  great   MOVIE ")
+
+        self.assertEqual(self.stub.requests, 1)
+
+    def test_fetch_not_found_cached(self):
+        """Test "not found" responses are cached as well"""
+        client = self.make_client()
+        for _ in range(2):
+            with self.assertRaises(MovieNotFound):
+                client.fetch("Unknown Movie")
+
+        self.assertEqual(self.stub.requests, 1)
+
+    def test_fetch_measured(self):
+        """Test the calls to the API are measured by outcome and added to the time of the current request"""
+        request_metrics = metrics.RequestMetrics()
+        token = metrics.current_request.set(request_metrics)
+        self.addCleanup(metrics.current_request.reset, token)
+        before = {
+            outcome: metrics.OMDB_REQUEST_DURATION.values.get((outcome,), (None, 0, 0))[2]
+            for outcome in ("ok", "not_found")
+        }
+
+        client = self.make_client()
+        client.fetch("Great Movie")
+        with self.assertRaises(MovieNotFound):
+            client.fetch("Unknown Movie")
+
+        for outcome in ("ok", "not_found"):
+            self.assertEqual(metrics.OMDB_REQUEST_DURATION.values[(outcome,)][2], before[outcome] + 1)
+        self.assertGreater(request_metrics.timings["omdb"], 0)
+
+    def test_fetch_retried(self):
+        """Test failing responses are retried"""
+        self.stub.failures = 2
+
+        self.make_client(retries=2).fetch("Great Movie")
+
+        self.assertEqual(self.stub.requests, 3)
+
+    def test_fetch_unavailable(self):
+        """Test the client gives up once the retries are exhausted"""
+        self.stub.failures = 3
+
+        with self.assertRaises(OMDbUnavailable):
+            self.make_client(retries=1).fetch("Great Movie")
+
+    def test_fetch_timeout(self):
+        """Test a slow API doesn't block the client for longer than the read timeout"""
+        self.stub.latency = 0.5
+
+        with self.assertRaises(OMDbUnavailable):
+            self.make_client(read_timeout=0.1, retries=0).fetch("Great Movie")
+
+    def test_circuit_breaker(self):
+        """Test the API isn't called anymore after too many consecutive failures"""
+        self.stub.failures = 10
+        client = self.make_client(retries=0, failure_threshold=2)
+        for title in ("A", "B", "C"):
+            with self.assertRaises(OMDbUnavailable):
+                client.fetch(title)
+
+        self.assertEqual(self.stub.requests, 2)
+
+    def test_fetch_movie_data(self):
+        """Test fetching the movie data with the client configured in the settings"""
+        with override_settings(API_URL=self.stub.url):
+            self.assertEqual(fetch_movie_data("Great Movie")["Year"], "1999")
+
+
+class AsyncOMDbClientTests(SimpleTestCase):
+    def setUp(self):
+        self.stub = StubOMDbServer(MOVIES).start()
+        self.addCleanup(self.stub.stop)
+
+    async def test_fetch(self):
+        """Test fetching the movie data without blocking, once per title"""
+        client = AsyncOMDbClient(self.stub.url, "key")
+        for _ in range(2):
+            data = await client.fetch("Great Movie")
+        await client.close()
+
+        self.assertEqual(data["Year"], "1999")
+        self.assertEqual(self.stub.requests, 1)
+
+    async def test_fetch_retried(self):
+        """Test failing responses are retried until the retries are exhausted"""
+        self.stub.failures = 3
+        client = AsyncOMDbClient(self.stub.url, "key", retries=1, backoff_factor=0)
+        with self.assertRaises(OMDbUnavailable):
+            await client.fetch("Great Movie")
+        data = await client.fetch("Great Movie")
+        await client.close()
+
+        self.assertEqual(data["Genre"], "Drama")
+        self.assertEqual(self.stub.requests, 4)
+
+    async def test_fetch_not_found(self):
+        """Test fetching a movie which doesn't exist with the client configured in the settings"""
+        with override_settings(API_URL=self.stub.url):
+            with self.assertRaises(MovieNotFound):
+                await fetch_movie_data_async("Unknown Movie")
+
+
+class TTLCacheTests(SimpleTestCase):
+    def test_expired(self):
+        """Test the entries expire after their time to live"""
+        clock = FakeClock()
+        cache = TTLCache(maxsize=10, ttl=10, clock=clock)
+        cache.set("a", 1)
+        cache.set("b", 2, ttl=20)
+
+        clock.now = 15
+
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("b"), 2)
+
+    def test_least_recently_used_evicted(self):
+        """Test the least recently used entry is evicted when the cache is full"""
+        cache = TTLCache(maxsize=2, ttl=10)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        self.assertEqual((cache.get("a"), cache.get("b"), cache.get("c")), (1, None, 3))
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def test_half_open(self):
+        """Test a trial call is let through once the reset timeout passes"""
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=clock)
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+
+        clock.now = 30
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+
+        breaker.record_success()
+        self.assertTrue(breaker.allow())
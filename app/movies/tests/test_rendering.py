@@ -0,0 +1,110 @@
+import gzip
+import io
+import json
+import zlib
+from datetime import datetime, timezone
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from movies.api import renderers
+from movies.api.parsers import FastJSONParser
+from movies.api.renderers import FastJSONRenderer
+from movies.middleware import compress_sequence
+from movies.models import Movie
+
+DATA = {
+    "title": "Zażółć \u2028 gęślą",
+    "created": datetime(2020, 12, 1, 12, 30, 15, 123456, tzinfo=timezone.utc),
+    "rating": Decimal("8.1"),
+    "results": [{"id": 1, "data": {"Year": "1999"}}, None, True, 1.5],
+}
+
+
+class FastJSONTests(SimpleTestCase):
+    def test_render_like_json_renderer(self):
+        """Test the fast renderer gives the same output as DRF's JSONRenderer"""
+        self.assertEqual(FastJSONRenderer().render(DATA), JSONRenderer().render(DATA))
+
+    def test_render_indented(self):
+        """Test indented output is rendered by the stdlib"""
+        rendered = FastJSONRenderer().render(DATA, "application/json; indent=4")
+
+        self.assertEqual(rendered, JSONRenderer().render(DATA, "application/json; indent=4"))
+
+    def test_render_without_orjson(self):
+        """Test the stdlib is used when orjson isn't installed"""
+        with patch.object(renderers, "orjson", None):
+            self.assertEqual(FastJSONRenderer().render(DATA), JSONRenderer().render(DATA))
+
+    def test_parse(self):
+        """Test parsing JSON and failing on invalid JSON"""
+        parser = FastJSONParser()
+
+        self.assertEqual(parser.parse(io.BytesIO('{"title": "Zażółć"}'.encode())), {"title": "Zażółć"})
+        with self.assertRaises(ParseError):
+            parser.parse(io.BytesIO(b'{"title": NaN}'))
+
+
+@override_settings(RESPONSE_COMPRESSION_MIN_SIZE=1024)
+class CompressionTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        Movie.objects.bulk_create(Movie(title=f"Movie {i}", data={"Plot": "A long plot " * 10}) for i in range(20))
+
+    def test_compressed(self):
+        """Test responses over the threshold are compressed when the client accepts gzip"""
+        res = self.client.get(reverse("list_create_movie"), HTTP_ACCEPT_ENCODING="gzip, deflate")
+
+        self.assertEqual(res["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", res["Vary"])
+        self.assertEqual(len(json.loads(gzip.decompress(res.content))["results"]), 20)
+
+    def test_not_accepted(self):
+        """Test responses aren't compressed when the client doesn't accept gzip"""
+        res = self.client.get(reverse("list_create_movie"))
+
+        self.assertFalse(res.has_header("Content-Encoding"))
+        self.assertIn("Accept-Encoding", res["Vary"])
+
+    def test_below_threshold(self):
+        """Test small responses aren't compressed"""
+        res = self.client.get(reverse("list_create_movie"), {"page_size": 1}, HTTP_ACCEPT_ENCODING="gzip")
+
+        self.assertFalse(res.has_header("Content-Encoding"))
+
+    def test_etag_weakened(self):
+        """Test the ETag of a compressed response is weak and still validates the next request"""
+        movie = Movie.objects.first()
+        url = reverse("retrieve_update_destroy_movie", args=[movie.id])
+
+        with override_settings(RESPONSE_COMPRESSION_MIN_SIZE=1):
+            res = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+            self.assertTrue(res["ETag"].startswith('W/"'))
+            res = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=res["ETag"])
+
+        self.assertEqual(res.status_code, 304)
+
+    def test_streamed(self):
+        """Test streamed responses are compressed while they are sent"""
+        res = self.client.get(reverse("export_movies"), HTTP_ACCEPT_ENCODING="gzip")
+
+        self.assertEqual(res["Content-Encoding"], "gzip")
+        lines = gzip.decompress(b"".join(res.streaming_content)).decode().splitlines()
+        self.assertEqual(len(lines), 20)
+
+    def test_streamed_chunks_flushed(self):
+        """Test every compressed chunk of a streamed response can be decompressed as soon as it's received"""
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        rows = [f'{{"id": {i}}}\n'.encode() for i in range(3)]
+
+        parts = compress_sequence(iter(rows), level=6)
+
+        for row, part in zip(rows, parts):
+            self.assertEqual(decompressor.decompress(part), row)
@@ -0,0 +1,79 @@
+from unittest.mock import patch
+
+from django.urls import reverse
+from django.test import TestCase
+
+from rest_framework import status
+
+from movies.models import Movie, Comment, trigram_available
+from movies.tests.utils import QueryBudgetAPIClient
+
+SEARCH_URL = reverse("search")
+
+
+def sample_movie(title="Great Movie", data={"Year": "1999", "Genre": "Drama"}):
+    """Create a sample movie"""
+    return Movie.objects.create(title=title, data=data)
+
+
+def sample_comment(movie, body="Test comment"):
+    """Create a sample comment"""
+    return Comment.objects.create(movie=movie, body=body)
+
+
+class SearchAPITests(TestCase):
+    def setUp(self):
+        self.client = QueryBudgetAPIClient(max_queries=2)
+
+    def test_search_movies(self):
+        """Test searching movies by title, actors and plot, title matches first"""
+        sample_movie(title="The Matrix", data={"Actors": "Keanu Reeves", "Plot": "A hacker learns the truth."})
+        sample_movie(title="Speed", data={"Actors": "Keanu Reeves", "Plot": "A bus with a bomb."})
+        sample_movie(title="Inception", data={"Plot": "A thief enters dreams, like in the matrix."})
+
+        res_title = self.client.get(SEARCH_URL, {"q": "matrix"})
+        res_actors = self.client.get(SEARCH_URL, {"q": "keanu"})
+
+        self.assertEqual(res_title.status_code, status.HTTP_200_OK)
+        self.assertEqual([movie["title"] for movie in res_title.data["results"]], ["The Matrix", "Inception"])
+        self.assertEqual(res_actors.data["count"], 2)
+
+    def test_search_comments(self):
+        """Test searching comments by their body"""
+        movie = sample_movie()
+        sample_comment(movie, body="Brilliant acting")
+        sample_comment(movie, body="Boring plot")
+
+        res = self.client.get(SEARCH_URL, {"q": "acted", "type": "comments"})
+
+        self.assertEqual([comment["body"] for comment in res.data["results"]], ["Brilliant acting"])
+
+    def test_search_without_text(self):
+        """Test searching without the text to search for"""
+        res = self.client.get(SEARCH_URL, {"q": " "})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search_invalid_type(self):
+        """Test searching with an unknown search type"""
+        res = self.client.get(SEARCH_URL, {"q": "matrix", "type": "actors"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search_fuzzy(self):
+        """Test resolving a typo in the title with fuzzy search"""
+        if not trigram_available():
+            self.skipTest("pg_trgm extension isn't installed")
+        sample_movie(title="The Matrix")
+        sample_movie(title="Speed")
+
+        res = self.client.get(SEARCH_URL, {"q": "teh matirx", "fuzzy": "true"})
+
+        self.assertEqual([movie["title"] for movie in res.data["results"]], ["The Matrix"])
+
+    @patch("movies.api.views.trigram_available", return_value=False)
+    def test_search_fuzzy_unavailable(self, trigram_available):
+        """Test fuzzy search without the pg_trgm extension"""
+        res = self.client.get(SEARCH_URL, {"q": "teh matirx", "fuzzy": "true"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,46 @@
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework.test import APIClient
+
+
+@contextmanager
+def assert_max_queries(max_queries):
+    """Fail when the block executes more than `max_queries` database queries"""
+    with CaptureQueriesContext(connection) as context:
+        yield context
+
+    if len(context) > max_queries:
+        queries = "\n".join(f"{i}. {query['sql']}" for i, query in enumerate(context.captured_queries, start=1))
+        raise AssertionError(f"{len(context)} queries executed, the budget is {max_queries}:\n{queries}")
+
+
+@contextmanager
+def capture_on_commit_callbacks(using=DEFAULT_DB_ALIAS, execute=False):
+    """
+    Capture the `transaction.on_commit()` callbacks of the block, which never run inside a TestCase, and run
+    them after the block with `execute` (a backport of `TestCase.captureOnCommitCallbacks()` of Django 3.2)
+    """
+    callbacks = []
+    start_count = len(connections[using].run_on_commit)
+    try:
+        yield callbacks
+    finally:
+        callbacks[:] = [callback for _, callback in connections[using].run_on_commit[start_count:]]
+        if execute:
+            for callback in callbacks:
+                callback()
+
+
+class QueryBudgetAPIClient(APIClient):
+    """APIClient failing the test when a request executes more than `max_queries` database queries"""
+
+    def __init__(self, *args, max_queries=10, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_queries = max_queries
+
+    def request(self, **kwargs):
+        with assert_max_queries(self.max_queries):
+            return super().request(**kwargs)
@@ -1,15 +1,33 @@
 from django.urls import path
 
+from movies.api.async_views import create_movie_async
 from movies.api.views import (
     ListCreateMovieAPIView,
+    ExportMoviesAPIView,
+    BulkCreateMovieAPIView,
     RetrieveUpdateDestroyMovieAPIView,
+    RetrieveMovieStatusAPIView,
     ListCreateCommentAPIView,
+    ExportCommentsAPIView,
+    BulkCreateCommentAPIView,
     ListTopMoviesAPIView,
+    RankingCacheStatsAPIView,
+    ActivityStatsAPIView,
+    SearchAPIView,
 )
 
 urlpatterns = [
     path("movies/", ListCreateMovieAPIView.as_view(), name="list_create_movie"),
+    path("movies/async/", create_movie_async, name="create_movie_async"),
+    path("movies/export", ExportMoviesAPIView.as_view(), name="export_movies"),
+    path("movies/bulk/", BulkCreateMovieAPIView.as_view(), name="bulk_create_movie"),
     path("movies/<int:id>", RetrieveUpdateDestroyMovieAPIView.as_view(), name="retrieve_update_destroy_movie"),
+    path("movies/<int:id>/status", RetrieveMovieStatusAPIView.as_view(), name="retrieve_movie_status"),
     path("comments/", ListCreateCommentAPIView.as_view(), name="list_create_comment"),
+    path("comments/export", ExportCommentsAPIView.as_view(), name="export_comments"),
+    path("comments/bulk/", BulkCreateCommentAPIView.as_view(), name="bulk_create_comment"),
     path("top/", ListTopMoviesAPIView.as_view(), name="list_top_movies"),
+    path("top/cache/", RankingCacheStatsAPIView.as_view(), name="ranking_cache_stats"),
+    path("stats/activity/", ActivityStatsAPIView.as_view(), name="activity_stats"),
+    path("search/", SearchAPIView.as_view(), name="search"),
 ]